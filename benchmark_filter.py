@@ -0,0 +1,224 @@
+# benchmark_filter.py
+"""
+Đo tốc độ và so sánh hai phiên bản bộ lọc (`utils/filter.py` và `utils/filter-new.py`)
+trên một bộ dữ liệu chuỗi game tổng hợp.
+
+- Bộ dữ liệu được sinh ngẫu nhiên (có hạt giống) theo các "dạng" chuỗi thường gặp trong
+  `classified_output/_2_needs_review.json`: thẻ rich-text Unity, placeholder `{0}`/`{name|B}`,
+  biến `&...&`, đường dẫn, camelCase, tên vật phẩm, hội thoại... Nếu file đó tồn tại,
+  một phần chuỗi thật được trộn vào.
+- Đo số chuỗi/giây của `should_translate`, `protect_placeholders`, `restore_placeholders`.
+- Báo cáo các chuỗi mà hai phiên bản xếp vào nhóm khác nhau.
+- Có thể lưu kết quả làm mốc (`--save-baseline`) và báo lỗi (mã thoát 1) khi tốc độ
+  giảm quá `--max-regression` so với mốc (`--baseline`).
+
+Ví dụ:
+    python benchmark_filter.py --size 20000 --save-baseline bench_baseline.json
+    python benchmark_filter.py --size 20000 --baseline bench_baseline.json --max-regression 0.25
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Sequence
+
+from utils.classifier import bucket_index
+from utils.jsonstream import iter_json_array
+
+SEED_FILE = os.path.join("classified_output", "_2_needs_review.json")
+FILTER_FILES = {
+    "filter": os.path.join("utils", "filter.py"),
+    "filter-new": os.path.join("utils", "filter-new.py"),
+}
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ==============================================================================
+# ==== SINH DỮ LIỆU TỔNG HỢP ====
+# ==============================================================================
+
+_WORDS = (
+    "jade sword spirit qi pill heaven demon sect elder disciple realm foundation golden core "
+    "nascent soul tribulation thunder flame frost beast treasure manual technique art herb "
+    "mountain river palace ancient immortal fate fortune destiny blood bone heart mind dao"
+).split()
+_COMMON = "the is you are to in of for with on at a".split()
+_COLORS = ("#ff0000", "#00ff00", "#ffd700", "#f5deb3", "red", "yellow")
+_VARIABLES = ("name", "npcName", "areaName5", "itemName", "sectName", "value")
+_MODIFIERS = ("B", "S", "N", "Up")
+_EXTENSIONS = (".png", ".prefab", ".json", ".cs", ".asset")
+_CJK = ("灵气", "丹药", "修炼", "天劫", "宗门")
+_VIETNAMESE = ("Linh Khí", "Đan Dược", "Tu luyện đến cảnh giới Trúc Cơ", "Đạo hữu")
+
+
+def _title(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(_WORDS).capitalize() for _ in range(count))
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS + _COMMON) for _ in range(rng.randint(4, 14))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice((".", "!", "?", "...", ""))
+
+
+def _placeholder(rng: random.Random) -> str:
+    kind = rng.randrange(6)
+    if kind == 0: return f"{{{rng.randrange(4)}}}"
+    if kind == 1: return f"{{{rng.choice(_VARIABLES)}|{rng.choice(_MODIFIERS)}}}"
+    if kind == 2: return f"{{#{rng.choice(_VARIABLES)}}}"
+    if kind == 3: return f"&{rng.randint(10000, 99999)}_{rng.choice(('dmg', 'fysj', 'hp'))}%{rng.randint(1, 3)}&"
+    if kind == 4: return rng.choice(("%s", "%d", "%f", "%%"))
+    return f"<color={rng.choice(_COLORS)}>{{{rng.randrange(3)}}}</color>"
+
+
+_SHAPES: Sequence[Callable[[random.Random], str]] = (
+    # Tên vật phẩm/kỹ năng, hội thoại, mô tả có placeholder
+    lambda rng: _title(rng, rng.randint(1, 3)),
+    lambda rng: _sentence(rng),
+    lambda rng: f"{_sentence(rng)} {_placeholder(rng)} {_title(rng, 1).lower()}",
+    lambda rng: f"{_title(rng, 2)}: {_placeholder(rng)}",
+    lambda rng: f"<color={rng.choice(_COLORS)}>{_title(rng, 2)}</color> {_sentence(rng)}",
+    lambda rng: f"<b>{_title(rng, 1)}</b>\n{_sentence(rng)}",
+    lambda rng: f"Year <color=#ff0000>{{0}}</color> Month <color=#ff0000>{{1}}</color>",
+    lambda rng: f"({_sentence(rng)})",
+    # Chuỗi kỹ thuật
+    lambda rng: rng.choice(_WORDS) + "".join(w.capitalize() for w in rng.sample(_WORDS, 2)),
+    lambda rng: "_".join(rng.sample(_WORDS, 3)).upper(),
+    lambda rng: "Assets/" + "/".join(rng.sample(_WORDS, 2)) + rng.choice(_EXTENSIONS),
+    lambda rng: f"{rng.choice(_WORDS)}.{rng.choice(_WORDS)}.{rng.choice(_WORDS)}",
+    lambda rng: f"obj.GetChild({rng.randrange(9)}) == null",
+    lambda rng: f"[{rng.randint(1, 3)}.{rng.randint(0, 9)} Patch Notes]",
+    lambda rng: str(rng.randint(0, 100000)),
+    # Ngôn ngữ khác
+    lambda rng: rng.choice(_CJK) + rng.choice(_CJK),
+    lambda rng: rng.choice(_VIETNAMESE),
+)
+
+
+def generate_corpus(size: int, seed: int = 0, seed_file: str = SEED_FILE, real_share: float = 0.3) -> List[str]:
+    """
+    Sinh `size` chuỗi theo các dạng trong `_SHAPES`; nếu có `seed_file`, khoảng
+    `real_share` số chuỗi được lấy ngẫu nhiên từ dữ liệu thật.
+    """
+    rng = random.Random(seed)
+    real: List[str] = []
+    if seed_file and os.path.exists(seed_file):
+        real = [item.get("value") for item in iter_json_array(seed_file) if isinstance(item.get("value"), str)]
+    corpus = []
+    for _ in range(size):
+        if real and rng.random() < real_share:
+            corpus.append(rng.choice(real))
+        else:
+            corpus.append(rng.choice(_SHAPES)(rng))
+    return corpus
+
+
+# ==============================================================================
+# ==== ĐO ĐẠC ====
+# ==============================================================================
+
+def load_filter(name: str):
+    """Nạp một phiên bản bộ lọc theo tên (`filter-new.py` không import trực tiếp được)."""
+    spec = importlib.util.spec_from_file_location(f"bench_{name.replace('-', '_')}", FILTER_FILES[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def throughput(function: Callable, inputs: Sequence, repeat: int) -> float:
+    """Số lần gọi/giây tốt nhất trong `repeat` lượt chạy."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            function(*value)
+        best = min(best, time.perf_counter() - start)
+    return len(inputs) / best if best > 0 else float("inf")
+
+
+def benchmark(module, corpus: Sequence[str], threshold: int, repeat: int) -> Dict[str, float]:
+    protected = [module.protect_placeholders(text) for text in corpus]
+    return {
+        "should_translate": throughput(module.should_translate, [(text, threshold) for text in corpus], repeat),
+        "protect_placeholders": throughput(module.protect_placeholders, [(text,) for text in corpus], repeat),
+        "restore_placeholders": throughput(module.restore_placeholders, protected, repeat),
+    }
+
+
+def disagreements(modules: Dict[str, object], corpus: Sequence[str], thresholds: Sequence[int]) -> List[Dict]:
+    """Các chuỗi mà các phiên bản bộ lọc xếp vào nhóm khác nhau."""
+    found = []
+    for text in dict.fromkeys(corpus):
+        buckets = {name: bucket_index(module.translation_score(text), thresholds) for name, module in modules.items()}
+        if len(set(buckets.values())) > 1:
+            found.append({"text": text, "buckets": buckets})
+    return found
+
+
+def check_regressions(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Các chỉ số chậm hơn mốc quá `max_regression` (tỷ lệ, ví dụ 0.15 = 15%)."""
+    failures = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if reference and value < reference * (1 - max_regression):
+                failures.append(f"{name}.{metric}: {value:,.0f}/s < mốc {reference:,.0f}/s (-{(1 - value / reference) * 100:.1f}%)")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Đo tốc độ và so sánh các phiên bản bộ lọc.")
+    parser.add_argument("--size", type=int, default=20000, help="Số chuỗi trong bộ dữ liệu tổng hợp.")
+    parser.add_argument("--seed", type=int, default=0, help="Hạt giống sinh dữ liệu.")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lượt đo cho mỗi hàm (lấy lượt nhanh nhất).")
+    parser.add_argument("--filters", nargs="+", default=list(FILTER_FILES), choices=list(FILTER_FILES))
+    parser.add_argument("--thresholds", type=int, nargs="+", default=[5, 0], help="Ngưỡng an toàn và ngưỡng cơ bản.")
+    parser.add_argument("--show", type=int, default=10, help="Số chuỗi bất đồng được in ra.")
+    parser.add_argument("--baseline", help="File kết quả mốc để so sánh.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Mức giảm tốc độ tối đa cho phép so với mốc.")
+    parser.add_argument("--save-baseline", help="Lưu kết quả lần chạy này làm mốc.")
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.size, args.seed)
+    logging.info(f"🧪 Bộ dữ liệu tổng hợp: {len(corpus)} chuỗi ({len(set(corpus))} chuỗi khác nhau), seed={args.seed}.")
+
+    modules = {name: load_filter(name) for name in args.filters}
+    results: Dict[str, Dict[str, float]] = {}
+    for name, module in modules.items():
+        results[name] = benchmark(module, corpus, args.thresholds[0], args.repeat)
+        logging.info(f"⏱️  {name}:")
+        for metric, value in results[name].items():
+            logging.info(f"  - {metric:<22} {value:>12,.0f} chuỗi/giây")
+
+    if len(modules) > 1:
+        found = disagreements(modules, corpus, args.thresholds)
+        unique = len(set(corpus))
+        logging.info(f"⚖️  Bất đồng giữa {' / '.join(modules)}: {len(found)}/{unique} chuỗi ({len(found) / unique * 100:.2f}%)")
+        for entry in found[:args.show]:
+            buckets = ", ".join(f"{name}={bucket}" for name, bucket in entry["buckets"].items())
+            logging.info(f"  - {entry['text'][:80]!r}: {buckets}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"💾 Đã lưu mốc vào '{args.save_baseline}'.")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.max_regression)
+        if failures:
+            logging.error(f"❌ Tốc độ giảm quá {args.max_regression * 100:.0f}% so với mốc:")
+            for line in failures: logging.error(f"  - {line}")
+            return 1
+        logging.info(f"✅ Không có chỉ số nào chậm hơn mốc quá {args.max_regression * 100:.0f}%.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
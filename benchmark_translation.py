@@ -0,0 +1,160 @@
+# benchmark_translation.py
+"""
+Chạy thử tải giai đoạn dịch (`main.run_translation`) với backend Gemini giả
+(`translator/fake_backend.py`), không gửi request thật nào và không tốn hạn mức.
+
+- Bộ dữ liệu được sinh bằng `generate_corpus` của `benchmark_filter.py` (có hạt giống).
+- Mỗi tổ hợp (số key x kích thước batch tối đa x bộ máy) được chạy một lần trong thư mục
+  tạm, bộ nhớ dịch tắt, để các lần chạy không ảnh hưởng nhau.
+- Backend giả mô phỏng độ trễ, hạn mức 429, response bị cắt cụt, JSON hỏng (xem các
+  tùy chọn dòng lệnh); báo cáo số mục/giây, thời gian chạy, số request và số lần thử lại.
+
+Ví dụ:
+    python benchmark_translation.py --size 2000 --keys 1 2 4 --batch-sizes 20 50
+    python benchmark_translation.py --engines threads async --rpm 30 --truncate-rate 0.05 --malformed-rate 0.05
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmark_filter import generate_corpus
+from config import CONFIG
+from translator import fake_backend
+from utils.logger import setup_logger
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Các lỗi mô phỏng (khóa trong `fake_backend.STATS`) -> nhãn trong báo cáo.
+FAULTS = {
+    "rate_limited": "429",
+    "truncated": "cắt cụt",
+    "malformed": "JSON hỏng",
+    "count_mismatch": "sai số lượng",
+    "timeouts": "timeout",
+}
+
+
+def run_once(corpus: List[str], keys: int, batch_size: int, engine: str, fake_options: Dict,
+             overrides: Dict, workdir: str) -> Dict:
+    """Một lần `run_translation` với cấu hình đã cho; trả về số liệu của lần chạy."""
+    input_file = os.path.join(workdir, "input.json")
+    output_file = os.path.join(workdir, "output.json")
+    with open(input_file, "w", encoding="utf-8") as f:
+        json.dump([{"index": i, "value": text} for i, text in enumerate(corpus)], f, ensure_ascii=False)
+
+    import main  # Import muộn: `main` đọc CONFIG khi chạy, không phải khi import.
+
+    saved = dict(CONFIG)
+    CONFIG.update({
+        "input_file": input_file,
+        "output_file": output_file,
+        "temp_file": os.path.join(workdir, "temp_progress.json"),
+        "dead_letter_file": os.path.join(workdir, "dead_letter.jsonl"),
+        "use_translation_memory": False,
+        "api_keys": [f"fake-key-{n}" for n in range(1, keys + 1)],
+        "engine": engine,
+        "backend": "fake",
+        "fake_backend": fake_options,
+        "initial_batch_size": batch_size,
+        "max_batch_size": batch_size,
+        "tokens_per_minute_per_key": 10 ** 9,
+        **overrides,
+    })
+    fake_backend.reset_stats()
+    started = time.monotonic()
+    try:
+        main.run_translation()
+    finally:
+        elapsed = time.monotonic() - started
+        CONFIG.clear()
+        CONFIG.update(saved)
+
+    translated = 0
+    if os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            prefix = fake_options.get("translation_prefix", fake_backend.DEFAULT_OPTIONS["translation_prefix"])
+            translated = sum(1 for item in json.load(f) if str(item.get("value", "")).startswith(prefix))
+    stats = dict(fake_backend.STATS)
+    return {
+        "keys": keys, "batch_size": batch_size, "engine": engine, "seconds": elapsed, "translated": translated,
+        "items_per_second": translated / elapsed if elapsed > 0 else 0.0,
+        "requests": stats.get("requests", 0) + stats.get("rate_limited", 0),
+        "retries": sum(stats.get(name, 0) for name in FAULTS),
+        "faults": {name: stats.get(name, 0) for name in FAULTS},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Chạy thử tải giai đoạn dịch với backend Gemini giả.")
+    parser.add_argument("--size", type=int, default=2000, help="Số chuỗi trong bộ dữ liệu tổng hợp.")
+    parser.add_argument("--seed", type=int, default=0, help="Hạt giống sinh dữ liệu và của backend giả.")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 2, 4], help="Các số key cần đo.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[20, 50], help="Các kích thước batch tối đa.")
+    parser.add_argument("--engines", nargs="+", default=[CONFIG.get("engine", "threads")], choices=["threads", "async"])
+    parser.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-seconds", type=float, default=1.0, help="Độ trễ trung vị mỗi request.")
+    parser.add_argument("--seconds-per-item", type=float, default=0.02, help="Độ trễ thêm cho mỗi mục trong batch.")
+    parser.add_argument("--rpm", type=float, help="Hạn mức request/phút mỗi key của backend giả (vượt thì 429).")
+    parser.add_argument("--client-rpm", type=float, default=10 ** 6,
+                        help="Hạn mức request/phút mỗi key phía client (`requests_per_minute_per_key`).")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Tỷ lệ 429 ngẫu nhiên.")
+    parser.add_argument("--retry-delay", type=float,
+                        help="Thời gian chờ cơ bản giữa các lần thử lại (`api_retry_delay`, mặc định theo CONFIG).")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Tỷ lệ response bị cắt cụt.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Tỷ lệ response JSON hỏng.")
+    parser.add_argument("--verbose", action="store_true", help="Giữ log INFO của pipeline dịch.")
+    parser.add_argument("--save", help="Lưu kết quả (JSON) vào file này.")
+    args = parser.parse_args(argv)
+
+    pipeline_logger = setup_logger()
+    pipeline_logger.propagate = False  # Logger của pipeline đã có handler riêng.
+    if not args.verbose:
+        # Chỉ giữ cảnh báo/lỗi của pipeline; `setup_logger` đặt lại mức của logger mỗi lần chạy.
+        for handler in pipeline_logger.handlers:
+            handler.setLevel(logging.WARNING)
+
+    corpus = generate_corpus(args.size, args.seed)
+    logging.info(f"🧪 Bộ dữ liệu tổng hợp: {len(corpus)} chuỗi, seed={args.seed}.")
+    fake_options = {
+        "latency": args.latency, "latency_seconds": args.latency_seconds, "seconds_per_item": args.seconds_per_item,
+        "requests_per_minute": args.rpm, "rate_limit_rate": args.rate_limit_rate,
+        "truncate_rate": args.truncate_rate, "malformed_rate": args.malformed_rate, "seed": args.seed,
+    }
+
+    overrides = {"requests_per_minute_per_key": args.client_rpm}
+    if args.retry_delay is not None:
+        overrides["api_retry_delay"] = args.retry_delay
+
+    results = []
+    for engine in args.engines:
+        for keys in args.keys:
+            for batch_size in args.batch_sizes:
+                workdir = tempfile.mkdtemp(prefix="bench_translation_")
+                try:
+                    result = run_once(corpus, keys, batch_size, engine, fake_options, overrides, workdir)
+                finally:
+                    shutil.rmtree(workdir, ignore_errors=True)
+                results.append(result)
+                faults = ", ".join(f"{label} {result['faults'][name]}" for name, label in FAULTS.items()
+                                   if result['faults'][name])
+                logging.info(f"⏱️  {engine}, {keys} key, batch ≤{batch_size}: {result['translated']} mục trong "
+                             f"{result['seconds']:.1f}s = {result['items_per_second']:.1f} mục/giây | "
+                             f"{result['requests']} request, {result['retries']} lần thử lại"
+                             f"{f' ({faults})' if faults else ''}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        logging.info(f"💾 Đã lưu kết quả vào '{args.save}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
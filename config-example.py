@@ -12,6 +12,11 @@ CONFIG = {
     "output_file": "output.json",
     "temp_file": "temp_progress.json",
     "glossary_file": "glossary.json",
+    # Bộ nhớ dịch (SQLite): mỗi chuỗi khác nhau chỉ dịch một lần, dùng lại ở các lần chạy sau
+    "use_translation_memory": True,
+    "translation_memory_file": "translation_memory.sqlite",
+    # Gộp các chuỗi chỉ khác nhau ở con số ("Level 1" ... "Level 99") thành một mẫu, dịch một lần
+    "template_dedup": True,
 
     # --- Cài đặt API ---
     # !!! THAY API KEY CỦA BẠN VÀO ĐÂY !!!
@@ -20,22 +25,94 @@ CONFIG = {
         # Thêm bao nhiêu key tùy ý vào danh sách này
     ],
     "model_name": "gemini-2.5-flash",
+    # Định tuyến theo độ khó: mỗi chuỗi đi vào tuyến ĐẦU TIÊN mà nó thỏa. Điều kiện của một tuyến:
+    # "max_tokens" (chuỗi ngắn) VÀ ("min_score": điểm calculate_translation_score, hoặc
+    # "min_glossary_coverage": tỷ lệ 0..1 nội dung là thuật ngữ). Tuyến không có điều kiện nhận mọi chuỗi.
+    # "fallback": tuyến nhận batch khi tuyến này hết hạn mức; có thể đặt riêng
+    # "requests_per_minute_per_key"/"tokens_per_minute_per_key" và giá "input_price"/"output_price"
+    # (USD mỗi 1 triệu token) để báo cáo chi phí.
+    "model_routing": False,
+    "model_routes": [
+        {"name": "fast", "model_name": "gemini-2.5-flash-lite", "max_tokens": 40, "min_score": -3,
+         "min_glossary_coverage": 0.6, "fallback": "strong", "input_price": 0.10, "output_price": 0.40},
+        {"name": "strong", "model_name": "gemini-2.5-flash", "fallback": "fast",
+         "input_price": 0.30, "output_price": 2.50},
+    ],
+    "route_fallback_after": 3,        # Số lỗi hạn mức liên tiếp của một tuyến trước khi chuyển sang tuyến dự phòng
+    "route_fallback_seconds": 120,    # Thời gian (giây) chuyển các batch sang tuyến dự phòng
 
     # --- Cài đặt dịch thuật ---
     # Thay đổi 'target_language' để dịch sang ngôn ngữ khác
     # Ví dụ: "Vietnamese", "English", "Japanese", "Korean"
     "target_language": "Vietnamese", 
     "source_language": "English",
+    # Định dạng dữ liệu gửi/nhận với AI:
+    # - "compact": mã placeholder ngắn {0}, {1}... cho từng chuỗi, mảng chuỗi theo thứ tự (ít token hơn)
+    # - "legacy":  định dạng cũ {"index", "value"} với mã __PROTECTED_N__
+    "wire_format": "compact",
+    # True: mỗi prompt chỉ chứa các thuật ngữ trong glossary thực sự xuất hiện trong batch
+    # False: dán cả bảng thuật ngữ vào mọi prompt (cách cũ)
+    "glossary_per_batch": True,
+    # True: đọc response theo luồng (streaming), mỗi bản dịch được ghi nhận ngay khi nhận được
+    # (với "legacy"; "compact" ghi nhận khi đã kiểm tra xong response) và các bản dịch đã nhận
+    # vẫn được giữ khi response bị cắt ngang
+    "stream_responses": False,
+    # True: yêu cầu AI trả về JSON theo schema (response_schema, đúng số phần tử của batch) thay vì
+    # dựa vào lời dặn trong prompt; chỉ bật khi model hỗ trợ structured output (gemini-1.5 trở lên),
+    # model cũ sẽ từ chối request
+    "structured_output": False,
 
     # --- Cài đặt xử lý Batch & Đa luồng ---
+    # Batch được tạo động: tăng dần khi các batch thành công và nhanh, giảm một nửa khi lỗi
     "initial_batch_size": 50,         # Kích thước batch ban đầu
     "min_batch_size": 5,              # Kích thước batch tối thiểu khi có lỗi
     "max_batch_size": 200,            # Kích thước batch tối đa khi chạy ổn định
+    "batch_target_seconds": 30,       # Batch phản hồi chậm hơn mức này sẽ không được tăng kích thước
+    "batch_token_budget": 6000,       # Số token ước lượng tối đa (chuỗi gốc + bản dịch) của một batch
+    "long_string_tokens": 1500,       # Chuỗi tốn từ chừng này token trở lên được gửi riêng một mình
     "requests_per_minute_per_key": 10,# Giới hạn của Google API cho mỗi key
+    "tokens_per_minute_per_key": 250000, # Giới hạn token mỗi phút (prompt + bản dịch) cho mỗi key
+    "rate_limit_burst": 2,            # Số request được gửi dồn khi key đã rảnh một lúc
+    # Bộ máy dịch: "threads" (mỗi key một luồng, một request mỗi lúc) hoặc
+    # "async" (một event loop, nhiều request đồng thời trên mỗi key trong hạn mức RPM)
+    "engine": "threads",
+    "concurrent_requests_per_key": 4, # Chỉ dùng với engine "async"
     
     # --- Cài đặt Retry & Timeout ---
-    "max_api_retries": 3,             # Số lần thử lại tối đa cho một batch nếu gặp lỗi API
-    "api_retry_delay": 5,             # Thời gian chờ (giây) giữa các lần thử lại
+    "max_api_retries": 3,             # Số lần thử lại tối đa cho một mục khi đã bị tách riêng (batch lỗi được chia đôi dần)
+    "dead_letter_file": "dead_letter.jsonl", # Các mục vẫn lỗi sau mọi lần thử được ghi vào đây (mỗi dòng một JSON)
+    "request_timeout": 120,           # Thời gian chờ tối đa (giây) cho một request API
+    "api_retry_delay": 5,             # Thời gian chờ cơ bản (giây) giữa các lần thử lại (tăng dần, "full jitter";
+                                      # lỗi 429 thì chờ theo thời gian server yêu cầu, không có thì tăng theo
+                                      # số lỗi 429 liên tiếp của key)
+    # Ngắt mạch theo key: key lỗi (hết hạn mức, lỗi key, lỗi server) liên tiếp chừng này lần thì tạm ngừng,
+    # việc được chuyển cho các key khác; hết thời gian tạm ngừng key được thử lại bằng một request
+    "circuit_failure_threshold": 5,
+    "circuit_open_seconds": 30,       # Thời gian tạm ngừng ban đầu (gấp đôi mỗi lần thử lại thất bại)
+    "circuit_max_open_seconds": 600,  # Thời gian tạm ngừng tối đa
+    "auth_failures_to_disable": 3,    # Key bị từ chối (401/403) liên tiếp chừng này lần thì bị loại hẳn
+    "connections_per_key": 2,         # Số kết nối (client/kênh gRPC riêng) tối đa mỗi key, dùng lại giữa các batch
+    # Gửi lặp (hedging): cuối lần chạy, batch chạy lâu hơn phân vị "hedge_percentile" thời gian các batch
+    # đã xong được gửi thêm một bản cho key đang rảnh; lấy kết quả xong trước, bỏ bản còn lại.
+    # Không dùng cùng "stream_responses"
+    "hedge_requests": False,
+    "hedge_percentile": 0.9,
+    "hedge_max_fraction": 0.05,       # Tối đa chừng này phần số mục được gửi lặp (giới hạn hạn mức tốn thêm)
+    # Backend dịch: "gemini" (API thật) hoặc "fake" (Gemini giả trong tiến trình, để chạy thử tải
+    # mà không tốn hạn mức; xem benchmark_translation.py)
+    "backend": "gemini",
+    "fake_backend": {
+        "latency": "lognormal",       # Phân phối độ trễ: "fixed", "uniform", "exponential", "lognormal"
+        "latency_seconds": 1.0,       # Độ trễ trung vị mỗi request
+        "latency_sigma": 0.5,         # Độ lệch của phân phối lognormal
+        "seconds_per_item": 0.02,     # Độ trễ thêm cho mỗi mục trong batch
+        "requests_per_minute": None,  # Hạn mức mỗi key; vượt thì trả lỗi 429 kèm thời gian chờ
+        "rate_limit_rate": 0.0,       # Tỷ lệ 429 ngẫu nhiên
+        "truncate_rate": 0.0,         # Tỷ lệ response bị cắt cụt (MAX_TOKENS)
+        "malformed_rate": 0.0,        # Tỷ lệ response JSON hỏng
+        "count_mismatch_rate": 0.0,   # Tỷ lệ response thiếu một bản dịch
+        "seed": None,
+    },
 
     # =========================================================================
     # ==== CÀI ĐẶT PHÂN LOẠI DỮ LIỆU ====
@@ -48,6 +125,31 @@ CONFIG = {
 
         # Ngưỡng điểm cơ bản để đưa vào diện "Cần xem lại".
         # Thường giữ giá trị này là 0.
-        "base_translation_threshold": 0
+        "base_translation_threshold": 0,
+
+        # Số tiến trình dùng để phân loại song song. 0 = tự động theo số lõi CPU.
+        "workers": 0,
+        # Số chuỗi trong mỗi khối gửi cho một tiến trình.
+        "chunk_size": 2000,
+
+        # File cache điểm của bộ lọc (theo nội dung chuỗi). Để "" để tắt cache.
+        # Cache tự xóa khi utils/filter.py thay đổi; đổi ngưỡng không làm mất cache.
+        "cache_file": "classify_cache.sqlite",
+
+        # Phân loại tăng dần: chỉ phân loại các mục mới/thay đổi so với kết quả
+        # trong 'classified_output', giữ nguyên các mục đã được chuyển tay.
+        "incremental": False,
+
+        # Thống kê từng quy tắc lọc (số chuỗi bị loại, thời gian) và phân bố điểm,
+        # in ra cuối GIAI ĐOẠN 1 cùng 'trace_samples' vết quyết định ngẫu nhiên.
+        "trace_rules": False,
+        "trace_samples": 20,
+
+        # Thứ tự chạy các quy tắc loại bỏ của bộ lọc (không ảnh hưởng kết quả, chỉ tốc độ):
+        # - "fixed":    thứ tự cố định trong utils/filter.py
+        # - "adaptive": đo chi phí/tỷ lệ loại bỏ trên 'rule_sample_size' chuỗi rồi xếp lại
+        # - "verify":   như "adaptive" nhưng chấm thêm bằng thứ tự cố định để kiểm chứng (chậm hơn)
+        "rule_order": "fixed",
+        "rule_sample_size": 2000
     }
 }
\ No newline at end of file
@@ -1,7 +1,7 @@
 # main.py (Phiên bản cuối cùng, xử lý Ctrl+C và file tạm)
 import json
 import os
-from queue import Queue
+from queue import Empty, Queue
 from tqdm import tqdm
 import sys
 import time
@@ -9,48 +9,170 @@ import re
 
 # Import các thành phần từ các module đã tạo
 from config import CONFIG
-from utils.logger import setup_logger
-from utils.filter import should_translate
+from utils.logger import setup_logger, log_peak_rss
+from utils.classifier import assign_buckets, open_pool, resolve_workers, DEFAULT_CHUNK_SIZE
+from utils.decision_cache import DecisionCache, filter_fingerprint
+from utils.filter_stats import FilterStats
+from utils import rule_order as rule_ordering
+from utils.incremental import IncrementalPlan, ManifestWriter, PreviousRun, run_fingerprint
+from utils.jsonstream import JsonArrayWriter, iter_chunks, iter_json_array, write_json_array
+from utils.string_table import StringTable
 from translator.worker import TranslatorWorker
+from translator.async_engine import AsyncTranslationEngine
+from translator.rate_limiter import RateLimiter
+from translator.batcher import AdaptiveBatcher
+from translator.client_pool import ClientPool
+from translator.glossary import GlossaryIndex
+from translator.key_health import KeyScheduler
+from translator.routing import ModelRouter
+from translator.memory import MemoryRun, TranslationMemory, memory_context
 
 # --- CHỨC NĂNG 1: PHÂN LOẠI DỮ LIỆU ---
 def classify_data():
-    # ... (Hàm này giữ nguyên như cũ, không cần thay đổi)
     logger = setup_logger()
     logger.info("🚀 Bắt đầu GIAI ĐOẠN 1: PHÂN LOẠI DỮ LIỆU...")
-    try:
-        with open(CONFIG["input_file"], "r", encoding="utf-8") as f:
-            original_data = json.load(f)
-        logger.info(f"📖 Đã đọc {len(original_data)} mục từ '{CONFIG['input_file']}'.")
-    except Exception as e:
-        logger.error(f"❌ Không thể đọc file input '{CONFIG['input_file']}': {e}"); return
-    safe_to_translate, needs_review, skipped_technical = [], [], []
-    SAFE_THRESHOLD = CONFIG["classification_settings"]["safe_translation_threshold"]
-    BASE_THRESHOLD = CONFIG["classification_settings"]["base_translation_threshold"]
+    settings = CONFIG["classification_settings"]
+    SAFE_THRESHOLD = settings["safe_translation_threshold"]
+    BASE_THRESHOLD = settings["base_translation_threshold"]
     logger.info(f"⚙️  Áp dụng ngưỡng an toàn: {SAFE_THRESHOLD}, ngưỡng cơ bản: {BASE_THRESHOLD}")
-    for i, item in enumerate(original_data):
-        if 'index' not in item: item['index'] = i
-    for item in tqdm(original_data, desc="Đang phân loại"):
-        original_text = item.get("value", "")
-        if should_translate(original_text, threshold=SAFE_THRESHOLD):
-            safe_to_translate.append(item)
-        elif should_translate(original_text, threshold=BASE_THRESHOLD):
-            needs_review.append(item)
-        else:
-            skipped_technical.append(item)
-    logger.info("📊 Phân loại hoàn tất!")
-    logger.info(f"  - ✅ An toàn để dịch: {len(safe_to_translate)} mục")
-    logger.info(f"  - ⚠️ Cần xem lại: {len(needs_review)} mục")
-    logger.info(f"  - ❌ Bỏ qua (kỹ thuật): {len(skipped_technical)} mục")
+    thresholds = [SAFE_THRESHOLD, BASE_THRESHOLD]
     output_dir = "classified_output"
+    fingerprint = run_fingerprint(filter_fingerprint(), thresholds)
+
+    # [TĂNG DẦN] So sánh với lần chạy trước, chỉ phân loại lại các mục mới/thay đổi.
+    plan = None
+    if settings.get("incremental", False):
+        previous = PreviousRun.load(output_dir)
+        if previous is None:
+            logger.info("ℹ️  Chưa có kết quả phân loại trước đó, chạy phân loại toàn bộ.")
+        else:
+            plan = IncrementalPlan(previous, fingerprint)
+            if not previous.has_manifest:
+                logger.warning("⚠️ Kết quả cũ không có manifest, dùng giá trị trong các file kết quả để so sánh.")
+
+    # [THỨ TỰ QUY TẮC] "fixed" | "adaptive" (đo trên mẫu rồi sắp xếp lại) | "verify" (adaptive + kiểm chứng)
+    rule_mode = settings.get("rule_order", rule_ordering.ORDER_FIXED)
+    if rule_mode not in rule_ordering.ORDER_MODES:
+        logger.warning(f"⚠️ rule_order '{rule_mode}' không hợp lệ, dùng thứ tự cố định.")
+        rule_mode = rule_ordering.ORDER_FIXED
+    rule_order = None
+    mismatches = [] if rule_mode == rule_ordering.ORDER_VERIFY else None
+
+    cache = None
+    cache_file = settings.get("cache_file")
+    if cache_file and mismatches is not None:
+        logger.info("ℹ️  Chế độ kiểm chứng thứ tự quy tắc: không dùng cache để mọi chuỗi đều được chấm lại.")
+    elif cache_file:
+        cache = DecisionCache(cache_file, filter_fingerprint())
+    workers = resolve_workers(settings.get("workers"))
+    chunk_size = settings.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    logger.info(f"🧵 Phân loại song song trên {workers} tiến trình.")
+    # [THỐNG KÊ] Đo từng quy tắc lọc khi được bật; tắt thì không tốn chi phí nào.
+    stats = FilterStats(settings.get("trace_samples", 20)) if settings.get("trace_rules", False) else None
+
+    # [STREAMING] Đọc input và ghi 3 file kết quả theo từng khối, bộ nhớ không phụ thuộc
+    # số lượng mục. Các file cũ chỉ bị thay thế khi toàn bộ quá trình thành công.
     os.makedirs(output_dir, exist_ok=True)
-    with open(os.path.join(output_dir, "_1_safe_to_translate.json"), "w", encoding="utf-8") as f:
-        json.dump(safe_to_translate, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(output_dir, "_2_needs_review.json"), "w", encoding="utf-8") as f:
-        json.dump(needs_review, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(output_dir, "_3_skipped_technical.json"), "w", encoding="utf-8") as f:
-        json.dump(skipped_technical, f, ensure_ascii=False, indent=2)
+    counts = [0, 0, 0]
+    try:
+        with JsonArrayWriter(os.path.join(output_dir, "_1_safe_to_translate.json")) as safe_writer, \
+             JsonArrayWriter(os.path.join(output_dir, "_2_needs_review.json")) as review_writer, \
+             JsonArrayWriter(os.path.join(output_dir, "_3_skipped_technical.json")) as skipped_writer, \
+             ManifestWriter(output_dir, fingerprint) as manifest, \
+             tqdm(desc="Đang phân loại", unit="mục") as pbar:
+            writers = (safe_writer, review_writer, skipped_writer)
+            executor = open_pool(workers)
+            try:
+                items = _with_index(_read_input(CONFIG["input_file"]))
+                for block in iter_chunks(items, chunk_size * workers):
+                    buckets, auto_buckets = [None] * len(block), [None] * len(block)
+                    if plan is not None:
+                        for pos, item in enumerate(block):
+                            buckets[pos], auto_buckets[pos] = plan.decide(item)
+                    pending = [pos for pos, bucket in enumerate(buckets) if bucket is None]
+                    pbar.update(len(block) - len(pending))
+                    if rule_mode != rule_ordering.ORDER_FIXED and rule_order is None and pending:
+                        rule_order = _calibrate_rule_order([block[pos] for pos in pending], settings, logger)
+                    assigned = assign_buckets(
+                        [block[pos] for pos in pending], thresholds,
+                        workers=workers, chunk_size=chunk_size,
+                        progress=pbar.update, cache=cache, executor=executor, stats=stats,
+                        rule_order=rule_order, mismatches=mismatches,
+                    )
+                    for pos, bucket in zip(pending, assigned):
+                        buckets[pos] = auto_buckets[pos] = bucket
+                    for item, bucket, auto_bucket in zip(block, buckets, auto_buckets):
+                        writers[bucket].write(item)
+                        manifest.write(item, auto_bucket)
+                        counts[bucket] += 1
+            finally:
+                if executor is not None: executor.shutdown()
+    except _InputError as e:
+        if cache is not None: cache.close()
+        logger.error(f"❌ Không thể đọc file input '{CONFIG['input_file']}': {e}"); return
+    except OSError as e:
+        # Lỗi khi ghi kết quả (đầy đĩa, không có quyền...): các file kết quả cũ được giữ nguyên.
+        if cache is not None: cache.close()
+        logger.error(f"❌ Không thể ghi kết quả phân loại vào thư mục '{output_dir}': {e}"); return
+    except Exception:
+        if cache is not None: cache.close()
+        logger.exception("❌ Lỗi không mong đợi khi phân loại dữ liệu."); return
+
+    safe_count, review_count, skipped_count = counts
+    logger.info(f"📖 Đã đọc {sum(counts)} mục từ '{CONFIG['input_file']}'.")
+    logger.info("📊 Phân loại hoàn tất!")
+    logger.info(f"  - ✅ An toàn để dịch: {safe_count} mục")
+    logger.info(f"  - ⚠️ Cần xem lại: {review_count} mục")
+    logger.info(f"  - ❌ Bỏ qua (kỹ thuật): {skipped_count} mục")
+    if plan is not None:
+        st = plan.finish()
+        logger.info("🔁 Thay đổi so với lần chạy trước:")
+        logger.info(f"  - Giữ nguyên: {st['unchanged']} mục | Giữ theo thao tác chuyển tay: {st['manual']} mục")
+        logger.info(f"  - Mới: {st['added']} | Thay đổi nội dung: {st['changed']} | Bị xóa: {st['removed']}")
+        if st['rules_changed']:
+            logger.info(f"  - Phân loại lại do bộ lọc/ngưỡng thay đổi: {st['rules_changed']} mục")
+    if cache is not None:
+        for line in cache.report(): logger.info(line)
+        cache.close()
+    if stats is not None:
+        for line in stats.report(thresholds): logger.info(line)
+    if mismatches is not None:
+        if mismatches:
+            logger.error(f"❌ Kiểm chứng thứ tự quy tắc: {len(mismatches)} chuỗi cho kết quả KHÁC thứ tự cố định!")
+            for text in mismatches[:10]: logger.error(f"  - {text[:80]!r}")
+        else:
+            logger.info("✅ Kiểm chứng thứ tự quy tắc: mọi chuỗi cho kết quả giống hệt thứ tự cố định.")
     logger.info(f"💾 Đã lưu kết quả phân loại vào thư mục '{output_dir}'.")
+    log_peak_rss(logger)
+
+
+def _calibrate_rule_order(items, settings, logger):
+    """Đo các quy tắc lọc trên một mẫu của khối dữ liệu đầu tiên và chọn thứ tự chạy."""
+    sample = rule_ordering.sample_texts([item.get('value', '') for item in items], settings.get("rule_sample_size", 2000))
+    measurements = rule_ordering.measure_rules(sample)
+    order = rule_ordering.adaptive_order(measurements)
+    for line in rule_ordering.report(measurements, order): logger.info(line)
+    return order
+
+
+class _InputError(Exception):
+    """Lỗi khi mở hoặc đọc file input (phân biệt với lỗi khi ghi kết quả)."""
+
+
+def _read_input(path):
+    """Đọc file input theo luồng; lỗi I/O và JSON hỏng được báo bằng `_InputError`."""
+    try:
+        yield from iter_json_array(path)
+    except (OSError, ValueError) as e:
+        # `iter_json_array` báo JSON hỏng bằng ValueError (JSONDecodeError là lớp con của nó).
+        raise _InputError(e) from e
+
+
+def _with_index(items):
+    """Gán `index` theo vị trí cho các mục chưa có (giống bản cũ), không cần nạp hết dữ liệu."""
+    for i, item in enumerate(items):
+        if 'index' not in item: item['index'] = i
+        yield item
 
 # --- CHỨC NĂNG 2: DỊCH THUẬT ĐA LUỒNG (ĐÃ NÂNG CẤP) ---
 def run_translation():
@@ -58,36 +180,56 @@ def run_translation():
     logger.info("🚀 Bắt đầu GIAI ĐOẠN 2: DỊCH THUẬT ĐA LUỒNG...")
     
     try:
-        with open(CONFIG["input_file"], "r", encoding="utf-8") as f:
-            data_to_translate = json.load(f)
-        if not data_to_translate:
+        # Bảng chuỗi gọn: index trong mảng liên tục, giá trị trong một vùng UTF-8 chung,
+        # tra cứu theo index O(1) mà không cần dict phụ trợ.
+        final_data = StringTable.from_items(iter_json_array(CONFIG["input_file"]))
+        if not len(final_data):
             logger.warning("⚠️ File input rỗng, không có gì để dịch."); return
-        logger.info(f"📖 Đã đọc {len(data_to_translate)} mục từ '{CONFIG['input_file']}' để dịch.")
+        logger.info(f"📖 Đã đọc {len(final_data)} mục từ '{CONFIG['input_file']}' để dịch.")
     except Exception as e:
         logger.error(f"❌ Lỗi đọc file input: {e}"); return
 
-    glossary = {}
+    glossary_terms = {}
     try:
         with open(CONFIG["glossary_file"], "r", encoding="utf-8") as f:
-            glossary = json.load(f)
+            glossary_terms = json.load(f)
     except FileNotFoundError: pass
-
-    final_data = data_to_translate.copy()
+    # Chỉ mục thuật ngữ: mỗi prompt chỉ chứa các thuật ngữ có trong batch.
+    glossary = GlossaryIndex(glossary_terms, per_batch=CONFIG.get("glossary_per_batch", True))
+    # Định tuyến theo độ khó: chuỗi dễ cho model nhanh/rẻ, chuỗi khó cho model mạnh.
+    router = ModelRouter(glossary)
 
     # [THÊM MỚI] Lọc lại danh sách để chỉ dịch các mục chưa có tiếng Việt
     logger.info("🔍 Lọc lần cuối: Chỉ dịch các mục có ít hơn 3 ký tự tiếng Việt...")
     vietnamese_pattern = re.compile(r"[\u00C0-\u1EF9]")
     
+    # Chỉ giữ VỊ TRÍ của các mục trong bảng: dict `{'index', 'value'}` chỉ được dựng khi mục
+    # được đưa vào một batch (xem `AdaptiveBatcher`).
     items_to_batch = [
-        item for item in data_to_translate
-        if len(re.findall(vietnamese_pattern, str(item.get('value', '')))) < 2
+        pos for pos in range(len(final_data))
+        if len(re.findall(vietnamese_pattern, str(final_data.value_at(pos)))) < 2
     ]
+
+    # Bộ nhớ dịch: dùng lại bản dịch cũ, mỗi nhóm chuỗi trùng nhau (hoặc cùng mẫu, chỉ khác
+    # con số/placeholder) chỉ gửi một đại diện.
+    memory_run = None
+    if items_to_batch:
+        memory = None
+        if CONFIG.get("use_translation_memory", True):
+            memory = TranslationMemory(
+                CONFIG.get("translation_memory_file", "translation_memory.sqlite"),
+                memory_context(CONFIG["target_language"], router.signature(), glossary_terms),
+            )
+        memory_run = MemoryRun(memory, items_to_batch, table=final_data)
+        for reused_item in memory_run.reused:
+            final_data.set_value(reused_item['index'], reused_item['value'])
+        items_to_batch = memory_run.to_translate
+        for line in memory_run.report(): logger.info(line)
     
     if not items_to_batch:
         logger.info("🎉 Không còn mục nào cần dịch. Mọi thứ đã hoàn tất!")
         # Vẫn lưu lại file output cuối cùng để hoàn tất quy trình
-        with open(CONFIG["output_file"], "w", encoding="utf-8") as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=2)
+        write_json_array(CONFIG["output_file"], final_data.iter_items())
         logger.info(f"💾 Kết quả cuối cùng đã được lưu tại '{CONFIG['output_file']}'.")
         if os.path.exists(CONFIG["temp_file"]):
             os.remove(CONFIG["temp_file"])
@@ -98,76 +240,130 @@ def run_translation():
     api_keys = [key for key in CONFIG["api_keys"] if "YOUR_" not in key]
     if not api_keys: logger.error("❌ API Keys không hợp lệ."); return
     
-    work_queue = Queue()
     results_queue = Queue()
-    
-    batch_size = CONFIG.get('initial_batch_size', 50)
-    batch_id_counter = 0
+    # Batch được tạo động từ bể các mục chờ dịch, kích thước thay đổi theo kết quả từng batch.
+    batcher = AdaptiveBatcher(items_to_batch, router=router, table=final_data)
+    logger.info(f"📦 Batch động: bắt đầu {int(batcher.size)} mục/batch "
+                f"(trong khoảng {batcher.min_size}-{batcher.max_size}), tối đa ~{int(batcher.token_budget)} token/batch, "
+                f"{batcher.isolated} chuỗi dài được gửi riêng.")
+    if router.enabled:
+        logger.info("🧭 Định tuyến model theo độ khó:")
+        for line in router.plan(): logger.info(line)
 
-    for i in range(0, len(items_to_batch), batch_size):
-        work_queue.put({'batch_id': batch_id_counter, 'data': items_to_batch[i:i+batch_size]})
-        batch_id_counter += 1
-        
     threads = []
-    for i, key in enumerate(api_keys):
-        # Đặt luồng là daemon, chúng sẽ tự động thoát khi chương trình chính kết thúc
-        worker = TranslatorWorker(i + 1, key, work_queue, results_queue, glossary)
-        worker.daemon = True 
-        worker.start()
-        threads.append(worker)
-
-    index_to_position = {item['index']: pos for pos, item in enumerate(final_data)}
-    
+    rate_limiter = RateLimiter()
+    # Theo dõi sức khỏe từng key: key lỗi liên tục bị tạm ngừng, việc chuyển cho key khác.
+    scheduler = KeyScheduler()
+    # Client riêng cho từng key, kết nối được dùng lại giữa các batch.
+    client_pool = ClientPool(dict(enumerate(api_keys, 1)))
+    if CONFIG.get("engine", "threads") == "async":
+        # Một event loop cho mọi key, nhiều request đồng thời trên mỗi key.
+        engine = AsyncTranslationEngine(api_keys, batcher, results_queue, glossary,
+                                        rate_limiter=rate_limiter, scheduler=scheduler, client_pool=client_pool,
+                                        router=router)
+        engine.daemon = True
+        engine.start()
+        threads.append(engine)
+    else:
+        for i, key in enumerate(api_keys):
+            # Đặt luồng là daemon, chúng sẽ tự động thoát khi chương trình chính kết thúc
+            worker = TranslatorWorker(i + 1, key, batcher, results_queue, glossary, rate_limiter, scheduler,
+                                      client_pool, router)
+            worker.daemon = True
+            worker.start()
+            threads.append(worker)
+    started_at = time.monotonic()
+
     # [NÂNG CẤP] Bọc vòng lặp chính trong try...except để xử lý Ctrl+C
     try:
-        with tqdm(total=batch_id_counter, desc="Đang dịch", unit="batch") as pbar:
+        with tqdm(total=batcher.total, desc="Đang dịch", unit="mục") as pbar:
             completed_batches = 0
-            while completed_batches < batch_id_counter:
+            while not batcher.finished or not results_queue.empty():
                 try:
                     result_batch = results_queue.get(timeout=1) # Giảm timeout để kiểm tra thường xuyên hơn
                     
-                    # Cập nhật kết quả
-                    for result_item in result_batch['results']:
-                        original_index = result_item['index']
-                        if original_index in index_to_position:
-                            position = index_to_position[original_index]
-                            final_data[position]['value'] = result_item['value']
+                    # Cập nhật kết quả (kể cả các chuỗi trùng lặp dùng chung bản dịch)
+                    results = result_batch['results']
+                    if memory_run:
+                        results = memory_run.apply(results)
+                    for result_item in results:
+                        final_data.set_value(result_item['index'], result_item['value'])
                     
-                    completed_batches += 1
-                    pbar.update(1)
+                    if not result_batch.get('partial'):
+                        completed_batches += 1
+                    pbar.update(max(batcher.resolved - pbar.n, 0))
 
                     # [NÂNG CẤP] Lưu file tạm sau mỗi 5 batch
-                    if completed_batches % 5 == 0:
-                        with open(CONFIG["temp_file"], "w", encoding="utf-8") as f:
-                            json.dump(final_data, f, ensure_ascii=False, indent=2)
-                            logger.info(f"💾 Đã lưu tiến độ tạm thời vào '{CONFIG['temp_file']}'.")
+                    if not result_batch.get('partial') and completed_batches % 5 == 0:
+                        write_json_array(CONFIG["temp_file"], final_data.iter_items())
+                        logger.info(f"💾 Đã lưu tiến độ tạm thời vào '{CONFIG['temp_file']}'.")
+                        logger.info("📶 Mức sử dụng hạn mức (60 giây gần nhất):")
+                        for line in rate_limiter.report(): logger.info(line)
 
-                except Exception:
-                    # Bỏ qua lỗi timeout của queue.get() để vòng lặp tiếp tục
+                except Empty:
+                    # Hết thời gian chờ queue.get(): thu hồi batch của các luồng đã chết
                     # và kiểm tra xem có luồng nào còn sống không
+                    batcher.reclaim_orphans()
                     if not any(t.is_alive() for t in threads):
                         logger.error("❌ Tất cả các luồng đã dừng đột ngột!")
                         break
+                    pbar.update(max(batcher.resolved - pbar.n, 0))
                     continue
-        
+
+        # Mục bị bỏ qua có thể đã nhận bản dịch tạm qua streaming: trả lại chuỗi gốc.
+        for dropped_item in batcher.dropped:
+            for entry in (memory_run.discard(dropped_item) if memory_run else [dropped_item]):
+                final_data.set_value(entry['index'], entry['value'])
+
+        if not batcher.finished:
+            # Còn mục chưa dịch: giữ file tạm để chạy lại, không ghi file kết quả.
+            remaining = batcher.total - batcher.resolved
+            write_json_array(CONFIG["temp_file"], final_data.iter_items())
+            logger.error(f"❌ Còn {remaining} mục chưa dịch. Tiến độ đã được lưu trong '{CONFIG['temp_file']}', "
+                         f"chạy lại script để tiếp tục.")
+            for line in batcher.report(): logger.info(line)
+            logger.info("🩺 Tình trạng các key:")
+            for line in scheduler.report(): logger.info(line)
+            logger.info("🔗 Kết nối API:")
+            for line in client_pool.report(): logger.info(line)
+            if router.enabled:
+                logger.info("🧭 Các tuyến model:")
+                for line in router.report(): logger.info(line)
+            return
+
         # Nếu hoàn thành mà không bị ngắt
         logger.info("✅ Dịch thuật hoàn tất!")
-        with open(CONFIG["output_file"], "w", encoding="utf-8") as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=2)
+        elapsed_minutes = max(time.monotonic() - started_at, 1e-9) / 60
+        logger.info(f"⚡ Thông lượng: {completed_batches / elapsed_minutes:.1f} batch/phút "
+                    f"({CONFIG.get('engine', 'threads')}, {len(api_keys)} key).")
+        for line in batcher.report(): logger.info(line)
+        for line in glossary.report(): logger.info(line)
+        if memory_run:
+            for line in memory_run.report(): logger.info(line)
+        logger.info("📶 Mức sử dụng hạn mức (60 giây gần nhất):")
+        for line in rate_limiter.report(): logger.info(line)
+        logger.info("🩺 Tình trạng các key:")
+        for line in scheduler.report(): logger.info(line)
+        logger.info("🔗 Kết nối API:")
+        for line in client_pool.report(): logger.info(line)
+        if router.enabled:
+            logger.info("🧭 Các tuyến model:")
+            for line in router.report(): logger.info(line)
+        write_json_array(CONFIG["output_file"], final_data.iter_items())
         logger.info(f"💾 Kết quả cuối cùng đã được lưu tại '{CONFIG['output_file']}'.")
         
         # Xóa file tạm khi thành công
         if os.path.exists(CONFIG["temp_file"]):
             os.remove(CONFIG["temp_file"])
             logger.info(f"🧹 Đã xóa file tiến độ tạm '{CONFIG['temp_file']}'.")
+        log_peak_rss(logger)
 
     except KeyboardInterrupt:
         # Xử lý khi người dùng nhấn Ctrl+C
         logger.warning("\n🛑 Người dùng đã yêu cầu dừng chương trình.")
         logger.info(f"💾 Tiến độ đã được lưu trong file '{CONFIG['temp_file']}'. Chạy lại script để tiếp tục.")
         # Lưu lần cuối trước khi thoát
-        with open(CONFIG["temp_file"], "w", encoding="utf-8") as f:
-            json.dump(final_data, f, ensure_ascii=False, indent=2)
+        write_json_array(CONFIG["temp_file"], final_data.iter_items())
         sys.exit(0)
 
 
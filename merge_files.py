@@ -1,8 +1,11 @@
 # merge_files.py (Phiên bản đã sửa lỗi)
-import json
 import os
 import logging
 
+from utils.jsonstream import JsonArrayWriter, iter_json_array
+from utils.logger import log_peak_rss
+from utils.string_table import StringTable
+
 # --- CẤU HÌNH ---
 # Điền đúng tên các file của bạn vào đây
 ORIGINAL_FILE = "strings.json" # File gốc ban đầu
@@ -12,67 +15,117 @@ FINAL_OUTPUT_FILE = "FINAL_GAME_DATA.json" # Tên file cuối cùng sau khi gộ
 # Thiết lập logger đơn giản
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+class _CountMismatch(Exception):
+    """Số mục ghi ra khác số mục đọc từ file gốc."""
+
+
+def _is_ascending(path: str) -> bool:
+    """Kiểm tra (theo luồng) các index trong file có tăng dần nghiêm ngặt hay không."""
+    last = None
+    for item in iter_json_array(path):
+        index = item.get('index')
+        if not isinstance(index, int) or (last is not None and index <= last):
+            return False
+        last = index
+    return True
+
+
+def _count_items(items, stats):
+    """Đếm số mục đọc được từ file gốc vào `stats['original']`, độc lập với số mục đã ghi."""
+    for item in items:
+        stats['original'] += 1
+        yield item
+
+
+def _merge_sorted(original_items, translated_items, stats):
+    """
+    Gộp hai luồng đã sắp xếp tăng dần theo index (merge-join), bộ nhớ không đổi.
+    """
+    pending = next(translated_items, None)
+    for item in original_items:
+        index = item.get('index')
+        while pending is not None and pending['index'] < index:
+            stats['unmatched'] += 1
+            pending = next(translated_items, None)
+        if pending is not None and pending['index'] == index:
+            item['value'] = pending['value']
+            stats['updated'] += 1
+            pending = next(translated_items, None)
+        yield item
+    while pending is not None:
+        stats['unmatched'] += 1
+        pending = next(translated_items, None)
+
+
+def _merge_with_table(original_items, translated: StringTable, stats):
+    """Gộp khi dữ liệu không được sắp xếp: tra cứu bản dịch O(1) qua bảng chuỗi gọn."""
+    matched = 0
+    for item in original_items:
+        entry = translated.get(item.get('index'))
+        if entry is not None:
+            item['value'] = entry.value
+            stats['updated'] += 1
+            matched += 1
+        yield item
+    stats['unmatched'] += max(len(translated) - matched, 0)
+
+
 def merge_data():
     """
     Gộp dữ liệu đã dịch vào file gốc để tạo ra file cuối cùng,
     đảm bảo giữ nguyên thứ tự và số lượng.
+
+    Cả hai file được đọc và file cuối cùng được ghi theo luồng (từng mục một), nên bộ nhớ
+    dùng không phụ thuộc số lượng mục khi index trong hai file đều tăng dần (trường hợp
+    thông thường với file từ il2cpp). Nếu không, bản dịch được nạp vào một `StringTable`.
     """
     logging.info("🚀 Bắt đầu GIAI ĐOẠN 3: Gộp dữ liệu...")
 
-    # ======================================================================
-    # ==== SỬA LỖI TẠI ĐÂY ====
-    # ======================================================================
-    # Bước 1: Đọc file gốc vào biến original_data để làm cơ sở so sánh
-    try:
-        with open(ORIGINAL_FILE, "r", encoding="utf-8") as f:
-            original_data = json.load(f)
-        
-        # Tạo một bản sao để làm việc, đây sẽ là dữ liệu cuối cùng của chúng ta
-        final_data = original_data.copy()
-        logging.info(f"📖 Đã đọc {len(original_data)} mục từ file gốc '{ORIGINAL_FILE}'.")
-    except FileNotFoundError:
+    # Bước 1: Kiểm tra file gốc và file đã dịch
+    if not os.path.exists(ORIGINAL_FILE):
         logging.error(f"❌ Lỗi: Không tìm thấy file gốc '{ORIGINAL_FILE}'. Vui lòng kiểm tra lại cấu hình.")
         return
-
-    # Bước 2: Đọc file đã dịch
-    try:
-        with open(TRANSLATED_FILE, "r", encoding="utf-8") as f:
-            translated_data = json.load(f)
-        logging.info(f"📖 Đã đọc {len(translated_data)} mục đã được dịch từ '{TRANSLATED_FILE}'.")
-    except FileNotFoundError:
+    if not os.path.exists(TRANSLATED_FILE):
         logging.error(f"❌ Lỗi: Không tìm thấy file đã dịch '{TRANSLATED_FILE}'. Bạn đã chạy Giai đoạn 2 chưa?")
         return
 
-    # Bước 3: Tạo một "từ điển" từ dữ liệu đã dịch để tra cứu nhanh
-    logging.info("⚙️  Tạo bản đồ tra cứu từ dữ liệu đã dịch...")
-    translated_map = {item['index']: item['value'] for item in translated_data}
-
-    # Bước 4: Cập nhật file gốc với các bản dịch
-    update_count = 0
-    index_to_position = {item['index']: pos for pos, item in enumerate(final_data)}
+    # Bước 2: Chọn cách gộp. Hai file cùng tăng dần theo index -> gộp theo luồng (merge-join).
+    stats = {'original': 0, 'updated': 0, 'unmatched': 0}
+    original_items = _count_items(iter_json_array(ORIGINAL_FILE), stats)
+    if _is_ascending(ORIGINAL_FILE) and _is_ascending(TRANSLATED_FILE):
+        logging.info("⚙️  Index của hai file đều tăng dần, gộp theo luồng (merge-join)...")
+        merged = _merge_sorted(original_items, iter_json_array(TRANSLATED_FILE), stats)
+    else:
+        logging.info("⚙️  Tạo bảng tra cứu từ dữ liệu đã dịch...")
+        translated = StringTable.from_items(iter_json_array(TRANSLATED_FILE))
+        logging.info(f"📖 Đã đọc {len(translated)} mục đã được dịch từ '{TRANSLATED_FILE}'.")
+        merged = _merge_with_table(original_items, translated, stats)
 
+    # Bước 3: Cập nhật file gốc với các bản dịch và lưu file cuối cùng
     logging.info("🔄 Bắt đầu cập nhật file gốc với các bản dịch...")
-    for original_index, translated_value in translated_map.items():
-        if original_index in index_to_position:
-            position = index_to_position[original_index]
-            final_data[position]['value'] = translated_value
-            update_count += 1
+    try:
+        with JsonArrayWriter(FINAL_OUTPUT_FILE) as writer:
+            for item in merged:
+                writer.write(item)
 
-    logging.info(f"✅ Đã cập nhật thành công {update_count} mục.")
+            logging.info(f"📖 Đã đọc {stats['original']} mục từ file gốc '{ORIGINAL_FILE}'.")
+            logging.info(f"✅ Đã cập nhật thành công {stats['updated']} mục.")
+            if stats['unmatched']:
+                logging.warning(f"⚠️ Có {stats['unmatched']} mục đã dịch không tìm thấy index tương ứng trong file gốc.")
 
-    # Bước 5: Kiểm tra lại lần cuối (Bây giờ sẽ hoạt động)
-    if len(final_data) != len(original_data):
-        logging.error("❌ LỖI NGHIÊM TRỌNG: Số lượng mục trong file cuối cùng không khớp với file gốc!")
+            # Bước 4: Kiểm tra lại lần cuối, TRƯỚC khi file tạm thay thế file cuối cùng:
+            # báo lỗi bên trong `with` để writer xóa file tạm và giữ nguyên file cũ.
+            if writer.count != stats['original']:
+                raise _CountMismatch(f"đã ghi {writer.count} mục, file gốc có {stats['original']} mục")
+    except _CountMismatch as e:
+        logging.error(f"❌ LỖI NGHIÊM TRỌNG: Số lượng mục trong file cuối cùng không khớp với file gốc ({e})! "
+                      f"'{FINAL_OUTPUT_FILE}' không được ghi.")
         return
 
     logging.info("🛡️  Kiểm tra tính toàn vẹn thành công. Số lượng mục khớp.")
-
-    # Bước 6: Lưu file cuối cùng
-    with open(FINAL_OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
-
     logging.info(f"🎉 Hoàn tất! File cuối cùng đã được lưu tại: '{FINAL_OUTPUT_FILE}'")
     logging.info("File này đã sẵn sàng để bạn chuyển đổi lại thành global-metadata.dat.")
+    log_peak_rss(logging.getLogger())
 
 
 if __name__ == "__main__":
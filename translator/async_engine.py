@@ -0,0 +1,272 @@
+# translator/async_engine.py
+"""
+Bộ máy dịch dùng asyncio, thay thế cho mô hình "một luồng cho mỗi key" (`TranslatorWorker`).
+
+Với `TranslatorWorker`, mỗi key chỉ có MỘT request tại một thời điểm: thông lượng của key
+bị giới hạn bởi thời gian phản hồi của API chứ không phải bởi hạn mức RPM. Ở đây, một
+event loop duy nhất giữ nhiều request đồng thời (`concurrent_requests_per_key`) cho mỗi
+key, trong khi vẫn giãn thời điểm BẮT ĐẦU các request theo hạn mức RPM/TPM của key đó
+(`translator/rate_limiter.py`).
+
+Phần việc tốn CPU (gom batch, bảo vệ placeholder, dựng prompt, ước lượng token, đọc response,
+khôi phục) chạy trong một executor để event loop luôn sẵn sàng nhận response của các request khác.
+
+Bộ máy chạy trong một luồng riêng và dùng cùng bộ chia batch (`AdaptiveBatcher`) và
+`results_queue` với `TranslatorWorker`, nên `run_translation` dùng được cả hai như nhau.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Queue
+from typing import Dict, List, Optional
+
+from config import CONFIG
+from translator.batcher import AdaptiveBatcher
+from translator.client_pool import ClientPool
+from translator.glossary import GlossaryIndex
+from translator.key_health import KeyScheduler
+from translator.routing import ModelRouter, Route
+from translator.rate_limiter import KeyLimiter, RateLimiter, backoff_delay, is_rate_limited, retry_after
+from translator.wire import (StreamingParse, WireItem, calibrate, check_truncated, chunk_text, estimate_request_tokens,
+                             generation_config, get_wire_format, response_tokens, token_comparison)
+
+logger = logging.getLogger("TranslatorLogger")
+
+# Thời gian chờ (giây) trước khi kiểm tra lại bể công việc đang trống.
+_IDLE_POLL = 0.2
+# Thời gian chờ tối đa (giây) giữa hai lần hỏi lại bộ điều phối khi key chưa được gửi request.
+_SCHEDULER_POLL = 1.0
+
+
+class _KeyState:
+    """Trạng thái của một API key trong event loop."""
+
+    def __init__(self, key_id: int):
+        self.key_id = key_id
+        self.in_flight = 0
+        self.completed = 0
+
+
+async def _acquire(limiter: KeyLimiter, tokens: int):
+    """Giữ chỗ trong hạn mức RPM/TPM của key rồi chờ đến lượt (không chặn event loop)."""
+    reservation = limiter.reserve(tokens)
+    if reservation.wait > 0:
+        await asyncio.sleep(reservation.wait)
+    return reservation
+
+
+class AsyncTranslationEngine(threading.Thread):
+    """
+    Một luồng chạy event loop cho TẤT CẢ các key.
+
+    Args:
+        api_keys: Danh sách API key.
+        batcher: Bộ chia batch động dùng chung (giống `TranslatorWorker`).
+        results_queue: Nơi đặt kết quả `{'batch_id', 'results'}`.
+        glossary: Chỉ mục bảng thuật ngữ (chọn thuật ngữ cho từng batch).
+        concurrency: Số request đồng thời tối đa cho mỗi key
+            (mặc định `concurrent_requests_per_key` trong CONFIG).
+        rate_limiter: Hạn mức RPM/TPM dùng chung (xem `translator/rate_limiter.py`).
+        scheduler: Bộ điều phối theo sức khỏe key (xem `translator/key_health.py`).
+        client_pool: Client riêng của từng key (xem `translator/client_pool.py`).
+        router: Bộ định tuyến model theo độ khó (xem `translator/routing.py`).
+    """
+
+    def __init__(self, api_keys: List[str], batcher: AdaptiveBatcher, results_queue: Queue,
+                 glossary: GlossaryIndex, concurrency: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None, scheduler: Optional[KeyScheduler] = None,
+                 client_pool: Optional[ClientPool] = None, router: Optional[ModelRouter] = None):
+        super().__init__()
+        self.api_keys = api_keys
+        self.batcher = batcher
+        self.results_queue = results_queue
+        self.glossary = glossary
+        self.concurrency = max(1, concurrency or CONFIG.get("concurrent_requests_per_key", 4))
+        self.wire = get_wire_format()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.scheduler = scheduler or KeyScheduler()
+        self.pool = client_pool or ClientPool(dict(enumerate(api_keys, 1)))
+        self.router = router or ModelRouter()
+        self.timeout = CONFIG.get("request_timeout", 120)
+        self.stream = CONFIG.get("stream_responses", False)
+        self.keys: List[_KeyState] = []
+        # batch_id -> task đang dịch batch đó (để hủy bản thua khi gửi lặp).
+        self._running: Dict[int, asyncio.Task] = {}
+        self.name = "AsyncEngine"
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        for key_id, api_key in enumerate(self.api_keys, 1):
+            self.scheduler.register(key_id, self.concurrency)
+            try:
+                self.pool.check(key_id, asynchronous=True)
+                self.keys.append(_KeyState(key_id))
+                logger.info(f"Đã cấu hình model thành công với Key #{key_id}.")
+            except Exception as e:
+                logger.error(f"LỖI NGHIÊM TRỌNG khi cấu hình Key #{key_id}: {e}")
+                self.scheduler.disable(key_id, str(e))
+        if not self.keys:
+            return
+
+        logger.info(f"⚡ Bộ máy asyncio: {len(self.keys)} key x {self.concurrency} request đồng thời.")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.keys) * self.concurrency, thread_name_prefix="AsyncCPU") as cpu:
+            await asyncio.gather(*(
+                self._consumer(key, cpu) for key in self.keys for _ in range(self.concurrency)
+            ))
+        elapsed = max(time.monotonic() - started, 1e-9)
+        for key in self.keys:
+            logger.info(f"  - Key #{key.key_id}: {key.completed} batch ({key.completed / elapsed * 60:.1f} batch/phút)")
+
+    async def _next_batch(self, key: _KeyState, loop, cpu: ThreadPoolExecutor) -> Optional[Dict]:
+        """Batch kế tiếp trong bể cho `key`, hoặc None khi đã hết việc."""
+        # Gom batch (ước lượng token từng mục) chạy trong executor; batch vẫn thuộc về luồng của bộ máy.
+        next_batch = partial(self.batcher.next_batch, timeout=0, key=key.key_id, owner=self)
+        while True:
+            batch = await loop.run_in_executor(cpu, next_batch)
+            if batch is not None or self.batcher.finished:
+                return batch
+            # Các mục còn lại đang được dịch: chờ xem có mục nào bị trả lại không.
+            await asyncio.sleep(_IDLE_POLL)
+
+    async def _consumer(self, key: _KeyState, cpu: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = self.scheduler.acquire(key.key_id)
+            if wait is None:
+                return
+            if wait > 0:
+                # Mạch của key đang mở, hoặc key đã đủ số request theo thông lượng của nó.
+                if self.batcher.finished:
+                    return
+                await asyncio.sleep(min(wait, _SCHEDULER_POLL))
+                continue
+            try:
+                batch = await self._next_batch(key, loop, cpu)
+                if batch is None:
+                    return
+                task = asyncio.ensure_future(self._process(key, batch, loop, cpu))
+                self._running[batch['batch_id']] = task
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    logger.info(f"[Key #{key.key_id}] Hủy batch #{batch['batch_id']}: bản gửi lặp đã xong trước.")
+                finally:
+                    self._running.pop(batch['batch_id'], None)
+            finally:
+                self.scheduler.release(key.key_id)
+
+    async def _process(self, key: _KeyState, batch: Dict, loop, cpu: ThreadPoolExecutor) -> None:
+        """Dịch một batch; kết quả vào `results_queue`, lỗi được báo cho bộ chia batch và bộ điều phối."""
+        # Tuyến model của batch (xem `translator/routing.py`); hạn mức RPM/TPM có thể riêng theo model.
+        route = self.router.select(batch['route'])
+        limiter = route.limiter(self.rate_limiter, key.key_id)
+        stream = None
+        try:
+            protected_data = await loop.run_in_executor(cpu, self.wire.prepare, batch['data'])
+            if self.stream:
+                stream = StreamingParse(self.wire, protected_data)
+            results, response = await self._translate(key, route, limiter, batch, protected_data, stream, loop, cpu)
+            started = batch['sent_at']
+            if self.batcher.claim(batch):
+                # Đưa kết quả vào hàng đợi TRƯỚC khi báo xong, để luồng chính không kết thúc sớm.
+                self.results_queue.put({'batch_id': batch['batch_id'], 'results': results})
+                self.batcher.complete(batch, time.monotonic() - started)
+                # Gửi lặp: bản còn lại của batch không cần nữa.
+                sibling = self._running.get(batch.get('sibling'))
+                if sibling is not None:
+                    sibling.cancel()
+            else:
+                logger.info(f"[Key #{key.key_id}] Batch #{batch['batch_id']} đã được dịch ở nơi khác, bỏ kết quả.")
+            self.scheduler.success(key.key_id, len(batch['data']), time.monotonic() - started)
+            self.router.success(route, len(batch['data']), time.monotonic() - started, response)
+            key.completed += 1
+        except Exception as e:
+            logger.warning(f"[Key #{key.key_id}] Lỗi khi dịch batch #{batch['batch_id']} "
+                           f"(lần {batch['attempt'] + 1}): {e}")
+            attempt, server_delay = batch['attempt'], None
+            if is_rate_limited(e):
+                # Hết hạn mức: backoff theo số lỗi 429 liên tiếp của key (không phải số lần thử
+                # của batch, vì 429 không tính lượt); tạm dừng cả key nếu server yêu cầu.
+                server_delay = retry_after(e)
+                attempt = limiter.throttle(server_delay)
+            # Các mục được trả lại bể (batch nhỏ hơn) để request khác dịch tiếp ngay;
+            # các bản dịch đã nhận qua streaming được giữ lại.
+            kept = stream.kept(e) if stream else ()
+            if stream:
+                held = stream.pending(kept)
+                if held:
+                    self.results_queue.put({'batch_id': batch['batch_id'], 'results': held, 'partial': True})
+            kind = self.batcher.fail(batch, e, kept)
+            self.scheduler.failure(key.key_id, kind)
+            self.router.failure(route, kind)
+            await asyncio.sleep(backoff_delay(attempt, server_delay=server_delay))
+
+    async def _generate_streaming(self, model, prompt: str, batch: Dict, stream: StreamingParse, loop, cpu):
+        """Gửi request streaming; mỗi bản dịch được đưa vào hàng đợi ngay khi đọc được."""
+        response = await model.generate_content_async(
+            prompt, stream=True, generation_config=generation_config(self.wire, stream.items),
+            request_options={"timeout": self.timeout})
+        async for chunk in response:
+            results = await loop.run_in_executor(cpu, stream.feed, chunk_text(chunk))
+            if results:
+                self.results_queue.put({'batch_id': batch['batch_id'], 'results': results, 'partial': True})
+                self.batcher.stream_progress(batch, len(stream.delivered))
+        return response
+
+    async def _translate(self, key: _KeyState, route: Route, limiter: KeyLimiter, batch: Dict,
+                         protected_data: List[WireItem], stream: Optional[StreamingParse], loop, cpu):
+        """
+        Dịch một batch bằng model của `route`; trả về (kết quả, response). Khi có `stream`, các
+        bản dịch được gửi dần và kết quả trả về chỉ gồm các bản dịch còn được giữ lại.
+        """
+        batch_id = batch['batch_id']
+        # Chỉ đưa vào prompt các thuật ngữ thực sự có trong batch.
+        glossary = await loop.run_in_executor(cpu, self.glossary.select, [item.text for item in protected_data])
+        prompt = await loop.run_in_executor(cpu, self.wire.build_prompt, protected_data, glossary)
+
+        tokens = await loop.run_in_executor(cpu, estimate_request_tokens, prompt, protected_data, self.batcher.calibrator)
+        reservation = await _acquire(limiter, tokens)
+        # Thời gian của batch tính từ lúc gửi request, không gồm thời gian chờ hạn mức phía client.
+        self.batcher.sent(batch)
+        key.in_flight += 1
+        on_route = f", tuyến '{route.name}'" if self.router.enabled else ""
+        logger.info(f"[Key #{key.key_id}] Đang xử lý batch #{batch_id} ({len(batch['data'])} mục{on_route}, "
+                    f"{key.in_flight} request đang chờ).")
+        try:
+            # Kết nối của key được giữ đến khi đọc hết response (kể cả khi streaming).
+            async with self.pool.lease_async(key.key_id, route.model_name) as model:
+                if stream:
+                    response = await self._generate_streaming(model, prompt, batch, stream, loop, cpu)
+                else:
+                    response = await model.generate_content_async(
+                        prompt, generation_config=generation_config(self.wire, protected_data),
+                        request_options={"timeout": self.timeout})
+        finally:
+            key.in_flight -= 1
+        limiter.settle(reservation, response_tokens(response))
+        await loop.run_in_executor(cpu, calibrate, self.batcher.calibrator, prompt, protected_data, response)
+        check_truncated(response)
+
+        if stream:
+            # Các bản dịch đã được đưa vào hàng đợi trong lúc đọc (trừ các bản dịch được giữ
+            # lại đến khi kiểm tra xong response, với định dạng theo vị trí).
+            stream.finish()
+            raw_output = stream.raw_output
+            final_results = stream.pending()
+        else:
+            raw_output = response.text.strip()
+            # Đọc response, kiểm tra số lượng mục trả về và khôi phục placeholder
+            final_results = await loop.run_in_executor(cpu, self.wire.parse, raw_output, protected_data)
+
+        comparison = await loop.run_in_executor(cpu, token_comparison, self.wire, protected_data, prompt,
+                                                raw_output, glossary)
+        if comparison:
+            logger.info(f"Batch #{batch_id}: {comparison}")
+        return final_results, response
@@ -0,0 +1,100 @@
+# translator/backends.py
+"""
+Backend dịch: nơi tạo model và kết nối mà `ClientPool` (`translator/client_pool.py`) cho mượn.
+
+Mọi nơi gọi API (`TranslatorWorker`, `AsyncTranslationEngine`) chỉ dùng giao diện của
+`GenerativeModel`: `generate_content(prompt, stream=..., generation_config=..., request_options=...)`
+và `generate_content_async(...)`, response có `.text`, `.candidates[].finish_reason` và
+`.usage_metadata`; lỗi mang `code` HTTP (429, 401/403...). Một backend chỉ cần tạo ra các
+model có giao diện đó:
+
+- `gemini` (mặc định): Gemini API thật qua `google.generativeai`, mỗi model có client gRPC riêng;
+- `fake`: Gemini giả chạy trong tiến trình (`translator/fake_backend.py`), trả về bản dịch
+  tất định, mô phỏng độ trễ, lỗi 429, response bị cắt cụt hoặc JSON hỏng, để chạy thử tải
+  toàn bộ pipeline mà không tốn hạn mức (xem `benchmark_translation.py`).
+
+Chọn backend bằng `backend` trong CONFIG.
+
+`GeminiBackend` gắn client riêng vào thuộc tính nội bộ `_client` / `_async_client` của
+`GenerativeModel` và đọc kênh gRPC từ `_transport.grpc_channel`. Đây không phải API công khai
+của SDK, nên phiên bản `google-generativeai` được ghim trong requirements.txt và backend báo
+lỗi ngay (thay vì lặng lẽ dùng client toàn cục) nếu SDK không còn các thuộc tính đó.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from config import CONFIG
+
+
+def _sdk_error(what: str) -> RuntimeError:
+    import google.generativeai as genai
+    return RuntimeError(f"google-generativeai {getattr(genai, '__version__', '?')} không còn {what}: không thể "
+                        f"dùng client riêng cho từng key. Cài đúng phiên bản trong requirements.txt.")
+
+
+def _channel(client):
+    """Kênh gRPC của một client `GenerativeService`."""
+    channel = getattr(getattr(client, "_transport", None), "grpc_channel", None)
+    if channel is None:
+        raise _sdk_error("`_transport.grpc_channel` trong client GenerativeService")
+    return channel
+
+
+class GeminiBackend:
+    """Gemini API thật: mỗi model mang client gRPC riêng, không dùng `genai.configure` toàn cục."""
+
+    name = "gemini"
+
+    def make_model(self, api_key: str, asynchronous: bool, model_name: str):
+        """`GenerativeModel` với client riêng cho `api_key` (không đụng đến client mặc định toàn cục)."""
+        import google.generativeai as genai
+        from google.ai import generativelanguage as glm
+
+        model = genai.GenerativeModel(model_name)
+        attribute = "_async_client" if asynchronous else "_client"
+        if attribute not in vars(model):
+            # SDK đổi cách giữ client: gán vào thuộc tính mới sẽ bị bỏ qua và request đi bằng client toàn cục.
+            raise _sdk_error(f"thuộc tính `GenerativeModel.{attribute}`")
+        if asynchronous:
+            model._async_client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+        else:
+            model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        return model
+
+    def connect(self, model, timeout: float) -> float:
+        """
+        Chờ kênh gRPC của model kết nối xong; trả về thời gian thiết lập (giây).
+
+        Raises:
+            TimeoutError: Kênh chưa sẵn sàng sau `timeout` giây.
+            RuntimeError: SDK không còn các thuộc tính nội bộ mà backend dựa vào.
+        """
+        import grpc
+
+        channel = _channel(model._client)
+        started = time.monotonic()
+        try:
+            grpc.channel_ready_future(channel).result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            raise TimeoutError(f"Kênh gRPC chưa sẵn sàng sau {timeout:.0f} giây.")
+        return time.monotonic() - started
+
+    async def connect_async(self, model, timeout: float) -> float:
+        """Giống `connect` cho client asyncio."""
+        channel = _channel(getattr(model._async_client, "_client", None))
+        started = time.monotonic()
+        await asyncio.wait_for(channel.channel_ready(), timeout)
+        return time.monotonic() - started
+
+
+def get_backend(name: Optional[str] = None):
+    """Backend theo tên (mặc định lấy `backend` trong CONFIG)."""
+    name = name or CONFIG.get("backend", "gemini")
+    if name == GeminiBackend.name:
+        return GeminiBackend()
+    if name == "fake":
+        from translator.fake_backend import FakeGeminiBackend
+        return FakeGeminiBackend()
+    raise ValueError(f"backend không hợp lệ: '{name}'. Chọn một trong: gemini, fake")
@@ -0,0 +1,501 @@
+# translator/batcher.py
+"""
+Chia batch động từ một "bể" các mục đang chờ dịch, dùng chung cho mọi worker.
+
+Thay vì chia sẵn toàn bộ dữ liệu thành các batch cố định `initial_batch_size` mục,
+batch được tạo ra ĐÚNG LÚC một worker rảnh, với kích thước hiện tại của bộ chia:
+
+- batch thành công, đúng số lượng và đủ nhanh (dưới `batch_target_seconds`): tăng
+  kích thước x1.25 (tối đa `max_batch_size`);
+- batch thành công nhưng chậm: giảm nhẹ x0.9;
+- batch lỗi (sai số lượng, JSON hỏng, timeout, bị cắt cụt do hết token output...):
+  giảm một nửa (tối thiểu `min_batch_size`), và các mục của batch được trả lại ĐẦU bể.
+
+Chia đôi batch lỗi (bisection): mỗi mục bị trả lại nhớ kích thước batch tối đa mà nó được
+phép vào (bằng một nửa batch vừa lỗi, nhỏ nhất là 1), nên một batch lỗi được gửi lại thành
+hai nửa, nửa nào lỗi lại bị chia đôi tiếp... Các mục tốt được cứu trong các nửa thành công,
+còn chuỗi "khó" bị cô lập thành batch một mục. Chỉ lỗi của batch MỘT mục mới được tính
+lượt; sau `max_api_retries` lượt, mục đó bị bỏ qua và được ghi vào file dead-letter
+(`dead_letter_file`, mỗi dòng một JSON) để xem lại.
+
+Mỗi batch đang dịch được "cho mượn" cho luồng đã lấy nó. Nếu luồng đó chết giữa chừng,
+`reclaim_orphans` (được gọi định kỳ từ luồng chính) trả các mục về bể, nên việc đếm số
+mục đã xong không bao giờ bị treo vì một batch biến mất.
+
+Ngoài số mục, mỗi batch còn bị giới hạn bởi ngân sách token `batch_token_budget` (phần
+gửi đi + bản dịch, ước lượng bằng `TokenCalibrator` đã hiệu chỉnh theo số token thực tế
+của API): 50 nhãn UI một từ và 50 đoạn hội thoại dài không còn tốn như nhau. Chuỗi dài
+(từ `long_string_tokens` trở lên) luôn được gửi riêng một mình và được gửi trước, để
+chúng không làm các batch khác bị cắt cụt. Response bị cắt cụt (MAX_TOKENS) làm giảm
+ngân sách token; batch đầy dịch nhanh làm nó tăng dần trở lại (tối đa `batch_token_budget`).
+
+Khi có nhiều request đồng thời, một lỗi chỉ làm giảm kích thước nếu batch lỗi đã "đầy"
+theo kích thước hiện tại hoặc ngân sách token (tránh giảm nhiều lần vì cùng một đợt lỗi).
+
+Với bảng chuỗi (`table`, `utils/string_table.py`), bể chỉ giữ VỊ TRÍ của các mục trong bảng:
+dict `{'index', 'value'}` chỉ được dựng khi mục được đưa vào batch (mục bị trả lại bể giữ
+nguyên dict của batch), nên bể không tốn thêm bộ nhớ theo số chuỗi chờ dịch.
+
+Với bộ định tuyến model (`translator/routing.py`), mỗi tuyến có bể riêng và một batch chỉ
+gồm các mục cùng tuyến (`batch['route']`); các tuyến được lấy việc lần lượt.
+
+Gửi lặp (hedging, `hedge_requests`): cuối lần chạy, khi bể đã trống và các key đang rảnh,
+một batch đã dịch lâu hơn phân vị `hedge_percentile` thời gian của các batch đã xong được
+gửi thêm một bản sao cho key khác (`batch['sibling']` trỏ tới bản còn lại). Bản nào xong
+trước thì thắng (`claim`), bản kia bị bỏ; bản lỗi trong khi bản kia còn chạy không làm các
+mục bị trả lại bể. Tổng số mục được gửi lặp không vượt quá `hedge_max_fraction` số mục.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import CONFIG
+from translator.rate_limiter import is_auth_error, is_rate_limited
+from translator.wire import CountMismatch, TruncatedResponse
+from utils.string_table import ref_fields
+from utils.tokens import TokenCalibrator
+
+logger = logging.getLogger("TranslatorLogger")
+
+GROW_FACTOR = 1.25
+SLOW_FACTOR = 0.9
+SHRINK_FACTOR = 0.5
+
+# Số batch đã xong tối thiểu trước khi tính phân vị thời gian để gửi lặp.
+_HEDGE_MIN_SAMPLES = 5
+# Thời gian chờ (giây) giữa hai lần kiểm tra batch chậm khi bể trống.
+_HEDGE_POLL = 0.5
+
+# Các loại lỗi của một batch.
+FAILURE_RATE_LIMIT = "rate_limit"
+FAILURE_AUTH = "auth"
+FAILURE_COUNT = "count_mismatch"
+FAILURE_TRUNCATED = "truncated"
+FAILURE_TIMEOUT = "timeout"
+FAILURE_JSON = "json"
+FAILURE_OTHER = "error"
+
+
+def classify_failure(error: Exception) -> str:
+    """Loại lỗi của một batch (xem các hằng `FAILURE_*`)."""
+    if is_rate_limited(error):
+        return FAILURE_RATE_LIMIT
+    if is_auth_error(error):
+        return FAILURE_AUTH
+    if isinstance(error, CountMismatch):
+        return FAILURE_COUNT
+    if isinstance(error, TruncatedResponse):
+        return FAILURE_TRUNCATED
+    name = type(error).__name__
+    if isinstance(error, TimeoutError) or "DeadlineExceeded" in name or "Timeout" in name \
+            or "timed out" in str(error).lower():
+        return FAILURE_TIMEOUT
+    if isinstance(error, (json.JSONDecodeError, ValueError)):
+        return FAILURE_JSON
+    return FAILURE_OTHER
+
+
+class AdaptiveBatcher:
+    """
+    Bể các mục chờ dịch + kích thước batch thích ứng (an toàn khi dùng từ nhiều luồng).
+
+    Args:
+        items: Các mục `{'index', 'value'}` cần dịch, hoặc vị trí của chúng trong `table`.
+        initial_size / min_size / max_size: Kích thước batch (mặc định lấy từ CONFIG).
+        target_seconds: Thời gian phản hồi mà một batch "đủ nhanh" không được vượt quá.
+        max_attempts: Số lần lỗi tối đa của một mục trong batch một mục trước khi bỏ qua.
+        token_budget: Số token ước lượng tối đa của các mục trong một batch.
+        long_tokens: Chuỗi tốn từ chừng này token trở lên được gửi riêng.
+        calibrator: Bộ hiệu chỉnh ước lượng token (dùng chung với worker).
+        dead_letter_file: File JSON Lines ghi các mục bị bỏ qua.
+        router: Bộ định tuyến model (`ModelRouter`); None = mọi mục cùng một tuyến.
+        hedge_percentile: Phân vị (0..1) thời gian batch để gửi lặp; None = theo CONFIG
+            (`hedge_requests` tắt thì không gửi lặp).
+        hedge_max_fraction: Tỷ lệ tối đa số mục được gửi lặp.
+        table: Bảng chuỗi (`StringTable`) chứa các mục khi `items` là vị trí.
+    """
+
+    def __init__(self, items: Iterable, initial_size: Optional[int] = None, min_size: Optional[int] = None,
+                 max_size: Optional[int] = None, target_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None, token_budget: Optional[int] = None,
+                 long_tokens: Optional[int] = None, calibrator: Optional[TokenCalibrator] = None,
+                 dead_letter_file: Optional[str] = None, router=None, hedge_percentile: Optional[float] = None,
+                 hedge_max_fraction: Optional[float] = None, table=None):
+        self.min_size = max(1, min_size or CONFIG.get("min_batch_size", 5))
+        self.max_size = max(self.min_size, max_size or CONFIG.get("max_batch_size", 200))
+        initial = initial_size or CONFIG.get("initial_batch_size", 50)
+        self.size = float(min(max(initial, self.min_size), self.max_size))
+        self.target_seconds = target_seconds or CONFIG.get("batch_target_seconds", 30)
+        self.max_attempts = max_attempts or CONFIG["max_api_retries"]
+        self.dead_letter_file = dead_letter_file or CONFIG.get("dead_letter_file", "dead_letter.jsonl")
+
+        if hedge_percentile is None and CONFIG.get("hedge_requests", False):
+            if CONFIG.get("stream_responses", False):
+                logger.warning("⚠️ Không gửi lặp (hedge_requests) khi dùng stream_responses.")
+            else:
+                hedge_percentile = CONFIG.get("hedge_percentile", 0.9)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_fraction = hedge_max_fraction or CONFIG.get("hedge_max_fraction", 0.05)
+
+        self.calibrator = calibrator or TokenCalibrator()
+        self.token_budget = float(token_budget or CONFIG.get("batch_token_budget", 6000))
+        self.max_token_budget = self.token_budget
+        self.long_tokens = long_tokens or CONFIG.get("long_string_tokens", 1500)
+
+        # Mỗi tuyến một bể; chuỗi dài được tách ra bể riêng và gửi từng chuỗi một.
+        # Phần tử của bể là vị trí trong `table`, hoặc dict của mục (không có bảng / bị trả lại).
+        self.table = table
+        self._pending: Dict[Optional[str], Deque] = {}
+        self._long: Deque = deque()
+        self._long_indexes = set()
+        self._routes: Dict[int, Optional[str]] = {}
+        self._turn = 0
+        total = 0
+        for ref in items:
+            total += 1
+            index, value = ref_fields(ref, table)
+            text = str(value)
+            cost = self.calibrator.item_cost(text)
+            if router is not None:
+                self._routes[index] = router.route(text, cost)
+            if cost >= self.long_tokens:
+                self._long.append(ref)
+                self._long_indexes.add(index)
+            else:
+                self._pending.setdefault(self._routes.get(index), deque()).append(ref)
+        # index -> số lần lỗi / kích thước batch tối đa được phép (chỉ cho các mục từng lỗi).
+        self._attempts: Dict[int, int] = {}
+        self._caps: Dict[int, int] = {}
+        # batch_id -> (batch, luồng đang dịch batch đó).
+        self._leases: Dict[int, Tuple[Dict, threading.Thread]] = {}
+        self._next_id = 0
+        self._cond = threading.Condition()
+
+        self.total = total
+        self.translated = 0
+        self.dropped: List[Dict] = []
+        self.failures: Counter = Counter()
+        self.batches = 0
+        self.smallest = self.biggest = int(self.size)
+        self.isolated = len(self._long)
+        # Thời gian (giây) của các batch đã xong, để tính ngưỡng gửi lặp.
+        self._durations: List[float] = []
+        self.hedges = 0
+        self.hedged_items = 0
+        self.hedges_won = 0
+
+    # ------------------------------------------------------------------
+    # LẤY BATCH
+    # ------------------------------------------------------------------
+    @property
+    def finished(self) -> bool:
+        """Không còn mục nào chờ dịch hay đang được dịch."""
+        with self._cond:
+            return not self._has_pending() and not self._long and not self._leases
+
+    @property
+    def resolved(self) -> int:
+        """Số mục đã xong (dịch thành công, đã nhận qua streaming, hoặc bị bỏ qua)."""
+        with self._cond:
+            streamed = sum(batch.get('streamed', 0) for batch, _ in self._leases.values())
+            return self.translated + len(self.dropped) + streamed
+
+    def stream_progress(self, batch: Dict, delivered: int) -> None:
+        """Đã nhận `delivered` mục của batch đang dịch (response streaming), để tiến độ chạy sớm hơn."""
+        with self._cond:
+            batch['streamed'] = delivered
+
+    def next_batch(self, timeout: Optional[float] = None, key: Optional[int] = None,
+                   owner: Optional[threading.Thread] = None) -> Optional[Dict]:
+        """
+        Tạo batch kế tiếp từ đầu bể cho key `key`.
+
+        Chờ tối đa `timeout` giây (None = chờ đến khi có mục hoặc đã xong hết) nếu bể đang
+        trống nhưng còn batch đang dịch (có thể bị trả lại, hoặc được gửi lặp cho key khác).
+        Trả về None nếu không có batch.
+
+        `owner` là luồng chịu trách nhiệm dịch batch (mặc định luồng gọi), dùng bởi
+        `reclaim_orphans` khi hàm được gọi từ một executor.
+        """
+        owner = owner or threading.current_thread()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not (self._has_pending() or self._long or not self._leases):
+                hedge = self._hedge(key, owner)
+                if hedge is not None:
+                    return hedge
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if self.hedge_percentile is not None:
+                    remaining = _HEDGE_POLL if remaining is None else min(remaining, _HEDGE_POLL)
+                self._cond.wait(remaining)
+            if self._long:
+                data, full = [self._item(self._long.popleft())], False
+                tokens = self._cost(data[0])
+            elif self._has_pending():
+                data, tokens, full = self._pack(self._next_route())
+            else:
+                return None
+            self._next_id += 1
+            attempt = max((self._attempts.get(item['index'], 0) for item in data), default=0)
+            batch = {'batch_id': self._next_id, 'data': data, 'attempt': attempt, 'tokens': tokens, 'full': full,
+                     'route': self._routes.get(data[0]['index']), 'key': key, 'leased_at': time.monotonic()}
+            self._leases[self._next_id] = (batch, owner)
+            return batch
+
+    def _hedge(self, key: Optional[int], owner: threading.Thread) -> Optional[Dict]:
+        """Bản sao của batch chậm nhất đang được key khác dịch, nếu đã quá ngưỡng gửi lặp."""
+        threshold = self.hedge_threshold
+        if threshold is None:
+            return None
+        now = time.monotonic()
+        # Chỉ xét các batch đã được gửi: thời gian chờ hạn mức phía client không phải là chậm.
+        candidates = [batch for batch, _ in self._leases.values()
+                      if 'sibling' not in batch and 'sent_at' in batch and batch['key'] != key
+                      and now - batch['sent_at'] > threshold
+                      and self.hedged_items + len(batch['data']) <= self.hedge_max_fraction * self.total]
+        if not candidates:
+            return None
+        original = min(candidates, key=lambda batch: batch['sent_at'])
+        self._next_id += 1
+        hedge = dict(original, batch_id=self._next_id, full=False, key=key, leased_at=now,
+                     sibling=original['batch_id'])
+        del hedge['sent_at']
+        original['sibling'] = hedge['batch_id']
+        self._leases[self._next_id] = (hedge, owner)
+        self.hedges += 1
+        self.hedged_items += len(original['data'])
+        logger.info(f"🪁 Batch #{original['batch_id']} đã chạy {now - original['sent_at']:.1f}s "
+                    f"(> {threshold:.1f}s): gửi lặp thành batch #{hedge['batch_id']}.")
+        return hedge
+
+    @property
+    def hedge_threshold(self) -> Optional[float]:
+        """Thời gian một batch phải chạy trước khi được gửi lặp; None = chưa/không gửi lặp."""
+        if self.hedge_percentile is None or len(self._durations) < _HEDGE_MIN_SAMPLES:
+            return None
+        durations = sorted(self._durations)
+        return durations[min(len(durations) - 1, int(self.hedge_percentile * len(durations)))]
+
+    def _item(self, ref) -> Dict:
+        """Dict `{'index', 'value'}` của một phần tử trong bể (dựng từ bảng nếu là vị trí)."""
+        return ref if isinstance(ref, dict) else self.table.entry_at(ref)
+
+    def _cost(self, item: Dict) -> int:
+        return self.calibrator.item_cost(str(item.get('value', '')))
+
+    def _has_pending(self) -> bool:
+        return any(self._pending.values())
+
+    def _next_route(self) -> Optional[str]:
+        """Tuyến còn mục chờ kế tiếp (lần lượt giữa các tuyến)."""
+        routes = [route for route, pending in self._pending.items() if pending]
+        self._turn += 1
+        return routes[self._turn % len(routes)]
+
+    def _pack(self, route: Optional[str]) -> Tuple[List[Dict], int, bool]:
+        """
+        Lấy các mục từ đầu bể của tuyến `route` cho đến khi đủ kích thước hiện tại hoặc hết ngân sách token.
+
+        Trả về (các mục, số token ước lượng, batch có "đầy" hay không).
+        """
+        pending = self._pending[route]
+        size = int(self.size)
+        limit = size
+        data: List[Dict] = []
+        tokens = 0
+        while pending and len(data) < limit:
+            item = self._item(pending[0])
+            cap = self._caps.get(item['index'])
+            if cap is not None and data and len(data) >= cap:
+                break
+            cost = self._cost(item)
+            if data and tokens + cost > self.token_budget:
+                return data, tokens, True
+            pending.popleft()
+            data.append(item)
+            tokens += cost
+            if cap is not None:
+                limit = min(limit, cap)
+        return data, tokens, len(data) >= size
+
+    # ------------------------------------------------------------------
+    # KẾT QUẢ
+    # ------------------------------------------------------------------
+    def sent(self, batch: Dict) -> float:
+        """
+        Ghi lại thời điểm request của batch được gửi (sau khi chờ hạn mức phía client) và trả về
+        thời điểm đó. Thời gian của batch (kích thước batch, ngưỡng gửi lặp) tính từ đây.
+        """
+        with self._cond:
+            batch['sent_at'] = time.monotonic()
+            return batch['sent_at']
+
+    def claim(self, batch: Dict) -> bool:
+        """
+        Giữ kết quả của batch trước khi đưa vào hàng đợi kết quả. Trả về False nếu phải bỏ kết
+        quả: batch đã bị thu hồi, hoặc bản gửi lặp của nó đã xong trước.
+        """
+        with self._cond:
+            if batch['batch_id'] not in self._leases:
+                return False
+            sibling = batch.get('sibling')
+            if sibling is not None and self._leases.pop(sibling, None) is not None and batch['batch_id'] > sibling:
+                self.hedges_won += 1
+            return True
+
+    def complete(self, batch: Dict, seconds: float) -> None:
+        """Batch dịch thành công sau `seconds` giây."""
+        with self._cond:
+            if self._leases.pop(batch['batch_id'], None) is None:
+                return  # Batch đã bị thu hồi (xem `reclaim_orphans`) và được dịch lại.
+            self._leases.pop(batch.get('sibling'), None)
+            self._durations.append(seconds)
+            self.batches += 1
+            self._resolve(batch['data'])
+            if batch['full']:
+                self._resize(GROW_FACTOR if seconds <= self.target_seconds else SLOW_FACTOR)
+                if seconds <= self.target_seconds:
+                    self._resize_budget(GROW_FACTOR)
+            self._cond.notify_all()
+
+    def fail(self, batch: Dict, error: Exception, delivered: Iterable[int] = ()) -> str:
+        """
+        Batch bị lỗi: chia đôi và trả các mục về đầu bể (hoặc bỏ qua nếu đã hết lượt), điều
+        chỉnh kích thước.
+
+        Lỗi hết hạn mức (429) và lỗi key (401/403) không phải do batch, nên không chia, không
+        tính lượt và không giảm kích thước: các mục chỉ được trả về bể cho key khác dịch.
+
+        `delivered` là index của các mục đã nhận được bản dịch trước khi lỗi (response
+        streaming bị cắt ngang). Chúng được tính là xong, chỉ phần còn lại được dịch lại.
+        Trả về loại lỗi.
+        """
+        kind = classify_failure(error)
+        delivered = set(delivered)
+        with self._cond:
+            if self._leases.pop(batch['batch_id'], None) is None:
+                return kind
+            self.failures[kind] += 1
+            if batch.get('sibling') in self._leases:
+                # Bản gửi lặp của batch vẫn đang chạy: để nó dịch các mục này.
+                self._cond.notify_all()
+                return kind
+            if delivered:
+                self._resolve([item for item in batch['data'] if item['index'] in delivered])
+            data = [item for item in batch['data'] if item['index'] not in delivered]
+            if not data:
+                self._cond.notify_all()
+                return kind
+            if kind in (FAILURE_RATE_LIMIT, FAILURE_AUTH):
+                self._requeue(data)
+            else:
+                if batch['full']:
+                    self._resize(SHRINK_FACTOR)
+                if kind == FAILURE_TRUNCATED and len(data) > 1:
+                    self._resize_budget(SHRINK_FACTOR)
+                cap = max(1, len(data) // 2)
+                retry = []
+                for item in data:
+                    if len(data) > 1:
+                        # Chia đôi: mục chỉ được vào batch tối đa bằng nửa batch vừa lỗi.
+                        self._caps[item['index']] = min(cap, self._caps.get(item['index'], cap))
+                        retry.append(item)
+                        continue
+                    attempts = self._attempts.get(item['index'], 0) + 1
+                    if attempts >= self.max_attempts:
+                        self._drop(item, kind, error)
+                        continue
+                    self._attempts[item['index']] = attempts
+                    retry.append(item)
+                self._requeue(retry)
+                if not retry:
+                    logger.error(f"BỎ QUA mục #{data[0]['index']} (batch #{batch['batch_id']}) sau "
+                                 f"{self.max_attempts} lần thử thất bại, đã ghi vào '{self.dead_letter_file}'.")
+            self._cond.notify_all()
+        return kind
+
+    def reclaim_orphans(self) -> int:
+        """Trả về bể các batch đang được dịch bởi một luồng đã chết. Trả về số mục thu hồi."""
+        with self._cond:
+            orphans = [batch_id for batch_id, (_, owner) in self._leases.items() if not owner.is_alive()]
+            reclaimed = 0
+            for batch_id in orphans:
+                batch, owner = self._leases.pop(batch_id)
+                if batch.get('sibling') in self._leases:
+                    continue  # Bản gửi lặp vẫn đang được dịch.
+                self._requeue(batch['data'])
+                reclaimed += len(batch['data'])
+                logger.warning(f"♻️  Thu hồi batch #{batch_id} ({len(batch['data'])} mục) của luồng đã dừng {owner.name}.")
+            if orphans:
+                self._cond.notify_all()
+            return reclaimed
+
+    def _resolve(self, items: List[Dict]) -> None:
+        """Các mục đã dịch xong."""
+        self.translated += len(items)
+        for item in items:
+            self._attempts.pop(item['index'], None)
+            self._caps.pop(item['index'], None)
+            self._long_indexes.discard(item['index'])
+
+    def _drop(self, item: Dict, kind: str, error: Exception) -> None:
+        """Bỏ qua một mục và ghi nó vào file dead-letter."""
+        self.dropped.append(item)
+        self._attempts.pop(item['index'], None)
+        self._caps.pop(item['index'], None)
+        self._long_indexes.discard(item['index'])
+        record = {'index': item['index'], 'value': item.get('value'), 'failure': kind,
+                  'error': str(error)[:500], 'attempts': self.max_attempts}
+        try:
+            with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"❌ Không ghi được file dead-letter '{self.dead_letter_file}': {e}")
+
+    def _requeue(self, items: List[Dict]) -> None:
+        """Trả các mục về ĐẦU bể tương ứng (chuỗi dài về bể riêng)."""
+        for item in reversed(items):
+            if item['index'] in self._long_indexes:
+                self._long.appendleft(item)
+            else:
+                self._pending.setdefault(self._routes.get(item['index']), deque()).appendleft(item)
+
+    def _resize(self, factor: float) -> None:
+        old = int(self.size)
+        self.size = min(float(self.max_size), max(float(self.min_size), self.size * factor))
+        if factor > 1 and int(self.size) == old and old < self.max_size:
+            # Batch nhỏ: x1.25 có thể chưa đủ để tăng thêm một mục.
+            self.size = float(old + 1)
+        new = int(self.size)
+        self.smallest, self.biggest = min(self.smallest, new), max(self.biggest, new)
+        if new != old:
+            logger.info(f"📦 Kích thước batch: {old} → {new}")
+
+    def _resize_budget(self, factor: float) -> None:
+        old = int(self.token_budget)
+        self.token_budget = min(self.max_token_budget, max(float(self.long_tokens), self.token_budget * factor))
+        if int(self.token_budget) != old:
+            logger.info(f"🪙 Ngân sách token mỗi batch: {old} → {int(self.token_budget)}")
+
+    def report(self) -> List[str]:
+        """Các dòng log tổng kết."""
+        lines = [f"📦 Batch động: {self.batches} batch thành công, kích thước hiện tại {int(self.size)} "
+                 f"(nhỏ nhất {self.smallest}, lớn nhất {self.biggest})",
+                 f"  - Ngân sách token: {int(self.token_budget)}/batch, {self.isolated} chuỗi dài được gửi riêng",
+                 f"  - Hệ số token (hiệu chỉnh theo {self.calibrator.samples} response): "
+                 f"prompt x{self.calibrator.input_ratio:.2f}, bản dịch x{self.calibrator.output_ratio:.2f}"]
+        if self.failures:
+            lines.append("  - Lỗi: " + ", ".join(f"{kind}: {count}" for kind, count in self.failures.most_common()))
+        if self.hedges:
+            lines.append(f"  - 🪁 Gửi lặp {self.hedges} batch ({self.hedged_items} mục), bản gửi lặp xong trước "
+                         f"{self.hedges_won} lần")
+        if self.dropped:
+            lines.append(f"  - ☠️  Bỏ qua {len(self.dropped)} mục sau {self.max_attempts} lần thử thất bại "
+                         f"(xem '{self.dead_letter_file}')")
+        return lines
@@ -0,0 +1,202 @@
+# translator/client_pool.py
+"""
+Bể client Gemini: mỗi key có client RIÊNG, không dùng cấu hình toàn cục `genai.configure`.
+
+`genai.configure(api_key=...)` ghi vào trạng thái dùng chung của cả tiến trình, nên khi mỗi
+luồng gọi nó với key của mình, các luồng ghi đè lên nhau và request có thể đi bằng key
+khác. Ở đây mỗi kết nối là một `GenerativeModel` mang client gRPC riêng được tạo với
+`client_options={"api_key": key}` (do backend tạo, xem `translator/backends.py`).
+
+Mỗi client giữ một kênh gRPC (HTTP/2, keep-alive) và được dùng lại cho mọi batch, nên chỉ
+batch đầu tiên của mỗi kết nối phải trả chi phí thiết lập (TCP + TLS + HTTP/2). Mỗi key có
+tối đa `connections_per_key` kết nối, được tạo dần khi các kết nối hiện có đều đang bận;
+request mới luôn đi vào kết nối ít việc nhất. Thời gian thiết lập và thời gian của request
+đầu tiên so với các request sau được ghi lại để kiểm chứng chi phí mỗi request đã giảm.
+
+Ví dụ:
+    pool = ClientPool({1: "key-1", 2: "key-2"})
+    with pool.lease(1) as model:                # luồng
+        response = model.generate_content(prompt)
+    async with pool.lease_async(2) as model:    # asyncio
+        response = await model.generate_content_async(prompt)
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from config import CONFIG
+from translator.backends import get_backend
+
+logger = logging.getLogger("TranslatorLogger")
+
+# Thời gian chờ tối đa (giây) để một kênh gRPC mới kết nối xong.
+_CONNECT_TIMEOUT = 10.0
+
+
+class Connection:
+    """Một kết nối (client + kênh gRPC riêng) của một key."""
+
+    __slots__ = ("key_id", "slot", "model", "in_use", "connected", "setup_seconds",
+                 "requests", "first_seconds", "later_seconds")
+
+    def __init__(self, key_id: int, slot: int, model):
+        self.key_id = key_id
+        self.slot = slot
+        self.model = model
+        self.in_use = 0
+        self.connected = False
+        self.setup_seconds: Optional[float] = None
+        self.requests = 0
+        # Thời gian của request đầu tiên và tổng thời gian các request sau đó.
+        self.first_seconds: Optional[float] = None
+        self.later_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.requests += 1
+        if self.first_seconds is None:
+            self.first_seconds = seconds
+        else:
+            self.later_seconds += seconds
+
+
+class ClientPool:
+    """
+    Các kết nối riêng của từng key (an toàn khi dùng từ nhiều luồng).
+
+    Args:
+        api_keys (Mapping[int, str]): key_id -> API key.
+        connections_per_key (Optional[int]): Số kết nối tối đa mỗi key
+            (mặc định `connections_per_key` trong CONFIG).
+        model_name (Optional[str]): Tên model mặc định (mặc định `model_name` trong CONFIG); mỗi
+            lần mượn có thể chọn model khác (xem `translator/routing.py`).
+        backend: Backend tạo model và kết nối (mặc định theo `backend` trong CONFIG,
+            xem `translator/backends.py`).
+    """
+
+    def __init__(self, api_keys: Mapping[int, str], connections_per_key: Optional[int] = None,
+                 model_name: Optional[str] = None, backend=None):
+        self.api_keys = dict(api_keys)
+        self.backend = backend or get_backend()
+        self.connections_per_key = max(1, connections_per_key or CONFIG.get("connections_per_key", 2))
+        self.model_name = model_name or CONFIG["model_name"]
+        # (key_id, asyncio?, model) -> các kết nối; client đồng bộ và client asyncio không dùng chung được.
+        self._connections: Dict[Tuple[int, bool, str], List[Connection]] = {}
+        self._lock = threading.Lock()
+
+    def _make_model(self, api_key: str, asynchronous: bool, model_name: str):
+        """Model với client riêng cho `api_key` (không đụng đến client mặc định toàn cục)."""
+        return self.backend.make_model(api_key, asynchronous, model_name)
+
+    def check(self, key_id: int, asynchronous: bool = False) -> None:
+        """
+        Tạo trước kết nối đầu tiên của key để phát hiện lỗi cấu hình sớm (chưa gửi request nào).
+
+        Raises:
+            Exception: Không tạo được client cho key.
+        """
+        with self._lock:
+            self._ensure(key_id, asynchronous, self.model_name)
+
+    def _ensure(self, key_id: int, asynchronous: bool, model_name: str) -> List[Connection]:
+        connections = self._connections.setdefault((key_id, asynchronous, model_name), [])
+        if not connections:
+            connections.append(Connection(key_id, 0, self._make_model(self.api_keys[key_id], asynchronous, model_name)))
+        return connections
+
+    def _pick(self, key_id: int, asynchronous: bool, model_name: Optional[str]) -> Connection:
+        """Kết nối ít việc nhất của key; tạo kết nối mới nếu tất cả đang bận và chưa đủ số tối đa."""
+        model_name = model_name or self.model_name
+        with self._lock:
+            connections = self._ensure(key_id, asynchronous, model_name)
+            connection = min(connections, key=lambda conn: conn.in_use)
+            if connection.in_use and len(connections) < self.connections_per_key:
+                connection = Connection(key_id, len(connections),
+                                        self._make_model(self.api_keys[key_id], asynchronous, model_name))
+                connections.append(connection)
+            connection.in_use += 1
+            return connection
+
+    def _release(self, connection: Connection, seconds: Optional[float]) -> None:
+        with self._lock:
+            connection.in_use -= 1
+            if seconds is not None:
+                connection.record(seconds)
+
+    # ------------------------------------------------------------------
+    # THIẾT LẬP KẾT NỐI
+    # ------------------------------------------------------------------
+    def _connect(self, connection: Connection) -> None:
+        """Chờ kênh kết nối xong (lần đầu dùng) và ghi lại thời gian thiết lập."""
+        try:
+            connection.setup_seconds = self.backend.connect(connection.model, _CONNECT_TIMEOUT)
+        except TimeoutError:
+            logger.warning(f"Key #{connection.key_id}: kết nối #{connection.slot} chưa sẵn sàng sau "
+                           f"{_CONNECT_TIMEOUT:.0f} giây.")
+        connection.connected = True
+
+    async def _connect_async(self, connection: Connection) -> None:
+        try:
+            connection.setup_seconds = await self.backend.connect_async(connection.model, _CONNECT_TIMEOUT)
+        except (TimeoutError, asyncio.TimeoutError):
+            logger.warning(f"Key #{connection.key_id}: kết nối #{connection.slot} chưa sẵn sàng sau "
+                           f"{_CONNECT_TIMEOUT:.0f} giây.")
+        connection.connected = True
+
+    # ------------------------------------------------------------------
+    # MƯỢN KẾT NỐI
+    # ------------------------------------------------------------------
+    @contextmanager
+    def lease(self, key_id: int, model_name: Optional[str] = None):
+        """Mượn một kết nối (đồng bộ) của key trong lúc gửi một request; trả về model của kết nối."""
+        connection = self._pick(key_id, False, model_name)
+        seconds = None
+        try:
+            if not connection.connected:
+                self._connect(connection)
+            started = time.monotonic()
+            yield connection.model
+            seconds = time.monotonic() - started
+        finally:
+            self._release(connection, seconds)
+
+    @asynccontextmanager
+    async def lease_async(self, key_id: int, model_name: Optional[str] = None):
+        """Giống `lease` nhưng cho client asyncio (phải dùng trong event loop của bộ máy dịch)."""
+        connection = self._pick(key_id, True, model_name)
+        seconds = None
+        try:
+            if not connection.connected:
+                await self._connect_async(connection)
+            started = time.monotonic()
+            yield connection.model
+            seconds = time.monotonic() - started
+        finally:
+            self._release(connection, seconds)
+
+    # ------------------------------------------------------------------
+    # BÁO CÁO
+    # ------------------------------------------------------------------
+    def report(self) -> List[str]:
+        """Các dòng log: số kết nối, thời gian thiết lập, số request mỗi kết nối của từng key."""
+        lines = []
+        with self._lock:
+            groups = sorted(self._connections.items())
+        for (key_id, _, model_name), connections in groups:
+            requests = sum(conn.requests for conn in connections)
+            if not requests:
+                continue
+            setups = [conn.setup_seconds for conn in connections if conn.setup_seconds is not None]
+            firsts = [conn.first_seconds for conn in connections if conn.first_seconds is not None]
+            later = requests - len(firsts)
+            setup = f"{sum(setups) / len(setups) * 1000:.0f} ms" if setups else "-"
+            first = f"{sum(firsts) / len(firsts):.2f}s" if firsts else "-"
+            rest = f"{sum(conn.later_seconds for conn in connections) / later:.2f}s" if later else "-"
+            label = f"Key #{key_id}" if model_name == self.model_name else f"Key #{key_id} ({model_name})"
+            lines.append(f"  - {label}: {len(connections)} kết nối, thiết lập TB {setup}, "
+                         f"{requests} request ({requests / len(connections):.1f}/kết nối) | "
+                         f"request đầu TB {first}, các request sau TB {rest}")
+        return lines
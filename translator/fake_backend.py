@@ -0,0 +1,283 @@
+# translator/fake_backend.py
+"""
+Gemini giả chạy trong tiến trình, để chạy thử tải toàn bộ pipeline dịch mà không tốn hạn mức.
+
+Model giả có cùng giao diện với `GenerativeModel` mà worker/bộ máy asyncio dùng
+(`generate_content`, `generate_content_async`, streaming, `usage_metadata`, `finish_reason`).
+Nó đọc mảng input ở cuối prompt (cả hai định dạng trong `translator/wire.py`) và trả về bản
+dịch tất định: `translation_prefix` + chuỗi gốc (giữ nguyên mã placeholder).
+
+Các tùy chọn trong `fake_backend` (CONFIG) mô phỏng điều kiện thật:
+- `latency`: phân phối độ trễ mỗi request - `fixed`, `uniform`, `exponential` hoặc `lognormal`
+  (trung vị `latency_seconds`, độ lệch `latency_sigma`), cộng `seconds_per_item` mỗi mục;
+  request (không streaming) lâu hơn `request_options["timeout"]` bị lỗi timeout;
+- `requests_per_minute`: hạn mức mỗi key (theo model); vượt hạn mức trả lỗi 429 kèm
+  "Please retry in Xs" như API thật. `rate_limit_rate`: tỷ lệ 429 ngẫu nhiên thêm;
+- `truncate_rate`: response bị cắt giữa chừng với finish_reason MAX_TOKENS;
+- `malformed_rate`: JSON hỏng; `count_mismatch_rate`: thiếu một bản dịch;
+- `connect_seconds`: thời gian thiết lập mỗi kết nối; `seed`: hạt giống ngẫu nhiên.
+
+Số request, số mục và số lỗi đã mô phỏng được đếm trong `STATS` (xem `benchmark_translation.py`).
+"""
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+from config import CONFIG
+from utils.tokens import estimate_tokens
+
+DEFAULT_OPTIONS = {
+    "latency": "lognormal",
+    "latency_seconds": 1.0,
+    "latency_sigma": 0.5,
+    "seconds_per_item": 0.02,
+    "requests_per_minute": None,
+    "rate_limit_rate": 0.0,
+    "retry_seconds": 2.0,
+    "truncate_rate": 0.0,
+    "malformed_rate": 0.0,
+    "count_mismatch_rate": 0.0,
+    "connect_seconds": 0.05,
+    "translation_prefix": "[VI] ",
+    "seed": None,
+}
+
+# Số mảnh văn bản của một response streaming.
+_STREAM_CHUNKS = 4
+
+# Số liệu của mọi model giả trong tiến trình.
+STATS: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        STATS.clear()
+
+
+def _count(**values: int) -> None:
+    with _stats_lock:
+        STATS.update(values)
+
+
+class FakeApiError(Exception):
+    """Lỗi giả mang mã HTTP như lỗi của google.api_core (`code`)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _FinishReason:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _Candidate:
+    __slots__ = ("finish_reason",)
+
+    def __init__(self, finish_reason: str):
+        self.finish_reason = _FinishReason(finish_reason)
+
+
+class _Usage:
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _Chunk:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    """Response giả: `.text`, `.candidates[0].finish_reason`, `.usage_metadata`."""
+
+    def __init__(self, text: str, finish_reason: str, usage: _Usage):
+        self.text = text
+        self.candidates = [_Candidate(finish_reason)]
+        self.usage_metadata = usage
+
+
+class FakeStream(FakeResponse):
+    """Response streaming giả: duyệt bằng `for` (luồng) hoặc `async for` (asyncio)."""
+
+    def __init__(self, text: str, finish_reason: str, usage: _Usage, delays: List[float]):
+        super().__init__(text, finish_reason, usage)
+        size = math.ceil(len(text) / len(delays)) or 1
+        self._pieces = [(delays[i], text[i * size:(i + 1) * size]) for i in range(len(delays))]
+
+    def __iter__(self):
+        for delay, piece in self._pieces:
+            time.sleep(delay)
+            yield _Chunk(piece)
+
+    async def __aiter__(self):
+        for delay, piece in self._pieces:
+            await asyncio.sleep(delay)
+            yield _Chunk(piece)
+
+
+def _parse_input(prompt: str) -> list:
+    """Mảng input ở cuối prompt (mảng chuỗi của `compact` hoặc mảng object của `legacy`)."""
+    start = prompt.rfind("[\n")
+    if start < 0:
+        raise FakeApiError(400, "Fake backend: không tìm thấy mảng input trong prompt.")
+    values, _ = json.JSONDecoder().raw_decode(prompt, start)
+    return values
+
+
+class FakeModel:
+    """Model giả của một key: mô phỏng độ trễ, hạn mức và các lỗi theo `FakeGeminiBackend`."""
+
+    def __init__(self, backend: "FakeGeminiBackend", api_key: str, model_name: str):
+        self.backend = backend
+        self.api_key = api_key
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, stream: bool = False, generation_config=None,
+                         request_options=None, **kwargs):
+        response, delay, timeout = self._respond(prompt, stream, request_options)
+        if stream:
+            return response
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError(f"Fake backend: request timed out sau {timeout:.0f} giây.")
+        return response
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, generation_config=None,
+                                     request_options=None, **kwargs):
+        response, delay, timeout = self._respond(prompt, stream, request_options)
+        if stream:
+            return response
+        await asyncio.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError(f"Fake backend: request timed out sau {timeout:.0f} giây.")
+        return response
+
+    def _respond(self, prompt: str, stream: bool, request_options) -> Tuple[FakeResponse, float, float]:
+        """Response (hoặc lỗi) cho prompt, độ trễ mô phỏng và timeout của request."""
+        values = _parse_input(prompt)
+        self.backend.admit(self.api_key, self.model_name)
+        timeout = float((request_options or {}).get("timeout") or math.inf)
+        text, finish_reason = self.backend.render(values)
+        usage = _Usage(estimate_tokens(prompt), estimate_tokens(text))
+        delay = self.backend.latency(len(values))
+        _count(requests=1, items=len(values), output_tokens=usage.candidates_token_count)
+        if stream:
+            # Mảnh đầu tiên đến sau phần lớn độ trễ, các mảnh sau đến dần.
+            delays = [delay * 0.5] + [delay * 0.5 / (_STREAM_CHUNKS - 1)] * (_STREAM_CHUNKS - 1)
+            return FakeStream(text, finish_reason, usage, delays), delay, timeout
+        if delay > timeout:
+            _count(timeouts=1)
+        return FakeResponse(text, finish_reason, usage), delay, timeout
+
+
+class FakeGeminiBackend:
+    """
+    Backend giả (xem đầu file). Các tùy chọn lấy từ `fake_backend` trong CONFIG, ghi đè bởi `options`.
+    """
+
+    name = "fake"
+
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = {**DEFAULT_OPTIONS, **CONFIG.get("fake_backend", {}), **(options or {})}
+        self.rng = random.Random(self.options["seed"])
+        # (api_key, model) -> thời điểm các request trong 60 giây gần nhất.
+        self._windows: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def make_model(self, api_key: str, asynchronous: bool, model_name: str) -> FakeModel:
+        return FakeModel(self, api_key, model_name)
+
+    def connect(self, model, timeout: float) -> Optional[float]:
+        seconds = self.options["connect_seconds"]
+        time.sleep(seconds)
+        return seconds
+
+    async def connect_async(self, model, timeout: float) -> Optional[float]:
+        seconds = self.options["connect_seconds"]
+        await asyncio.sleep(seconds)
+        return seconds
+
+    # ------------------------------------------------------------------
+    # MÔ PHỎNG
+    # ------------------------------------------------------------------
+    def _random(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def latency(self, items: int) -> float:
+        """Độ trễ (giây) của một request `items` mục theo phân phối đã chọn."""
+        base = self.options["latency_seconds"]
+        kind = self.options["latency"]
+        with self._lock:
+            if kind == "fixed":
+                sample = base
+            elif kind == "uniform":
+                sample = self.rng.uniform(base * 0.5, base * 1.5)
+            elif kind == "exponential":
+                sample = self.rng.expovariate(1 / base) if base > 0 else 0.0
+            elif kind == "lognormal":
+                sample = base * math.exp(self.rng.gauss(0, self.options["latency_sigma"]))
+            else:
+                raise ValueError(f"latency không hợp lệ: '{kind}'. Chọn một trong: fixed, uniform, exponential, lognormal")
+        return sample + self.options["seconds_per_item"] * items
+
+    def admit(self, api_key: str, model_name: str) -> None:
+        """
+        Raises:
+            FakeApiError: 429 khi key vượt `requests_per_minute` hoặc gặp 429 ngẫu nhiên.
+        """
+        limit = self.options["requests_per_minute"]
+        if limit:
+            now = time.monotonic()
+            with self._lock:
+                window = self._windows.setdefault((api_key, model_name), deque())
+                while window and window[0] <= now - 60:
+                    window.popleft()
+                if len(window) >= limit:
+                    wait = window[0] + 60 - now
+                    _count(rate_limited=1)
+                    raise FakeApiError(429, f"Resource has been exhausted (quota {limit} RPM). "
+                                            f"Please retry in {wait:.1f}s.")
+                window.append(now)
+        if self._random() < self.options["rate_limit_rate"]:
+            _count(rate_limited=1)
+            raise FakeApiError(429, f"Resource has been exhausted. Please retry in {self.options['retry_seconds']:.1f}s.")
+
+    def render(self, values: list) -> Tuple[str, str]:
+        """Văn bản response và finish_reason cho mảng input, có thể bị làm hỏng theo tùy chọn."""
+        prefix = self.options["translation_prefix"]
+        if values and isinstance(values[0], dict):
+            translations = [{"index": value.get("index"), "translation": prefix + str(value.get("value", ""))}
+                            for value in values]
+        else:
+            translations = [prefix + str(value) for value in values]
+
+        if len(translations) > 1 and self._random() < self.options["count_mismatch_rate"]:
+            _count(count_mismatch=1)
+            translations = translations[:-1]
+        text = json.dumps(translations, ensure_ascii=False)
+
+        if self._random() < self.options["truncate_rate"]:
+            _count(truncated=1)
+            return text[:max(1, int(len(text) * (0.3 + 0.6 * self._random())))], "MAX_TOKENS"
+        if self._random() < self.options["malformed_rate"]:
+            _count(malformed=1)
+            return "[,," + text[1:], "STOP"
+        return text, "STOP"
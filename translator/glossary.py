@@ -0,0 +1,155 @@
+# translator/glossary.py
+"""
+Chọn thuật ngữ cho từng batch thay vì dán cả `glossary.json` (~1000 thuật ngữ) vào mọi prompt.
+
+`GlossaryIndex` dựng sẵn MỘT automaton Aho-Corasick trên tất cả thuật ngữ (không phân
+biệt hoa thường), rồi quét văn bản đã bảo vệ placeholder của batch đúng một lượt để tìm
+các thuật ngữ thực sự xuất hiện. Một kết quả chỉ được tính khi nằm trọn trong ranh giới
+từ: ký tự trước và sau không phải chữ/số ("Core" không khớp trong "Hardcore"). Dạng số
+nhiều tiếng Anh ("-s", "-es") vẫn được chấp nhận ("Spirit Stones" khớp "Spirit Stone").
+
+Ví dụ:
+    index = GlossaryIndex(glossary)
+    terms = index.select([item.text for item in items])   # dict con của glossary
+    for line in index.report(): logger.info(line)
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+from utils.tokens import estimate_tokens
+
+# Hậu tố số nhiều được chấp nhận ngay sau một thuật ngữ.
+_PLURAL_SUFFIXES = ("es", "s")
+
+
+def _fold(text: str) -> str:
+    """Chữ thường, giữ nguyên độ dài (để vị trí ký tự khớp với văn bản gốc)."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(char.lower()[:1] or char for char in text)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class GlossaryIndex:
+    """
+    Automaton Aho-Corasick trên các thuật ngữ của bảng thuật ngữ.
+
+    Args:
+        glossary (Dict[str, str]): Bảng thuật ngữ {gốc: bản dịch}.
+        per_batch (bool): False = `select` luôn trả về cả bảng (hành vi cũ).
+    """
+
+    def __init__(self, glossary: Dict[str, str], per_batch: bool = True):
+        self.glossary = glossary
+        self.per_batch = per_batch
+        # Mỗi trạng thái: bảng chuyển tiếp, liên kết lỗi, và các thuật ngữ kết thúc tại đó.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for term in glossary:
+            if term.strip():
+                self._add(term)
+        self._link()
+
+        self._full_tokens = estimate_tokens(self.render(glossary))
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.selected_terms = 0
+        self.tokens_saved = 0
+
+    # ------------------------------------------------------------------
+    # DỰNG AUTOMATON
+    # ------------------------------------------------------------------
+    def _add(self, term: str) -> None:
+        state = 0
+        for char in _fold(term):
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = following
+        self._output[state].append(term)
+
+    def _link(self) -> None:
+        """Tính liên kết lỗi theo BFS và gộp output của các hậu tố."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._output[following] = self._output[following] + self._output[self._fail[following]]
+
+    # ------------------------------------------------------------------
+    # TÌM KIẾM
+    # ------------------------------------------------------------------
+    def find(self, text: str) -> Set[str]:
+        """Các thuật ngữ xuất hiện (trọn từ) trong `text`."""
+        found: Set[str] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        folded = _fold(text)
+        length = len(text)
+        state = 0
+        for position, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            for term in output[state]:
+                if term in found:
+                    continue
+                start = position - len(term) + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                end = position + 1
+                if end < length and _is_word_char(text[end]):
+                    suffix = next((s for s in _PLURAL_SUFFIXES if folded.startswith(s, end)), None)
+                    if suffix is None:
+                        continue
+                    end += len(suffix)
+                    if end < length and _is_word_char(text[end]):
+                        continue
+                found.add(term)
+        return found
+
+    def select(self, texts: Iterable[str]) -> Dict[str, str]:
+        """Bảng thuật ngữ con chỉ gồm các thuật ngữ có trong `texts` (giữ thứ tự của bảng gốc)."""
+        if not self.per_batch:
+            return self.glossary
+        found: Set[str] = set()
+        for text in texts:
+            found |= self.find(text)
+        selected = {term: value for term, value in self.glossary.items() if term in found}
+        saved = self._full_tokens - estimate_tokens(self.render(selected))
+        with self._lock:
+            self.batches += 1
+            self.selected_terms += len(selected)
+            self.tokens_saved += saved
+        return selected
+
+    @staticmethod
+    def render(glossary: Dict[str, str]) -> str:
+        """Phần bảng thuật ngữ trong prompt (giống `translator/wire.py`)."""
+        return "\n".join(f"- {en}: {vi}" for en, vi in glossary.items())
+
+    def report(self) -> List[str]:
+        """Các dòng log: số thuật ngữ trung bình mỗi batch và số token prompt tiết kiệm được."""
+        if not self.batches:
+            return []
+        return [f"📚 Thuật ngữ theo batch: trung bình {self.selected_terms / self.batches:.1f}/{len(self.glossary)} "
+                f"thuật ngữ mỗi batch, tiết kiệm ~{self.tokens_saved} token prompt "
+                f"(~{self.tokens_saved // self.batches} token/batch)"]
@@ -0,0 +1,252 @@
+# translator/key_health.py
+"""
+Theo dõi "sức khỏe" của từng API key và điều phối request giữa các key.
+
+Mỗi key có một bộ ngắt mạch (circuit breaker):
+- ĐÓNG (closed): key hoạt động bình thường;
+- MỞ (open): key lỗi liên tiếp `circuit_failure_threshold` lần (hết hạn mức, lỗi key, lỗi
+  server/kết nối) nên tạm ngừng gửi request trong `circuit_open_seconds` giây;
+- NỬA MỞ (half-open): hết thời gian tạm ngừng, key được gửi MỘT request thăm dò. Thành công
+  thì đóng mạch; thất bại thì mở lại với thời gian tạm ngừng gấp đôi (tối đa
+  `circuit_max_open_seconds`);
+- VÔ HIỆU (disabled): key bị từ chối (401/403, key sai hoặc bị thu hồi)
+  `auth_failures_to_disable` lần liên tiếp; luồng của key dừng hẳn.
+
+Lỗi do chính batch (sai số lượng, JSON hỏng, bị cắt cụt, timeout) không làm mở mạch: chúng
+được xử lý bằng cách chia nhỏ batch (`translator/batcher.py`). Các mục của batch lỗi do key
+được trả về bể chung mà không bị tính lượt, nên key khỏe lấy chúng dịch tiếp ngay.
+
+Điều phối theo thông lượng: mỗi key có tối đa `capacity` request đồng thời, nhưng số request
+được phép thực tế tỷ lệ với thông lượng (mục/giây x tỷ lệ thành công) của key so với key tốt
+nhất, nên key chậm hoặc hay lỗi nhận ít việc hơn. Việc này chỉ có tác dụng với engine `async`
+(`concurrent_requests_per_key` > 1). Với engine `threads` mỗi key chỉ có một request, và mỗi
+luồng lấy batch mới ngay khi xong batch cũ, nên số việc của key đã tự tỷ lệ với tốc độ của
+nó; bắt key chậm chờ thêm chỉ làm giảm tổng thông lượng.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import CONFIG
+from translator.batcher import FAILURE_AUTH, FAILURE_OTHER, FAILURE_RATE_LIMIT
+
+logger = logging.getLogger("TranslatorLogger")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+DISABLED = "disabled"
+
+# Các loại lỗi do key/server (không phải do batch) được tính vào bộ ngắt mạch.
+KEY_FAILURES = (FAILURE_RATE_LIMIT, FAILURE_AUTH, FAILURE_OTHER)
+
+# Hệ số làm mượt của các trung bình động (EWMA).
+_SMOOTHING = 0.3
+# Thời gian chờ (giây) trước khi hỏi lại khi key chưa được phép gửi request.
+_ADMIT_POLL = 0.5
+
+
+def _requester():
+    """Định danh của nơi gọi: task asyncio đang chạy, nếu không thì luồng hiện tại."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task if task is not None else threading.get_ident()
+
+
+class KeyHealth:
+    """Số liệu và trạng thái mạch của MỘT key."""
+
+    def __init__(self, key_id: int, capacity: int, open_seconds: float):
+        self.key_id = key_id
+        self.capacity = capacity
+        self.state = CLOSED
+        self.base_open_seconds = open_seconds
+        self.open_seconds = open_seconds
+        self.opened_until = 0.0
+        self.in_flight = 0
+        # Nơi gọi (luồng/task) đang giữ request thăm dò khi mạch nửa mở; None = chưa có.
+        self.probe = None
+
+        self.successes = 0
+        self.failures = 0
+        self.quota_errors = 0
+        self.consecutive_failures = 0
+        self.consecutive_auth = 0
+        self.times_opened = 0
+        # Trung bình động: tỷ lệ thành công, độ trễ (giây), thông lượng (mục/giây).
+        self.success_rate = 1.0
+        self.latency: Optional[float] = None
+        self.throughput: Optional[float] = None
+
+    @property
+    def score(self) -> Optional[float]:
+        """Thông lượng hiệu dụng (mục/giây thành công); None khi chưa có số liệu."""
+        if self.throughput is None:
+            return None
+        return self.throughput * self.success_rate
+
+    def _smooth(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + _SMOOTHING * (sample - current)
+
+
+class KeyScheduler:
+    """
+    Bộ điều phối dùng chung cho mọi luồng/bộ máy dịch (an toàn khi dùng từ nhiều luồng).
+
+    Dùng:
+        wait = scheduler.acquire(key_id)   # None = key bị vô hiệu; > 0 = chờ rồi hỏi lại
+        try: ... scheduler.success(key_id, items, seconds) / scheduler.failure(key_id, kind)
+        finally: scheduler.release(key_id)
+
+    Args:
+        failure_threshold: Số lỗi do key liên tiếp để mở mạch.
+        open_seconds: Thời gian tạm ngừng ban đầu khi mở mạch.
+        max_open_seconds: Thời gian tạm ngừng tối đa.
+        auth_disable: Số lỗi 401/403 liên tiếp để vô hiệu hóa key.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, open_seconds: Optional[float] = None,
+                 max_open_seconds: Optional[float] = None, auth_disable: Optional[int] = None):
+        self.failure_threshold = failure_threshold or CONFIG.get("circuit_failure_threshold", 5)
+        self.open_seconds = open_seconds or CONFIG.get("circuit_open_seconds", 30)
+        self.max_open_seconds = max_open_seconds or CONFIG.get("circuit_max_open_seconds", 600)
+        self.auth_disable = auth_disable or CONFIG.get("auth_failures_to_disable", 3)
+        self._keys: Dict[int, KeyHealth] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key_id: int, capacity: int = 1) -> KeyHealth:
+        """Thêm một key với tối đa `capacity` request đồng thời."""
+        with self._lock:
+            if key_id not in self._keys:
+                self._keys[key_id] = KeyHealth(key_id, max(1, capacity), self.open_seconds)
+            return self._keys[key_id]
+
+    def disable(self, key_id: int, reason: str) -> None:
+        """Vô hiệu hóa hẳn một key (ví dụ không cấu hình được client)."""
+        health = self.register(key_id)
+        with self._lock:
+            health.state = DISABLED
+        logger.error(f"⛔ Key #{key_id} bị vô hiệu hóa: {reason}")
+
+    # ------------------------------------------------------------------
+    # CẤP QUYỀN GỬI REQUEST
+    # ------------------------------------------------------------------
+    def acquire(self, key_id: int) -> Optional[float]:
+        """
+        Xin gửi một request bằng key `key_id`.
+
+        Trả về 0 nếu được gửi ngay (phải gọi `release` sau đó), số giây nên chờ trước khi hỏi
+        lại nếu chưa được phép, hoặc None nếu key đã bị vô hiệu hóa.
+        """
+        with self._lock:
+            health = self._keys[key_id]
+            now = time.monotonic()
+            if health.state == DISABLED:
+                return None
+            if health.state == OPEN:
+                if now < health.opened_until:
+                    return health.opened_until - now
+                health.state = HALF_OPEN
+                health.probe = None
+                logger.info(f"🔌 Key #{key_id}: thử lại bằng một request thăm dò.")
+            if health.state == HALF_OPEN:
+                if health.probe is not None:
+                    return _ADMIT_POLL
+                health.probe = _requester()
+            elif health.in_flight >= self._allowance(health):
+                return _ADMIT_POLL
+            health.in_flight += 1
+            return 0.0
+
+    def release(self, key_id: int) -> None:
+        """
+        Request đã xong (thành công, lỗi, hoặc không có batch để gửi). Phải được gọi từ cùng
+        luồng/task đã gọi `acquire`: chỉ khi chính request thăm dò xong thì request thăm dò khác
+        mới được phép, các request cũ còn dở của key xong không tính.
+        """
+        with self._lock:
+            health = self._keys[key_id]
+            health.in_flight = max(0, health.in_flight - 1)
+            if health.probe is not None and health.probe == _requester():
+                health.probe = None
+
+    def _allowance(self, health: KeyHealth) -> int:
+        """
+        Số request đồng thời được phép của key, tỷ lệ với thông lượng so với key tốt nhất
+        (luôn là 1 khi `capacity` = 1, tức engine `threads`).
+        """
+        scores = [other.score for other in self._keys.values()
+                  if other.state == CLOSED and other.score is not None]
+        if health.score is None or not scores or max(scores) <= 0:
+            return health.capacity
+        return max(1, math.ceil(health.capacity * health.score / max(scores)))
+
+    # ------------------------------------------------------------------
+    # GHI NHẬN KẾT QUẢ
+    # ------------------------------------------------------------------
+    def success(self, key_id: int, items: int, seconds: float) -> None:
+        with self._lock:
+            health = self._keys[key_id]
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.consecutive_auth = 0
+            health.success_rate = health._smooth(health.success_rate, 1.0)
+            health.latency = health._smooth(health.latency, seconds)
+            health.throughput = health._smooth(health.throughput, items / max(seconds, 1e-3))
+            if health.state == HALF_OPEN:
+                health.state = CLOSED
+                health.open_seconds = health.base_open_seconds
+                logger.info(f"✅ Key #{key_id} hoạt động lại bình thường.")
+
+    def failure(self, key_id: int, kind: str) -> None:
+        """Ghi nhận một batch lỗi loại `kind` (xem `FAILURE_*` trong `translator/batcher.py`)."""
+        with self._lock:
+            health = self._keys[key_id]
+            health.failures += 1
+            if health.state == DISABLED:
+                return  # Các request còn dở của key đã bị loại.
+            health.success_rate = health._smooth(health.success_rate, 0.0)
+            if kind == FAILURE_RATE_LIMIT:
+                health.quota_errors += 1
+            health.consecutive_auth = health.consecutive_auth + 1 if kind == FAILURE_AUTH else 0
+            if health.consecutive_auth >= self.auth_disable:
+                health.state = DISABLED
+                logger.error(f"⛔ Key #{key_id} bị vô hiệu hóa sau {health.consecutive_auth} lần bị từ chối "
+                             f"(key sai hoặc đã bị thu hồi).")
+                return
+            if kind not in KEY_FAILURES:
+                return
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN:
+                # Request thăm dò thất bại: tạm ngừng lâu gấp đôi.
+                health.open_seconds = min(self.max_open_seconds, health.open_seconds * 2)
+                self._open(health)
+            elif health.state == CLOSED and health.consecutive_failures >= self.failure_threshold:
+                self._open(health)
+
+    def _open(self, health: KeyHealth) -> None:
+        health.state = OPEN
+        health.opened_until = time.monotonic() + health.open_seconds
+        health.times_opened += 1
+        logger.warning(f"🔌 Key #{health.key_id} lỗi liên tiếp {health.consecutive_failures} lần: "
+                       f"tạm ngừng {health.open_seconds:.0f} giây, việc được chuyển cho các key khác.")
+
+    # ------------------------------------------------------------------
+    # BÁO CÁO
+    # ------------------------------------------------------------------
+    def report(self) -> List[str]:
+        """Các dòng log tình trạng của từng key."""
+        lines = []
+        for key_id, health in sorted(self._keys.items()):
+            latency = f"{health.latency:.1f}s" if health.latency is not None else "-"
+            throughput = f"{health.throughput:.1f} mục/s" if health.throughput is not None else "-"
+            lines.append(f"  - Key #{key_id} [{health.state}]: {health.successes} batch OK, {health.failures} lỗi "
+                         f"({health.quota_errors} lỗi hạn mức) | thành công {health.success_rate * 100:.0f}% | "
+                         f"độ trễ {latency} | {throughput} | ngắt mạch {health.times_opened} lần")
+        return lines
@@ -0,0 +1,296 @@
+# translator/memory.py
+"""
+Bộ nhớ dịch (translation memory) trên SQLite: mỗi chuỗi khác nhau chỉ phải dịch MỘT lần.
+
+Khóa của một chuỗi là dạng CHUẨN HÓA của nó: chuỗi đã bảo vệ placeholder, trong đó mỗi
+placeholder được thay bằng số thứ tự `\\x1a0\\x1a`, `\\x1a1\\x1a`... (theo lần xuất hiện đầu
+tiên của giá trị gốc). Vì vậy "Deal {0} damage" và "Deal {1} damage" có cùng khóa; bản dịch
+được lưu dưới dạng mẫu (template) và được "mở rộng" lại bằng placeholder của từng chuỗi.
+Với `template_dedup`, các con số đứng riêng cũng được coi là placeholder
+(`translator/templates.py`), nên "Level 1" ... "Level 99" chỉ cần dịch một lần.
+
+Khóa còn gắn với ngôn ngữ đích, model và phiên bản bảng thuật ngữ: đổi một trong ba thứ
+này thì các bản dịch cũ không được dùng lại (nhưng vẫn nằm trong file, dùng lại được khi
+quay về cấu hình cũ).
+
+Trong `run_translation`, bộ nhớ được tra cứu TRƯỚC khi chia batch; các chuỗi trùng nhau
+trong cùng một lần chạy chỉ gửi một đại diện, bản dịch của đại diện được áp cho cả nhóm.
+Mọi batch thành công đều được ghi vào bộ nhớ, nên chạy lại sau khi bị ngắt hoặc sau một
+bản patch game không phải trả tiền lại cho các chuỗi đã dịch.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.decision_cache import content_key
+from translator.templates import Protector, get_protector
+from utils.filter import protect_placeholders, restore_placeholders
+from utils.placeholders import TOKEN_PATTERN
+from utils.string_table import ref_fields
+
+logger = logging.getLogger("TranslatorLogger")
+
+# Mã placeholder trong dạng chuẩn hóa (ký tự điều khiển SUB không xuất hiện trong dữ liệu game).
+TEMPLATE_MARKER = re.compile('\x1a(\\d+)\x1a')
+
+# SQLite cũ giới hạn 999 tham số cho mỗi câu lệnh.
+_SQL_BATCH = 500
+
+
+def _marker(number: int) -> str:
+    return f"\x1a{number}\x1a"
+
+
+def _ordinals(protected: str, replacements: Dict[str, str]) -> Dict[str, int]:
+    """Mã toàn cục -> số thứ tự của giá trị gốc (đã khôi phục hết các mã lồng nhau)."""
+    by_original: Dict[str, int] = {}
+    by_token: Dict[str, int] = {}
+    for match in TOKEN_PATTERN.finditer(protected):
+        token = match.group(0)
+        if token in replacements and token not in by_token:
+            original = restore_placeholders(replacements[token], replacements)
+            by_token[token] = by_original.setdefault(original, len(by_original))
+    return by_token
+
+
+def normalize(value: str, protect: Protector = protect_placeholders) -> Tuple[str, List[str]]:
+    """
+    Dạng chuẩn hóa của một chuỗi gốc.
+
+    Args:
+        value: Chuỗi gốc.
+        protect: Hàm bảo vệ placeholder (`protect_template` để gộp cả các chuỗi chỉ khác số).
+
+    Returns:
+        Tuple[str, List[str]]: (chuỗi chuẩn hóa, các giá trị placeholder gốc theo số thứ tự).
+    """
+    protected, replacements = protect(value)
+    ordinals = _ordinals(protected, replacements)
+    originals = [""] * len(set(ordinals.values()))
+    for token, number in ordinals.items():
+        originals[number] = restore_placeholders(replacements[token], replacements)
+    normalized = TOKEN_PATTERN.sub(
+        lambda match: _marker(ordinals[match.group(0)]) if match.group(0) in ordinals else match.group(0),
+        protected,
+    )
+    return normalized, originals
+
+
+def to_template(protected_source: str, protected_translation: str, replacements: Dict[str, str]) -> Optional[str]:
+    """
+    Bản dịch (còn mã toàn cục) -> dạng mẫu với số thứ tự của chuỗi gốc.
+
+    Trả về None nếu bản dịch chứa mã không có trong chuỗi gốc (không thể lưu an toàn).
+    """
+    ordinals = _ordinals(protected_source, replacements)
+    unknown = False
+
+    def to_marker(match: re.Match) -> str:
+        nonlocal unknown
+        token = match.group(0)
+        if token in ordinals:
+            return _marker(ordinals[token])
+        unknown = True
+        return token
+
+    template = TOKEN_PATTERN.sub(to_marker, protected_translation)
+    return None if unknown else template
+
+
+def expand(template: str, originals: Sequence[str]) -> str:
+    """Mẫu bản dịch -> bản dịch hoàn chỉnh với các placeholder gốc của một chuỗi."""
+    return TEMPLATE_MARKER.sub(
+        lambda match: originals[int(match.group(1))] if int(match.group(1)) < len(originals) else match.group(0),
+        template,
+    )
+
+
+def memory_context(target_language: str, model_name: str, glossary: Dict[str, str]) -> str:
+    """Ngữ cảnh của bản dịch: ngôn ngữ đích | model | phiên bản (hash) bảng thuật ngữ."""
+    glossary_version = hashlib.blake2b(
+        json.dumps(glossary, ensure_ascii=False, sort_keys=True).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    return f"{target_language}|{model_name}|{glossary_version}"
+
+
+class TranslationMemory:
+    """
+    Bộ nhớ dịch trên đĩa.
+
+    Args:
+        path (str): Đường dẫn file SQLite.
+        context (str): Ngữ cảnh bản dịch (xem `memory_context`), là một phần của khóa.
+    """
+
+    def __init__(self, path: str, context: str):
+        self.path = path
+        self.context = context
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS memory (key BLOB PRIMARY KEY, template TEXT)")
+
+    def key(self, normalized: str) -> bytes:
+        return content_key(f"{self.context}\x00{normalized}")
+
+    def lookup(self, keys: Sequence[bytes]) -> Dict[bytes, str]:
+        """Tra cứu nhiều khóa một lúc: khóa có trong bộ nhớ -> mẫu bản dịch."""
+        found: Dict[bytes, str] = {}
+        for i in range(0, len(keys), _SQL_BATCH):
+            chunk = keys[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            for key, template in self._conn.execute(
+                f"SELECT key, template FROM memory WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = template
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def store(self, entries: Iterable[Tuple[bytes, str]]) -> None:
+        """Ghi các cặp `(khóa, mẫu bản dịch)`."""
+        entries = list(entries)
+        self._conn.executemany("INSERT OR REPLACE INTO memory VALUES (?, ?)", entries)
+        self._conn.commit()
+        self.stored += len(entries)
+
+    def forget(self, keys: Sequence[bytes]) -> None:
+        """Xóa các bản dịch của `keys`."""
+        self._conn.executemany("DELETE FROM memory WHERE key = ?", [(key,) for key in keys])
+        self._conn.commit()
+
+    def size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def report(self) -> List[str]:
+        """Các dòng thống kê để ghi log."""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return [
+            f"  - 🎯 Bộ nhớ dịch: dùng lại {self.hits} | cần dịch {self.misses} | tỷ lệ dùng lại: {rate:.1f}%",
+            f"  - 🗃️  Đã ghi thêm {self.stored} bản dịch, tổng {self.size()} bản dịch ('{self.path}')",
+        ]
+
+
+class MemoryRun:
+    """
+    Bộ nhớ dịch trong MỘT lần chạy `run_translation`.
+
+    Khi khởi tạo: tra cứu mọi mục cần dịch; mục đã có bản dịch nằm trong `reused`, các mục
+    còn lại được gom theo dạng chuẩn hóa và chỉ MỘT đại diện mỗi nhóm nằm trong `to_translate`.
+    `apply` nhận kết quả của một batch, ghi vào bộ nhớ và trả về kết quả cho cả nhóm.
+
+    Args:
+        memory (Optional[TranslationMemory]): Bộ nhớ dịch; None = chỉ gộp các chuỗi trùng
+            nhau trong lần chạy này, không đọc/ghi file.
+        items (Iterable): Các mục `{'index', 'value'}` cần dịch, hoặc vị trí của chúng trong `table`.
+        protect (Optional[Protector]): Hàm bảo vệ dùng để chuẩn hóa (mặc định theo
+            `template_dedup`, phải giống hàm mà định dạng dữ liệu dùng).
+        table (Optional[StringTable]): Bảng chuỗi chứa các mục khi `items` là vị trí; khi đó
+            `to_translate` cũng là các vị trí (xem `AdaptiveBatcher`).
+    """
+
+    def __init__(self, memory: Optional[TranslationMemory], items: Iterable, protect: Optional[Protector] = None,
+                 table=None):
+        self.memory = memory
+        protect = protect or get_protector()
+        self.reused: List[Dict] = []
+        self.to_translate: List = []
+        self.duplicates = 0
+        self._unresolved = set()
+        # khóa -> các thành viên (index, chuỗi gốc, placeholder gốc); index đại diện -> khóa.
+        # Chuỗi gốc của đại diện chỉ được giữ khi nhóm có thành viên khác (để so sánh với
+        # chúng); nếu không, nó là None và chuỗi gốc nằm trong batch của đại diện.
+        self._groups: Dict[bytes, List[Tuple[int, Optional[str], Tuple[str, ...]]]] = {}
+        self._representative: Dict[int, bytes] = {}
+
+        normalized = []
+        for ref in items:
+            text, originals = normalize(str(ref_fields(ref, table)[1]), protect)
+            key = memory.key(text) if memory else content_key(text)
+            # Tuple: phần lớn chuỗi không có placeholder và dùng chung `()` rỗng.
+            normalized.append((ref, key, tuple(originals)))
+        found = memory.lookup([key for _, key, _ in normalized]) if memory else {}
+
+        representatives = {}
+        for ref, key, originals in normalized:
+            index, value = ref_fields(ref, table)
+            if key in found:
+                self.reused.append({'index': index, 'value': expand(found[key], originals)})
+            elif key in self._groups:
+                self._groups[key].append((index, str(value), originals))
+                self.duplicates += 1
+            else:
+                self._groups[key] = [(index, None, originals)]
+                self._representative[index] = key
+                representatives[key] = ref
+                self.to_translate.append(ref)
+        for key, members in self._groups.items():
+            if len(members) > 1:
+                index, _, originals = members[0]
+                members[0] = (index, str(ref_fields(representatives[key], table)[1]), originals)
+
+    @property
+    def unresolved(self) -> int:
+        return len(self._unresolved)
+
+    def apply(self, results: List[Dict]) -> List[Dict]:
+        """
+        Kết quả của một batch (các đại diện) -> kết quả cho mọi thành viên; ghi bộ nhớ.
+
+        Một đại diện có thể nhận kết quả nhiều lần (bản dịch nhận qua streaming rồi được
+        dịch lại): kết quả sau ghi đè kết quả trước cho cả nhóm.
+        """
+        applied: List[Dict] = []
+        entries: List[Tuple[bytes, str]] = []
+        for result in results:
+            key = self._representative.get(result['index'])
+            if key is None:
+                applied.append(result)
+                continue
+            template = result.get('template')
+            if template is not None:
+                entries.append((key, template))
+            members = self._groups[key]
+            _, rep_value, _ = members[0]
+            applied.append({'index': result['index'], 'value': result['value']})
+            for index, value, originals in members[1:]:
+                if template is not None:
+                    applied.append({'index': index, 'value': expand(template, originals)})
+                    self._unresolved.discard(index)
+                elif value == rep_value:
+                    applied.append({'index': index, 'value': result['value']})
+                else:
+                    self._unresolved.add(index)
+        if entries and self.memory:
+            self.memory.store(entries)
+        return applied
+
+    def discard(self, item: Dict) -> List[Dict]:
+        """
+        Đại diện `item` (mục của batch, mang chuỗi gốc) bị bỏ qua: xóa bản dịch đã ghi cho nhóm
+        của nó (có thể là bản dịch tạm nhận qua streaming) và trả về các mục `{'index', 'value'}`
+        với chuỗi gốc của cả nhóm.
+        """
+        key = self._representative.get(item['index'])
+        if key is None:
+            return [item]
+        if self.memory:
+            self.memory.forget([key])
+        return [item] + [{'index': member, 'value': value} for member, value, _ in self._groups[key][1:]]
+
+    def report(self) -> List[str]:
+        lines = [f"🧠 Bộ nhớ dịch: {len(self.reused)} mục dùng lại bản dịch cũ, {self.duplicates} mục trùng lặp "
+                 f"(cùng mẫu) dùng chung bản dịch, {len(self.to_translate)} chuỗi cần gửi đi."]
+        if self.unresolved:
+            lines.append(f"  - ⚠️ {self.unresolved} mục trùng lặp không áp được bản dịch (sẽ dịch ở lần chạy sau).")
+        return lines + (self.memory.report() if self.memory else [])
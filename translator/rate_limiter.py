@@ -0,0 +1,252 @@
+# translator/rate_limiter.py
+"""
+Giới hạn tốc độ theo "xô token" (token bucket) cho từng API key, dùng chung cho
+`TranslatorWorker` (luồng) và `AsyncTranslationEngine` (asyncio).
+
+Mỗi key có hai xô:
+- xô REQUEST: đầy lại `requests_per_minute_per_key` lượt mỗi phút, sức chứa `rate_limit_burst`
+  (cho phép gửi dồn vài request khi key đã rảnh một lúc);
+- xô TOKEN: đầy lại `tokens_per_minute_per_key` token mỗi phút (prompt + bản dịch ước lượng).
+
+Một request giữ chỗ cả hai xô trước khi gửi; nếu xô chưa đủ, hàm trả về thời gian cần chờ
+(xô được phép "nợ", nên các request đồng thời được xếp lịch lần lượt, không tranh nhau).
+Sau khi có response, số token thực tế (`usage_metadata`) được dùng để điều chỉnh lại xô.
+
+Khi API trả lỗi 429 kèm thời gian chờ (retry-after / RetryInfo), cả key bị tạm dừng đến
+hết thời gian đó. Các lần thử lại dùng backoff lũy thừa "full jitter"; với lỗi 429, số mũ là
+số lỗi 429 liên tiếp của key (không phải số lần thử của mục), để các luồng cùng gặp hạn mức
+không gửi lại đồng loạt.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import CONFIG
+
+# Cửa sổ (giây) dùng để tính mức sử dụng hạn mức.
+_WINDOW = 60.0
+# Mã trạng thái ở đầu thông báo lỗi ("429 Resource has been exhausted...").
+_STATUS_429 = re.compile(r'^\s*(?:HTTP\s+)?429\b')
+_RETRY_IN_TEXT = re.compile(r'retry (?:in|after) ([\d.]+)\s*(ms|s)', re.IGNORECASE)
+_RETRY_DELAY_TEXT = re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Xô token cơ bản.
+
+    Args:
+        rate_per_minute (float): Số đơn vị được nạp lại mỗi phút.
+        capacity (float): Sức chứa tối đa (lượng có thể dùng dồn một lúc).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(capacity, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Lấy `amount` đơn vị (có thể nợ) và trả về số giây phải chờ trước khi dùng."""
+        self._refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount: float, now: float) -> None:
+        """Trả lại (amount > 0) hoặc trừ thêm (amount < 0) sau khi biết lượng thực tế."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Reservation:
+    """Chỗ đã giữ cho một request: thời gian phải chờ và số token đã tính trước."""
+
+    __slots__ = ("wait", "tokens", "_entry")
+
+    def __init__(self, wait: float, tokens: int, entry: List):
+        self.wait = wait
+        self.tokens = tokens
+        self._entry = entry
+
+
+class KeyLimiter:
+    """Hạn mức của MỘT key: xô request + xô token + thời điểm bị khóa do lỗi 429."""
+
+    def __init__(self, key_id: int, rpm: float, tpm: float, burst: float):
+        self.key_id = key_id
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, burst)
+        # Sức chứa xô token: lượng token của `burst` request nếu hạn mức TPM chia đều cho RPM.
+        self.tokens = TokenBucket(tpm, tpm / rpm * burst)
+        self.blocked_until = 0.0
+        self.throttled = 0
+        # Số lỗi 429 liên tiếp (về 0 khi key nhận được response).
+        self.streak = 0
+        self._lock = threading.Lock()
+        # Các request gần đây: [thời điểm gửi, số token].
+        self._history: Deque[List] = deque()
+
+    def reserve(self, tokens: int) -> Reservation:
+        """Giữ chỗ cho một request ước lượng `tokens` token; `.wait` là số giây phải chờ."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now),
+                self.tokens.reserve(tokens, now),
+                self.blocked_until - now,
+                0.0,
+            )
+            entry = [now + wait, tokens]
+            self._history.append(entry)
+            return Reservation(wait, tokens, entry)
+
+    def settle(self, reservation: Reservation, actual: Optional[int]) -> None:
+        """Điều chỉnh xô token theo số token thực tế của request (nếu API trả về)."""
+        with self._lock:
+            self.streak = 0
+            if actual is None:
+                return
+            self.tokens.refund(reservation.tokens - actual, time.monotonic())
+            reservation._entry[1] = actual
+
+    def throttle(self, delay: Optional[float] = None) -> int:
+        """
+        Ghi nhận một lỗi 429 của key; có `delay` (server yêu cầu) thì tạm dừng mọi request của
+        key trong `delay` giây. Trả về số lỗi 429 liên tiếp trước lỗi này (số mũ của backoff).
+        """
+        with self._lock:
+            self.throttled += 1
+            streak = self.streak
+            self.streak += 1
+            if delay is not None:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            return streak
+
+    def utilisation(self) -> Tuple[float, float]:
+        """Tỷ lệ (0..1+) hạn mức RPM và TPM đã dùng trong 60 giây gần nhất."""
+        with self._lock:
+            now = time.monotonic()
+            while self._history and self._history[0][0] < now - _WINDOW:
+                self._history.popleft()
+            used = [entry for entry in self._history if entry[0] <= now]
+            return len(used) / self.rpm, sum(tokens for _, tokens in used) / self.tpm
+
+
+class RateLimiter:
+    """Tập hợp hạn mức của mọi key, dùng chung giữa các luồng/bộ máy dịch."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, burst: Optional[float] = None):
+        self.rpm = rpm or CONFIG["requests_per_minute_per_key"]
+        self.tpm = tpm or CONFIG.get("tokens_per_minute_per_key", 250000)
+        self.burst = burst or CONFIG.get("rate_limit_burst", 2)
+        # (key_id, model) -> hạn mức; model None = hạn mức chung của key.
+        self._keys: Dict[Tuple[int, Optional[str]], KeyLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_key(self, key_id: int, model: Optional[str] = None, rpm: Optional[float] = None,
+                tpm: Optional[float] = None) -> KeyLimiter:
+        """Hạn mức của key; với `model`, hạn mức riêng của key cho model đó (RPM/TPM riêng nếu có)."""
+        with self._lock:
+            if (key_id, model) not in self._keys:
+                self._keys[(key_id, model)] = KeyLimiter(key_id, rpm or self.rpm, tpm or self.tpm, self.burst)
+            return self._keys[(key_id, model)]
+
+    def report(self) -> List[str]:
+        """Các dòng log mức sử dụng hạn mức của từng key."""
+        lines = []
+        ordered = sorted(self._keys.items(), key=lambda entry: (entry[0][0], entry[0][1] or ""))
+        for (key_id, model), limiter in ordered:
+            rpm_used, tpm_used = limiter.utilisation()
+            label = f"Key #{key_id} ({model})" if model else f"Key #{key_id}"
+            lines.append(f"  - {label}: RPM {rpm_used * 100:5.1f}% | TPM {tpm_used * 100:5.1f}% | "
+                         f"bị 429: {limiter.throttled} lần")
+        return lines
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Thời gian chờ (giây) mà server yêu cầu trong một lỗi 429, nếu có.
+
+    Đọc lần lượt: thuộc tính `retry_after`, `RetryInfo.retry_delay` trong `details` của
+    lỗi google.api_core, header `Retry-After` của response, và cuối cùng là nội dung
+    thông báo lỗi ("Please retry in 12.5s", "retry_delay { seconds: 12 }").
+    """
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            if hasattr(delay, "total_seconds"):
+                seconds = delay.total_seconds()
+            else:
+                seconds = getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+            if seconds > 0:
+                return float(seconds)
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        header = headers.get("Retry-After") or headers.get("retry-after")
+        try:
+            if header is not None:
+                return float(header)
+        except ValueError:
+            pass
+
+    text = str(error)
+    match = _RETRY_IN_TEXT.search(text)
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000 if match.group(2).lower() == "ms" else seconds
+    match = _RETRY_DELAY_TEXT.search(text)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    Lỗi có phải là 429 / hết hạn mức (ResourceExhausted) hay không.
+
+    Chỉ xét mã lỗi, tên lớp lỗi và mã trạng thái ở ĐẦU thông báo: lỗi JSON ở "char 429" hay
+    batch 429 mục không phải lỗi hạn mức.
+    """
+    if getattr(error, "code", None) == 429:
+        return True
+    return "ResourceExhausted" in type(error).__name__ or bool(_STATUS_429.match(str(error)))
+
+
+def is_auth_error(error: Exception) -> bool:
+    """Lỗi có phải do key (sai, bị thu hồi, không có quyền: 401/403) hay không."""
+    if getattr(error, "code", None) in (401, 403):
+        return True
+    name = type(error).__name__
+    text = str(error)
+    return ("PermissionDenied" in name or "Unauthenticated" in name
+            or "API_KEY_INVALID" in text or "API key not valid" in text or "API key expired" in text)
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, server_delay: Optional[float] = None,
+                  cap: float = 120.0) -> float:
+    """
+    Thời gian chờ trước lần thử lại thứ `attempt + 1`.
+
+    - Có `server_delay` (từ 429): chờ đúng thời gian đó cộng thêm một chút jitter (tối đa 20%),
+      để các luồng không cùng gửi lại một lúc.
+    - Không có: backoff lũy thừa "full jitter" - ngẫu nhiên trong [0, base * 2^attempt].
+    """
+    base = CONFIG["api_retry_delay"] if base is None else base
+    if server_delay is not None:
+        return server_delay + random.uniform(0, server_delay * 0.2 + 0.1)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,233 @@
+# translator/routing.py
+"""
+Định tuyến theo độ khó: chuỗi "dễ" được gửi cho model nhanh/rẻ, chuỗi khó cho model mạnh.
+
+Mỗi tuyến (route) trong `model_routes` có một model và các điều kiện; các tuyến được xét
+theo thứ tự và một chuỗi đi vào tuyến ĐẦU TIÊN mà nó thỏa:
+- `max_tokens`: số token ước lượng của chuỗi không vượt quá mức này (chuỗi ngắn);
+- `min_score`: điểm `calculate_translation_score` (phần nội dung sau khi bỏ placeholder) từ
+  mức này trở lên, tức chuỗi rõ ràng là câu chữ bình thường, không có dấu hiệu chuỗi kỹ thuật;
+- `min_glossary_coverage`: tỷ lệ (0..1) nội dung là thuật ngữ có trong bảng thuật ngữ.
+Chuỗi phải thỏa `max_tokens`, và thỏa `min_score` HOẶC `min_glossary_coverage` (chuỗi gần
+như chỉ gồm thuật ngữ đã có bản dịch thì dễ dù điểm thấp). Tuyến không có điều kiện nhận mọi
+chuỗi; nếu không tuyến nào như vậy, tuyến mặc định với `model_name` được thêm vào cuối.
+
+Batch chỉ gồm các chuỗi cùng tuyến (xem `translator/batcher.py`). Khi một tuyến bị lỗi hết
+hạn mức (429) `route_fallback_after` lần liên tiếp, các batch của nó được gửi sang tuyến
+`fallback` trong `route_fallback_seconds` giây. Mỗi tuyến có thể có hạn mức RPM/TPM riêng
+(hạn mức của Gemini tính theo từng model) và giá token để báo cáo chi phí.
+
+Ví dụ:
+    router = ModelRouter(glossary)
+    name = router.route(value, tokens)        # khi tạo bể công việc
+    route = router.select(batch['route'])     # khi gửi batch (đã tính chuyển hướng)
+    ...
+    router.success(route, items, seconds, response) / router.failure(route, kind)
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import CONFIG
+from translator.batcher import FAILURE_RATE_LIMIT
+from translator.glossary import GlossaryIndex
+from translator.rate_limiter import KeyLimiter, RateLimiter
+from utils.filter import calculate_translation_score, protect_placeholders
+from utils.placeholders import TOKEN_PATTERN
+
+logger = logging.getLogger("TranslatorLogger")
+
+DEFAULT_ROUTE = "default"
+
+
+class Route:
+    """Một tuyến: model, điều kiện nhận chuỗi, hạn mức riêng, giá token và số liệu."""
+
+    def __init__(self, name: str, model_name: str, max_tokens: Optional[int] = None,
+                 min_score: Optional[int] = None, min_glossary_coverage: Optional[float] = None,
+                 fallback: Optional[str] = None, requests_per_minute_per_key: Optional[float] = None,
+                 tokens_per_minute_per_key: Optional[float] = None, input_price: float = 0.0,
+                 output_price: float = 0.0):
+        self.name = name
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.min_score = min_score
+        self.min_glossary_coverage = min_glossary_coverage
+        self.fallback = fallback
+        self.rpm = requests_per_minute_per_key
+        self.tpm = tokens_per_minute_per_key
+        # Giá (USD) cho mỗi 1 triệu token prompt / bản dịch.
+        self.input_price = input_price
+        self.output_price = output_price
+
+        self.assigned = 0
+        self.batches = 0
+        self.items = 0
+        self.seconds = 0.0
+        self.failures = 0
+        self.quota_errors = 0
+        self.consecutive_quota = 0
+        self.diverted_until = 0.0
+        self.diverted_batches = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    @property
+    def catch_all(self) -> bool:
+        return self.max_tokens is None and self.min_score is None and self.min_glossary_coverage is None
+
+    @property
+    def cost(self) -> float:
+        return (self.input_tokens * self.input_price + self.output_tokens * self.output_price) / 1_000_000
+
+    def limiter(self, rate_limiter: RateLimiter, key_id: int) -> KeyLimiter:
+        """Hạn mức của key cho tuyến này (riêng theo model nếu tuyến có RPM/TPM riêng)."""
+        if self.rpm is None and self.tpm is None:
+            return rate_limiter.for_key(key_id)
+        return rate_limiter.for_key(key_id, self.model_name, self.rpm, self.tpm)
+
+
+class ModelRouter:
+    """
+    Chọn tuyến cho từng chuỗi và ghi nhận kết quả theo tuyến (an toàn khi dùng từ nhiều luồng).
+
+    Args:
+        glossary (Optional[GlossaryIndex]): Bảng thuật ngữ để tính độ phủ thuật ngữ.
+        routes (Optional[List[Dict]]): Cấu hình các tuyến (mặc định `model_routes` trong CONFIG
+            khi `model_routing` bật; nếu không chỉ có một tuyến với `model_name`).
+    """
+
+    def __init__(self, glossary: Optional[GlossaryIndex] = None, routes: Optional[List[Dict]] = None):
+        if routes is None:
+            routes = CONFIG.get("model_routes", []) if CONFIG.get("model_routing", False) else []
+        self.glossary = glossary
+        self.routes: Dict[str, Route] = {}
+        for index, options in enumerate(routes):
+            options = dict(options)
+            name = options.pop("name", None) or f"route{index + 1}"
+            self.routes[name] = Route(name, **options)
+        if not any(route.catch_all for route in self.routes.values()):
+            self.routes[DEFAULT_ROUTE] = Route(DEFAULT_ROUTE, CONFIG["model_name"])
+        for route in self.routes.values():
+            if route.fallback is not None and route.fallback not in self.routes:
+                logger.warning(f"⚠️ Tuyến '{route.name}': không có tuyến dự phòng '{route.fallback}', bỏ qua.")
+                route.fallback = None
+        # Tuyến nhận mọi chuỗi, cũng dùng cho batch không có tuyến (bộ chia batch không định tuyến).
+        self.default = next(route for route in self.routes.values() if route.catch_all)
+        self.fallback_after = CONFIG.get("route_fallback_after", 3)
+        self.fallback_seconds = CONFIG.get("route_fallback_seconds", 120)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.routes) > 1
+
+    def signature(self) -> str:
+        """Các model đang dùng (một phần của ngữ cảnh bộ nhớ dịch)."""
+        return "+".join(sorted({route.model_name for route in self.routes.values()}))
+
+    # ------------------------------------------------------------------
+    # CHỌN TUYẾN
+    # ------------------------------------------------------------------
+    def route(self, value: str, tokens: int) -> str:
+        """Tên tuyến cho một chuỗi ước lượng `tokens` token."""
+        content = None
+        name = self.default.name
+        for route in self.routes.values():
+            if route.catch_all:
+                break
+            if route.max_tokens is not None and tokens > route.max_tokens:
+                continue
+            if route.min_score is None and route.min_glossary_coverage is None:
+                name = route.name
+                break
+            if content is None:
+                protected, _ = protect_placeholders(value)
+                content = TOKEN_PATTERN.sub('', protected).strip()
+            if route.min_score is not None and len(content) >= 2 \
+                    and calculate_translation_score(content) >= route.min_score:
+                name = route.name
+                break
+            if route.min_glossary_coverage is not None \
+                    and self._coverage(content) >= route.min_glossary_coverage:
+                name = route.name
+                break
+        self.routes[name].assigned += 1
+        return name
+
+    def _coverage(self, content: str) -> float:
+        """Tỷ lệ ký tự chữ/số của `content` thuộc các thuật ngữ có trong bảng thuật ngữ."""
+        if self.glossary is None or not content:
+            return 0.0
+        letters = sum(1 for char in content if char.isalnum())
+        if not letters:
+            return 0.0
+        covered = sum(sum(1 for char in term if char.isalnum()) for term in self.glossary.find(content))
+        return min(1.0, covered / letters)
+
+    def select(self, name: Optional[str]) -> Route:
+        """Tuyến sẽ dịch một batch của tuyến `name`: tuyến dự phòng nếu `name` đang bị chuyển hướng."""
+        with self._lock:
+            route = self.routes.get(name, self.default)
+            now = time.monotonic()
+            seen = {route.name}
+            target = route
+            while target.diverted_until > now and target.fallback and target.fallback not in seen:
+                target = self.routes[target.fallback]
+                seen.add(target.name)
+            if target is not route:
+                route.diverted_batches += 1
+            return target
+
+    # ------------------------------------------------------------------
+    # GHI NHẬN KẾT QUẢ
+    # ------------------------------------------------------------------
+    def success(self, route: Route, items: int, seconds: float, response) -> None:
+        """Một batch `items` mục của `route` thành công sau `seconds` giây."""
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            route.batches += 1
+            route.items += items
+            route.seconds += seconds
+            route.consecutive_quota = 0
+            route.input_tokens += getattr(usage, "prompt_token_count", None) or 0
+            route.output_tokens += getattr(usage, "candidates_token_count", None) or 0
+
+    def failure(self, route: Route, kind: str) -> None:
+        """Một batch của `route` lỗi loại `kind`; lỗi hạn mức liên tiếp làm tuyến bị chuyển hướng."""
+        with self._lock:
+            route.failures += 1
+            if kind != FAILURE_RATE_LIMIT:
+                return
+            route.quota_errors += 1
+            route.consecutive_quota += 1
+            if route.fallback and route.consecutive_quota >= self.fallback_after \
+                    and route.diverted_until <= time.monotonic():
+                route.diverted_until = time.monotonic() + self.fallback_seconds
+                route.consecutive_quota = 0
+                logger.warning(f"🧭 Tuyến '{route.name}' ({route.model_name}) hết hạn mức: chuyển các batch "
+                               f"sang tuyến '{route.fallback}' trong {self.fallback_seconds} giây.")
+
+    # ------------------------------------------------------------------
+    # BÁO CÁO
+    # ------------------------------------------------------------------
+    def plan(self) -> List[str]:
+        """Các dòng log: số chuỗi được xếp vào mỗi tuyến."""
+        return [f"  - {route.name} ({route.model_name}): {route.assigned} mục" for route in self.routes.values()]
+
+    def report(self) -> List[str]:
+        """Các dòng log: thông lượng, độ trễ, lỗi và chi phí của từng tuyến."""
+        lines = []
+        for route in self.routes.values():
+            if not route.batches and not route.failures:
+                continue
+            latency = f"{route.seconds / route.batches:.1f}s" if route.batches else "-"
+            throughput = f"{route.items / route.seconds:.1f} mục/s" if route.seconds else "-"
+            cost = f" | ~${route.cost:.4f}" if route.input_price or route.output_price else ""
+            lines.append(f"  - {route.name} ({route.model_name}): {route.batches} batch, {route.items} mục | "
+                         f"độ trễ TB {latency} | {throughput} mỗi request | {route.failures} lỗi "
+                         f"({route.quota_errors} lỗi hạn mức) | {route.diverted_batches} batch chuyển sang "
+                         f"tuyến dự phòng | token {route.input_tokens} vào / {route.output_tokens} ra{cost}")
+        return lines
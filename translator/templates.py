@@ -0,0 +1,51 @@
+# translator/templates.py
+"""
+Gộp các chuỗi chỉ khác nhau ở CON SỐ thành một mẫu (template) để dịch một lần.
+
+Bảng chuỗi game có rất nhiều "họ" chuỗi như "Level 1" ... "Level 99" hay "+5 Attack",
+"+12 Attack". `protect_template` chạy SAU `protect_placeholders` và bảo vệ thêm các số
+đứng riêng (không dính vào chữ: "Level 5", "+10%", "3.5s" thì có; "x2", "1st", "MP3" thì
+không) bằng mã `__PROTECTED_N__` như mọi placeholder khác.
+
+Nhờ vậy, ở bước chuẩn hóa của bộ nhớ dịch (`translator/memory.py`), cả họ chuỗi có
+cùng một khóa: chỉ một đại diện được gửi đi dưới dạng "Level {0}", và bản dịch "Cấp {0}"
+được mở rộng lại cho từng thành viên với con số của chính nó. AI cũng nhìn thấy con số
+dưới dạng mã, nên không thể dịch sai hay làm tròn nó.
+"""
+
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+from config import CONFIG
+from utils.filter import protect_placeholders
+from utils.placeholders import next_token
+
+# Số đứng riêng: nguyên hoặc thập phân, không dính chữ/số/`_` ở hai bên.
+NUMBER_PATTERN = re.compile(r'(?<![\w.,])\d+(?:[.,]\d+)?(?![\w])')
+
+Protector = Callable[[str], Tuple[str, Dict[str, str]]]
+
+
+def protect_template(text: str) -> Tuple[str, Dict[str, str]]:
+    """
+    `protect_placeholders` + bảo vệ các số đứng riêng.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: (chuỗi đã bảo vệ, bảng ánh xạ mã -> giá trị gốc).
+    """
+    protected, replacements = protect_placeholders(text)
+
+    def protect_number(match: re.Match) -> str:
+        token = next_token()
+        replacements[token] = match.group(0)
+        return token
+
+    # Chữ số bên trong các mã `__PROTECTED_N__` luôn đứng sau `_` nên không bao giờ khớp.
+    return NUMBER_PATTERN.sub(protect_number, protected), replacements
+
+
+def get_protector(template_dedup: Optional[bool] = None) -> Protector:
+    """Hàm bảo vệ đang dùng: `protect_template` nếu bật `template_dedup` trong CONFIG."""
+    if template_dedup is None:
+        template_dedup = CONFIG.get("template_dedup", True)
+    return protect_template if template_dedup else protect_placeholders
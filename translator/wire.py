@@ -0,0 +1,520 @@
+# translator/wire.py
+"""
+Định dạng dữ liệu gửi/nhận với API ("wire format") cho mỗi batch.
+
+- `legacy`: định dạng cũ. Mỗi mục là `{"index": N, "value": "..."}` với các placeholder
+  hiển thị dưới dạng `__PROTECTED_123__` (bộ đếm toàn cục nên mã ngày càng dài),
+  AI trả về các object `{"index", "translation"}`.
+- `compact`: định dạng tiết kiệm token. Placeholder của MỖI chuỗi được đánh số lại từ 0
+  thành mã ngắn `{0}`, `{1}`...; dữ liệu gửi đi là một JSON array các chuỗi theo thứ tự
+  (không lặp lại tên khóa, không gửi index) và AI trả về một JSON array các bản dịch
+  đúng thứ tự đó. Văn bản không bị escape `\\uXXXX` nên chữ CJK/tiếng Việt cũng gọn hơn.
+
+Cả hai định dạng dùng chung phần bối cảnh, bảng thuật ngữ và quy tắc văn phong.
+
+Khi bật `structured_output` (mặc định tắt), request khai báo `response_mime_type` JSON và
+một `response_schema` (mảng đúng số phần tử của batch) qua Gemini API: response là JSON
+thuần, được đọc thẳng bằng `json.loads` (không tìm mảng bằng regex, không bóc markdown) và
+từng phần tử được kiểm tra kiểu khi đọc.
+
+Với `stream_responses`, response được đọc dần theo từng mảnh (`StreamingParse`): mỗi bản
+dịch được trả về ngay khi phần tử JSON của nó hoàn chỉnh, và các bản dịch đã nhận được vẫn
+giữ lại khi response bị cắt ngang.
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import CONFIG
+from translator.memory import to_template
+from translator.templates import Protector, get_protector
+from utils.filter import restore_placeholders
+from utils.jsonstream import JsonArrayParser
+from utils.placeholders import TOKEN_PATTERN
+from utils.tokens import TokenCalibrator, estimate_tokens
+
+# Mã ngắn của định dạng compact: {0}, {1}, ...
+LOCAL_MARKER = re.compile(r'\{(\d+)\}')
+
+# Đọc một phần tử của JSON array trong response: (vị trí, phần tử) -> mục kết quả hoặc None.
+ElementParser = Callable[[int, Any], Optional[Dict]]
+
+
+class WireItem:
+    """Một mục đã được bảo vệ placeholder, sẵn sàng để đưa vào prompt."""
+
+    __slots__ = ("index", "text", "replacements", "markers")
+
+    def __init__(self, index: int, text: str, replacements: Dict[str, str], markers: Optional[List[str]] = None):
+        self.index = index
+        # Chuỗi gửi đi (đã bảo vệ, và đã đổi sang mã ngắn nếu là định dạng compact).
+        self.text = text
+        self.replacements = replacements
+        # Mã ngắn thứ i ứng với mã toàn cục markers[i]; None nếu chuỗi giữ mã toàn cục.
+        self.markers = markers
+
+    def globalize(self, text: Optional[str] = None) -> str:
+        """Đổi mã ngắn `{i}` trong `text` (mặc định là chuỗi gửi đi) về mã toàn cục."""
+        text = self.text if text is None else text
+        if not self.markers:
+            return text
+        markers = self.markers
+
+        def to_global(match: re.Match) -> str:
+            number = int(match.group(1))
+            return markers[number] if number < len(markers) else match.group(0)
+
+        return LOCAL_MARKER.sub(to_global, text)
+
+    def restore(self, translated: str) -> str:
+        """Đưa bản dịch (còn chứa mã) về chuỗi hoàn chỉnh."""
+        return restore_placeholders(self.globalize(translated), self.replacements)
+
+    def template(self, translated: str) -> Optional[str]:
+        """Bản dịch ở dạng mẫu của bộ nhớ dịch (xem `translator/memory.py`)."""
+        return to_template(self.globalize(), self.globalize(translated), self.replacements)
+
+    def result(self, translated: str) -> Dict:
+        """Mục kết quả `{'index', 'value', 'template'}` cho bản dịch (còn chứa mã)."""
+        return {'index': self.index, 'value': self.restore(translated), 'template': self.template(translated)}
+
+
+class CountMismatch(ValueError):
+    """AI trả về số bản dịch khác với số chuỗi gửi đi."""
+
+
+class TruncatedResponse(ValueError):
+    """Response bị cắt cụt vì hết giới hạn token output (finish_reason MAX_TOKENS)."""
+
+
+def estimate_request_tokens(prompt: str, items: List[WireItem], calibrator: Optional[TokenCalibrator] = None) -> int:
+    """Token ước lượng của cả request: prompt gửi đi + bản dịch sẽ nhận về."""
+    calibrator = calibrator or TokenCalibrator()
+    return calibrator.request_tokens(estimate_tokens(prompt), sum(estimate_tokens(item.text) for item in items))
+
+
+def response_tokens(response) -> Optional[int]:
+    """Tổng số token thực tế của một response (`usage_metadata`), None nếu API không trả về."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total or None
+
+
+def calibrate(calibrator: TokenCalibrator, prompt: str, items: List[WireItem], response) -> None:
+    """Cập nhật `calibrator` từ số token thực tế của response (nếu API trả về)."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_actual = getattr(usage, "prompt_token_count", None)
+    output_actual = getattr(usage, "candidates_token_count", None)
+    if prompt_actual and output_actual:
+        calibrator.observe(estimate_tokens(prompt), prompt_actual,
+                           sum(estimate_tokens(item.text) for item in items), output_actual)
+
+
+def check_truncated(response) -> None:
+    """
+    Raises:
+        TruncatedResponse: Response dừng vì hết giới hạn token output.
+    """
+    for candidate in getattr(response, "candidates", None) or ():
+        reason = getattr(candidate, "finish_reason", None)
+        if getattr(reason, "name", reason) == "MAX_TOKENS":
+            raise TruncatedResponse("Response bị cắt cụt (MAX_TOKENS).")
+
+
+def _glossary_block(glossary: Dict[str, str]) -> str:
+    return "\n".join([f"- {en}: {vi}" for en, vi in glossary.items()]) or "Không có thuật ngữ nào được cung cấp."
+
+
+def _extract_array(raw_output: str) -> list:
+    json_match = re.search(r'\[.*\]', raw_output, re.DOTALL)
+    if not json_match:
+        raise ValueError("Không tìm thấy JSON array trong response từ AI.")
+    return json.loads(json_match.group(0))
+
+
+def _count_mismatch(sent: int, received: int) -> CountMismatch:
+    return CountMismatch(f"AI trả về sai số lượng! Gửi đi: {sent}, Nhận về: {received}")
+
+
+def _array_schema(element: Dict, count: int) -> Dict:
+    return {"type": "array", "items": element, "min_items": count, "max_items": count}
+
+
+def generation_config(wire, items: List[WireItem]) -> Optional[Dict]:
+    """`generation_config` của request: JSON theo `response_schema` khi bật `structured_output`, None nếu không."""
+    if not wire.structured:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": wire.response_schema(items)}
+
+
+def _parse_array(wire, raw_output: str, items: List[WireItem]) -> List[Dict]:
+    """Đọc cả response một lượt bằng bộ đọc phần tử của định dạng `wire`."""
+    if wire.structured:
+        # Response đã là JSON theo schema: không cần tìm mảng trong văn bản.
+        api_results = json.loads(raw_output)
+        if not isinstance(api_results, list):
+            raise ValueError("Response từ AI không phải là JSON array.")
+    else:
+        api_results = _extract_array(raw_output)
+    if len(api_results) != len(items):
+        raise _count_mismatch(len(items), len(api_results))
+    parse_element = wire.element_parser(items)
+    final_results = []
+    for position, element in enumerate(api_results):
+        result = parse_element(position, element)
+        if result is not None:
+            final_results.append(result)
+    return final_results
+
+
+def chunk_text(chunk) -> str:
+    """Văn bản của một mảnh response streaming ("" nếu mảnh không có văn bản, ví dụ mảnh chỉ có finish_reason)."""
+    try:
+        return chunk.text
+    except (ValueError, AttributeError):
+        return ""
+
+
+class StreamingParse:
+    """
+    Đọc response streaming của một batch.
+
+    `feed` nhận từng mảnh văn bản và trả về các mục kết quả vừa hoàn chỉnh; `finish` kiểm
+    tra response khi đã nhận hết. `kept(error)` là các index có thể giữ lại khi batch lỗi
+    giữa chừng.
+
+    Với định dạng theo vị trí (`positional`), một lỗi sai số lượng ở cuối response có nghĩa
+    là các bản dịch đã đọc có thể bị lệch, nên `feed` giữ lại các mục (trả về rỗng) và chúng
+    chỉ được lấy ra bằng `pending` khi batch đã xong hoặc đã biết mục nào giữ được. Như vậy
+    bản dịch lệch không bao giờ vào bộ nhớ dịch hay file tiến độ tạm.
+
+    Args:
+        wire: Định dạng dữ liệu của batch.
+        items: Các mục đã gửi đi.
+    """
+
+    def __init__(self, wire, items: List[WireItem]):
+        self.wire = wire
+        self.items = items
+        self.delivered: List[int] = []
+        self._parser = JsonArrayParser()
+        self._parse_element = wire.element_parser(items)
+        self._chunks: List[str] = []
+        # Các mục đã đọc nhưng chưa trả về (định dạng theo vị trí).
+        self._held: List[Dict] = []
+
+    @property
+    def raw_output(self) -> str:
+        return "".join(self._chunks).strip()
+
+    def feed(self, text: str) -> List[Dict]:
+        self._chunks.append(text)
+        results = []
+        start = self._parser.count
+        for offset, element in enumerate(self._parser.feed(text)):
+            result = self._parse_element(start + offset, element)
+            if result is not None:
+                results.append(result)
+                self.delivered.append(result['index'])
+        if self.wire.positional:
+            self._held.extend(results)
+            return []
+        return results
+
+    def pending(self, indexes: Optional[Iterable[int]] = None) -> List[Dict]:
+        """
+        Các mục đã đọc mà `feed` chưa trả về (chỉ những mục có index trong `indexes`, nếu có);
+        sau lần gọi này chúng được coi là đã trả về.
+        """
+        held, self._held = self._held, []
+        if indexes is None:
+            return held
+        indexes = set(indexes)
+        return [result for result in held if result['index'] in indexes]
+
+    def finish(self) -> None:
+        """
+        Raises:
+            ValueError: Response không có JSON array hoặc mảng chưa đóng.
+            CountMismatch: Sai số lượng mục.
+        """
+        if not self._parser.started:
+            raise ValueError("Không tìm thấy JSON array trong response từ AI.")
+        if not self._parser.closed:
+            raise ValueError("JSON array trong response từ AI không hoàn chỉnh.")
+        if self._parser.count != len(self.items):
+            raise _count_mismatch(len(self.items), self._parser.count)
+
+    def kept(self, error: Exception) -> List[int]:
+        """
+        Index của các mục đã trả về mà vẫn tin được khi batch lỗi vì `error`.
+
+        Response bị cắt ngang giữ được phần đầu; nhưng với định dạng theo vị trí, sai số
+        lượng nghĩa là không biết từ mục nào bản dịch bị lệch, nên không giữ mục nào.
+        """
+        if isinstance(error, CountMismatch) and self.wire.positional:
+            return []
+        return list(self.delivered)
+
+
+class LegacyWireFormat:
+    """Định dạng cũ: object `{"index", "value"}` và mã `__PROTECTED_N__`."""
+
+    name = "legacy"
+    # Bản dịch khớp theo index: một mục thiếu/thừa không làm lệch các mục khác.
+    positional = False
+
+    def __init__(self, protect: Optional[Protector] = None, structured: Optional[bool] = None):
+        # Hàm bảo vệ placeholder (bảo vệ cả con số nếu bật `template_dedup`).
+        self.protect = protect or get_protector()
+        # Yêu cầu output JSON theo `response_schema` (xem `generation_config`).
+        self.structured = CONFIG.get("structured_output", False) if structured is None else structured
+
+    def prepare(self, batch: List[Dict]) -> List[WireItem]:
+        prepared = []
+        for item in batch:
+            protected_text, replacements = self.protect(item.get('value', ''))
+            prepared.append(WireItem(item['index'], protected_text, replacements))
+        return prepared
+
+    def build_prompt(self, items: List[WireItem], glossary: Dict[str, str]) -> str:
+        """
+        NÂNG CẤP: Xây dựng prompt chuyên sâu, được tối ưu hóa cho game Quỷ Cốc Bát Hoang.
+        """
+        input_block = ",\n".join([
+            f'{{"index": {item.index}, "value": {json.dumps(item.text)}}}'
+            for item in items
+        ])
+        glossary_str = _glossary_block(glossary)
+
+        prompt = f"""
+        Bạn là một Đại Lão Tu Tiên đã chơi Quỷ Cốc Bát Hoang hàng vạn giờ, am hiểu sâu sắc từng thuật ngữ, bối cảnh và văn phong của game. Vai trò của bạn là một API JSON, dịch các chuỗi text từ {CONFIG['source_language']} sang {CONFIG['target_language']} với sự chính xác và "cái hồn" của một người trong giới tu tiên.
+
+        ---
+        ## BỐI CẢNH GAME (BẮT BUỘC GHI NHỚ)
+        - **Tên Game**: Quỷ Cốc Bát Hoang (Tale of Immortal).
+        - **Thể loại**: Tu tiên, huyền huyễn, thế giới mở.
+        - **Yếu tố chính**: Tu luyện cảnh giới, độ kiếp, linh căn, công pháp, tâm pháp, pháp bảo, đan dược, tông môn, đạo hữu, kỳ ngộ, thần thú, yêu thú...
+
+        ---
+        ## BẢNG THUẬT NGỮ (TUÂN THỦ TUYỆT ĐỐI)
+        {glossary_str}
+
+        ---
+        ## QUY TẮC VĂN PHONG (QUAN TRỌNG)
+        1.  **Sử dụng từ Hán Việt**: Ưu tiên các từ Hán Việt phù hợp với không khí tu tiên (ví dụ: "Linh Khí", "Công Pháp", "Đan Dược", "Tâm Ma", "Độ Kiếp").
+        2.  **Xưng hô**: Dịch "You" một cách linh hoạt tùy ngữ cảnh: "Ngươi" (khi nói với đối thủ, người vai vế thấp hơn), "Ta" (khi nhân vật tự xưng), "Đạo hữu" (khi giao tiếp với người tu tiên khác), "Tại hạ", "Tiền bối", "Hậu bối"...
+        3.  **Giọng văn**: Duy trì giọng văn trang trọng, cổ phong, mang hơi hướng truyện kiếm hiệp, tiên hiệp. TUYỆT ĐỐI không dùng từ ngữ hiện đại, "teen code" hay văn nói suồng sã.
+
+        ---
+        ## QUY TẮC KỸ THUẬT (SAI SÓT SẼ GÂY LỖI GAME)
+        1.  **BẢO TOÀN PLACEHOLDER**: TUYỆT ĐỐI không dịch hay thay đổi các mã định danh như `__PROTECTED_0__`, `__PROTECTED_1__`. Giữ nguyên 100%.
+        2.  **ĐỊNH DẠNG OUTPUT**: BẮT BUỘC chỉ trả về một JSON array hợp lệ. Mỗi object phải có dạng `{{"index": <số>, "translation": "<bản dịch>"}}`. Số lượng object phải là {len(items)}. Không thêm bất kỳ giải thích hay markdown nào khác.
+        3.  **BẢO TOÀN KHOẢNG TRẮNG**: Giữ nguyên mọi khoảng trắng và ký tự xuống dòng (\\n) ở đầu và cuối chuỗi dịch. KHÔNG được tự động xóa chúng.
+        4.  **BẢO TOÀN CÁC BIẾN, THẺ, ĐƯỜNG DẪN**: TUYỆT ĐỐI 100% KHÔNG DỊCH HAY SỬA CÁC TỪ CÓ DẤU HIỆU LÀ BIẾN, THẺ, ĐƯỜNG DẪN VÀ CÁC DẤU HIỆU LẠ KHÁC.
+        ---
+        ## VÍ DỤ MẪU (HỌC THEO)
+        - **Ví dụ 1 (Đột phá cảnh giới):**
+          INPUT: `{{ "index": 999, "text": "You have broken through to the Foundation Establishment Realm." }}`
+          OUTPUT: `{{ "index": 999, "translation": "Ngươi đã đột phá đến cảnh giới Trúc Cơ." }}`
+        - **Ví dụ 2 (Đối thoại):**
+          INPUT: `{{ "index": 998, "text": "Fellow Daoist, this __PROTECTED_0__ is a rare treasure." }}`
+          OUTPUT: `{{ "index": 998, "translation": "Đạo hữu, món __PROTECTED_0__ này quả là một kỳ trân dị bảo." }}`
+        - **Ví dụ 3 (Mô tả vật phẩm):**
+          INPUT: `{{ "index": 997, "text": "A pill that increases Qi absorption speed by __PROTECTED_0__%." }}`
+          OUTPUT: `{{ "index": 997, "translation": "Một viên đan dược giúp tăng tốc độ hấp thu Linh Khí thêm __PROTECTED_0__%." }}`
+
+        ---
+        ## DỮ LIỆU CẦN DỊCH:
+        [
+        {input_block}
+        ]
+
+        ## JSON OUTPUT:
+        """
+        return prompt
+
+    def parse(self, raw_output: str, items: List[WireItem]) -> List[Dict]:
+        """
+        Đọc response và trả về các mục `{"index", "value"}` đã khôi phục placeholder.
+
+        Raises:
+            ValueError: Response không có JSON array.
+            CountMismatch: Sai số lượng mục.
+        """
+        return _parse_array(self, raw_output, items)
+
+    def response_schema(self, items: List[WireItem]) -> Dict:
+        """Schema của response: mảng đúng `len(items)` object `{"index", "translation"}`."""
+        element = {
+            "type": "object",
+            "properties": {"index": {"type": "integer"}, "translation": {"type": "string"}},
+            "required": ["index", "translation"],
+        }
+        return _array_schema(element, len(items))
+
+    def element_parser(self, items: List[WireItem]) -> ElementParser:
+        """Bộ đọc từng object `{"index", "translation"}` (khớp mục theo index, không theo vị trí)."""
+        by_index = {item.index: item for item in items}
+
+        def parse_element(position: int, element: Any) -> Optional[Dict]:
+            if not isinstance(element, dict):
+                raise ValueError(f"AI trả về phần tử không phải object ở vị trí {position}: {element!r}")
+            item = by_index.get(element.get('index'))
+            translated = element.get('translation')
+            if translated is not None and not isinstance(translated, str):
+                raise ValueError(f"AI trả về bản dịch không phải chuỗi ở vị trí {position}: {translated!r}")
+            if item is None or not translated:
+                return None
+            return item.result(translated)
+
+        return parse_element
+
+    def render_response(self, items: List[WireItem], translations: List[str]) -> str:
+        """Response mà định dạng này sẽ nhận được cho các bản dịch (dùng để so sánh token)."""
+        return json.dumps([{"index": item.index, "translation": text} for item, text in zip(items, translations)])
+
+
+class CompactWireFormat:
+    """Định dạng tiết kiệm token: mã ngắn theo từng chuỗi và mảng theo vị trí."""
+
+    name = "compact"
+    # Bản dịch khớp theo vị trí: sai số lượng thì mọi mục đều có thể bị lệch.
+    positional = True
+
+    def __init__(self, protect: Optional[Protector] = None, structured: Optional[bool] = None):
+        self.protect = protect or get_protector()
+        self.structured = CONFIG.get("structured_output", False) if structured is None else structured
+
+    def prepare(self, batch: List[Dict]) -> List[WireItem]:
+        prepared = []
+        for item in batch:
+            protected_text, replacements = self.protect(item.get('value', ''))
+            if not replacements or LOCAL_MARKER.search(protected_text):
+                # Không có placeholder, hoặc chuỗi sẵn có dạng `{số}` (trùng với mã ngắn):
+                # giữ nguyên mã toàn cục cho chuỗi này.
+                prepared.append(WireItem(item['index'], protected_text, replacements))
+                continue
+
+            markers: List[str] = []
+            local: Dict[str, int] = {}
+
+            def to_local(match: re.Match) -> str:
+                token = match.group(0)
+                if token not in replacements:
+                    return token
+                if token not in local:
+                    local[token] = len(markers)
+                    markers.append(token)
+                return f"{{{local[token]}}}"
+
+            local_text = TOKEN_PATTERN.sub(to_local, protected_text)
+            prepared.append(WireItem(item['index'], local_text, replacements, markers))
+        return prepared
+
+    def build_prompt(self, items: List[WireItem], glossary: Dict[str, str]) -> str:
+        input_block = ",\n".join(json.dumps(item.text, ensure_ascii=False) for item in items)
+        glossary_str = _glossary_block(glossary)
+
+        return f"""Bạn là một Đại Lão Tu Tiên đã chơi Quỷ Cốc Bát Hoang hàng vạn giờ, am hiểu sâu sắc từng thuật ngữ, bối cảnh và văn phong của game. Vai trò của bạn là một API JSON, dịch các chuỗi text từ {CONFIG['source_language']} sang {CONFIG['target_language']} với sự chính xác và "cái hồn" của một người trong giới tu tiên.
+
+## BỐI CẢNH GAME
+Quỷ Cốc Bát Hoang (Tale of Immortal) - tu tiên, huyền huyễn, thế giới mở: cảnh giới, độ kiếp, linh căn, công pháp, tâm pháp, pháp bảo, đan dược, tông môn, đạo hữu, kỳ ngộ, thần thú, yêu thú...
+
+## BẢNG THUẬT NGỮ (TUÂN THỦ TUYỆT ĐỐI)
+{glossary_str}
+
+## QUY TẮC VĂN PHONG
+1. Ưu tiên từ Hán Việt hợp không khí tu tiên ("Linh Khí", "Công Pháp", "Đan Dược", "Tâm Ma", "Độ Kiếp").
+2. Dịch "You" linh hoạt: "Ngươi", "Ta", "Đạo hữu", "Tại hạ", "Tiền bối", "Hậu bối"...
+3. Giọng văn trang trọng, cổ phong, tiên hiệp. Không dùng từ ngữ hiện đại, "teen code", văn nói suồng sã.
+
+## QUY TẮC KỸ THUẬT (SAI SÓT SẼ GÂY LỖI GAME)
+1. Giữ nguyên 100% các mã `{{0}}`, `{{1}}`... và `__PROTECTED_N__`; có thể đổi vị trí của mã trong câu.
+2. Input là JSON array các chuỗi. Output BẮT BUỘC chỉ là một JSON array gồm đúng {len(items)} chuỗi bản dịch, cùng thứ tự với input. Không thêm giải thích hay markdown.
+3. Giữ nguyên mọi khoảng trắng và ký tự xuống dòng (\\n) ở đầu và cuối chuỗi.
+4. KHÔNG dịch hay sửa các từ có dấu hiệu là biến, thẻ, đường dẫn và các dấu hiệu lạ khác.
+
+## VÍ DỤ
+INPUT: ["You have broken through to the Foundation Establishment Realm.","Fellow Daoist, this {{0}} is a rare treasure.","Increases Qi absorption speed by {{0}}% for {{1}}."]
+OUTPUT: ["Ngươi đã đột phá đến cảnh giới Trúc Cơ.","Đạo hữu, món {{0}} này quả là một kỳ trân dị bảo.","Tăng tốc độ hấp thu Linh Khí thêm {{0}}% trong {{1}}."]
+
+## INPUT
+[
+{input_block}
+]
+
+## OUTPUT
+"""
+
+    def parse(self, raw_output: str, items: List[WireItem]) -> List[Dict]:
+        """
+        Đọc response (JSON array các chuỗi, theo thứ tự input).
+
+        Raises:
+            ValueError: Response không có JSON array hoặc phần tử không phải chuỗi.
+            CountMismatch: Sai số lượng mục.
+        """
+        return _parse_array(self, raw_output, items)
+
+    def response_schema(self, items: List[WireItem]) -> Dict:
+        """Schema của response: mảng đúng `len(items)` chuỗi."""
+        return _array_schema({"type": "string"}, len(items))
+
+    def element_parser(self, items: List[WireItem]) -> ElementParser:
+        """Bộ đọc từng chuỗi bản dịch (phần tử thứ i là bản dịch của mục thứ i)."""
+
+        def parse_element(position: int, translated: Any) -> Optional[Dict]:
+            if position >= len(items):
+                return None
+            item = items[position]
+            if not isinstance(translated, str):
+                raise ValueError(f"AI trả về phần tử không phải chuỗi cho index {item.index}: {translated!r}")
+            return item.result(translated) if translated else None
+
+        return parse_element
+
+    def render_response(self, items: List[WireItem], translations: List[str]) -> str:
+        return json.dumps(translations, ensure_ascii=False)
+
+
+WIRE_FORMATS = {
+    LegacyWireFormat.name: LegacyWireFormat,
+    CompactWireFormat.name: CompactWireFormat,
+}
+
+
+def get_wire_format(name: Optional[str] = None):
+    """Định dạng theo tên (mặc định lấy `wire_format` trong CONFIG)."""
+    name = name or CONFIG.get("wire_format", "compact")
+    if name not in WIRE_FORMATS:
+        raise ValueError(f"wire_format không hợp lệ: '{name}'. Chọn một trong: {', '.join(WIRE_FORMATS)}")
+    return WIRE_FORMATS[name]()
+
+
+def token_comparison(wire, items: List[WireItem], prompt: str, raw_output: str,
+                     glossary: Dict[str, str]) -> Optional[str]:
+    """
+    So sánh số token (ước lượng) của batch vừa gửi với định dạng cũ (`legacy`).
+
+    Phần response của định dạng cũ được dựng lại từ chính các bản dịch nhận được.
+    Trả về None nếu batch đang dùng định dạng cũ.
+    """
+    if wire.name == LegacyWireFormat.name:
+        return None
+    legacy = LegacyWireFormat()
+    # Dựng lại chuỗi đã bảo vệ với mã toàn cục mà không tạo mã mới.
+    legacy_items = [WireItem(item.index, item.globalize(), item.replacements) for item in items]
+    legacy_prompt = legacy.build_prompt(legacy_items, glossary)
+    translations = [item.globalize(text) if isinstance(text, str) else ""
+                    for item, text in zip(items, _extract_array(raw_output))]
+    legacy_output = legacy.render_response(legacy_items, translations)
+
+    sent, sent_legacy = estimate_tokens(prompt), estimate_tokens(legacy_prompt)
+    received, received_legacy = estimate_tokens(raw_output), estimate_tokens(legacy_output)
+    total, total_legacy = sent + received, sent_legacy + received_legacy
+    saved = (1 - total / total_legacy) * 100 if total_legacy else 0.0
+    return (f"🪙 Token (ước lượng) [{wire.name}]: gửi ~{sent} / nhận ~{received} | "
+            f"định dạng cũ: gửi ~{sent_legacy} / nhận ~{received_legacy} | tiết kiệm {saved:.0f}%")
+
@@ -1,177 +1,179 @@
 # translator/worker.py
 import threading
 import time
-import json
-import re
 import logging
 from queue import Queue
-from typing import Dict, List
-
-import google.generativeai as genai
+from typing import Dict, List, Optional
 
 # Import các thành phần cần thiết từ các file khác
 from config import CONFIG
-from utils.filter import protect_placeholders, restore_placeholders
+from translator.batcher import AdaptiveBatcher
+from translator.client_pool import ClientPool
+from translator.glossary import GlossaryIndex
+from translator.key_health import KeyScheduler
+from translator.routing import ModelRouter
+from translator.rate_limiter import RateLimiter, backoff_delay, is_rate_limited, retry_after
+from translator.wire import (StreamingParse, WireItem, calibrate, check_truncated, chunk_text, estimate_request_tokens,
+                             generation_config, get_wire_format, response_tokens, token_comparison)
 
 logger = logging.getLogger("TranslatorLogger")
 
+# Thời gian chờ tối đa (giây) giữa hai lần hỏi lại bộ điều phối khi key chưa được gửi request.
+_SCHEDULER_POLL = 1.0
+
 class TranslatorWorker(threading.Thread):
-    def __init__(self, thread_id: int, api_key: str, work_queue: Queue, results_queue: Queue, glossary: Dict[str, str]):
+    def __init__(self, thread_id: int, api_key: str, batcher: AdaptiveBatcher, results_queue: Queue,
+                 glossary: GlossaryIndex, rate_limiter: Optional[RateLimiter] = None,
+                 scheduler: Optional[KeyScheduler] = None, client_pool: Optional[ClientPool] = None,
+                 router: Optional[ModelRouter] = None):
         super().__init__()
         self.thread_id = thread_id
         self.api_key = api_key
-        self.work_queue = work_queue
+        self.batcher = batcher
         self.results_queue = results_queue
         self.glossary = glossary
-        self.model = None
-        self.last_request_time = 0
-        self.rate_limit_seconds = 60.0 / CONFIG["requests_per_minute_per_key"]
+        # Client riêng của key (không dùng `genai.configure` toàn cục), dùng lại giữa các batch.
+        self.pool = client_pool or ClientPool({thread_id: api_key})
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.router = router or ModelRouter()
+        self.scheduler = scheduler or KeyScheduler()
+        self.scheduler.register(thread_id)
+        self.wire = get_wire_format()
+        self.timeout = CONFIG.get("request_timeout", 120)
+        self.stream = CONFIG.get("stream_responses", False)
         self.name = f"Worker-{self.thread_id}" # Đặt tên cho luồng để log dễ đọc hơn
 
     def _configure_model(self):
-        """Cấu hình mô hình GenerativeAI cho luồng này."""
+        """Tạo client riêng của key trong bể client (xem `translator/client_pool.py`)."""
         try:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(CONFIG["model_name"])
+            self.pool.check(self.thread_id)
             logger.info(f"Đã cấu hình model thành công với Key #{self.thread_id}.")
             return True
         except Exception as e:
             logger.error(f"LỖI NGHIÊM TRỌNG khi cấu hình Key #{self.thread_id}: {e}")
+            self.scheduler.disable(self.thread_id, str(e))
             return False
 
 
-    def _build_prompt(self, batch_to_translate: List[Dict]) -> str:
-        """
-        NÂNG CẤP: Xây dựng prompt chuyên sâu, được tối ưu hóa cho game Quỷ Cốc Bát Hoang.
-        """
-        # input_block và glossary_str giữ nguyên cách tạo
-        input_block = ",\n".join([
-            f'{{"index": {item["index"]}, "value": {json.dumps(item["value"])}}}'
-            for item in batch_to_translate
-        ])
-        glossary_str = "\n".join([f"- {en}: {vi}" for en, vi in self.glossary.items()]) or "Không có thuật ngữ nào được cung cấp."
-    
-        # --- ĐÂY LÀ PHẦN PROMPT MỚI, CHI TIẾT VÀ BÁ ĐẠO HƠN ---
-        prompt = f"""
-        Bạn là một Đại Lão Tu Tiên đã chơi Quỷ Cốc Bát Hoang hàng vạn giờ, am hiểu sâu sắc từng thuật ngữ, bối cảnh và văn phong của game. Vai trò của bạn là một API JSON, dịch các chuỗi text từ {CONFIG['source_language']} sang {CONFIG['target_language']} với sự chính xác và "cái hồn" của một người trong giới tu tiên.
-    
-        ---
-        ## BỐI CẢNH GAME (BẮT BUỘC GHI NHỚ)
-        - **Tên Game**: Quỷ Cốc Bát Hoang (Tale of Immortal).
-        - **Thể loại**: Tu tiên, huyền huyễn, thế giới mở.
-        - **Yếu tố chính**: Tu luyện cảnh giới, độ kiếp, linh căn, công pháp, tâm pháp, pháp bảo, đan dược, tông môn, đạo hữu, kỳ ngộ, thần thú, yêu thú...
-    
-        ---
-        ## BẢNG THUẬT NGỮ (TUÂN THỦ TUYỆT ĐỐI)
-        {glossary_str}
-    
-        ---
-        ## QUY TẮC VĂN PHONG (QUAN TRỌNG)
-        1.  **Sử dụng từ Hán Việt**: Ưu tiên các từ Hán Việt phù hợp với không khí tu tiên (ví dụ: "Linh Khí", "Công Pháp", "Đan Dược", "Tâm Ma", "Độ Kiếp").
-        2.  **Xưng hô**: Dịch "You" một cách linh hoạt tùy ngữ cảnh: "Ngươi" (khi nói với đối thủ, người vai vế thấp hơn), "Ta" (khi nhân vật tự xưng), "Đạo hữu" (khi giao tiếp với người tu tiên khác), "Tại hạ", "Tiền bối", "Hậu bối"...
-        3.  **Giọng văn**: Duy trì giọng văn trang trọng, cổ phong, mang hơi hướng truyện kiếm hiệp, tiên hiệp. TUYỆT ĐỐI không dùng từ ngữ hiện đại, "teen code" hay văn nói suồng sã.
-    
-        ---
-        ## QUY TẮC KỸ THUẬT (SAI SÓT SẼ GÂY LỖI GAME)
-        1.  **BẢO TOÀN PLACEHOLDER**: TUYỆT ĐỐI không dịch hay thay đổi các mã định danh như `__PROTECTED_0__`, `__PROTECTED_1__`. Giữ nguyên 100%.
-        2.  **ĐỊNH DẠNG OUTPUT**: BẮT BUỘC chỉ trả về một JSON array hợp lệ. Mỗi object phải có dạng `{{"index": <số>, "translation": "<bản dịch>"}}`. Số lượng object phải là {len(batch_to_translate)}. Không thêm bất kỳ giải thích hay markdown nào khác.
-        3.  **BẢO TOÀN KHOẢNG TRẮNG**: Giữ nguyên mọi khoảng trắng và ký tự xuống dòng (\\n) ở đầu và cuối chuỗi dịch. KHÔNG được tự động xóa chúng.
-        4.  **BẢO TOÀN CÁC BIẾN, THẺ, ĐƯỜNG DẪN**: TUYỆT ĐỐI 100% KHÔNG DỊCH HAY SỬA CÁC TỪ CÓ DẤU HIỆU LÀ BIẾN, THẺ, ĐƯỜNG DẪN VÀ CÁC DẤU HIỆU LẠ KHÁC.
-        ---
-        ## VÍ DỤ MẪU (HỌC THEO)
-        - **Ví dụ 1 (Đột phá cảnh giới):**
-          INPUT: `{{ "index": 999, "text": "You have broken through to the Foundation Establishment Realm." }}`
-          OUTPUT: `{{ "index": 999, "translation": "Ngươi đã đột phá đến cảnh giới Trúc Cơ." }}`
-        - **Ví dụ 2 (Đối thoại):**
-          INPUT: `{{ "index": 998, "text": "Fellow Daoist, this __PROTECTED_0__ is a rare treasure." }}`
-          OUTPUT: `{{ "index": 998, "translation": "Đạo hữu, món __PROTECTED_0__ này quả là một kỳ trân dị bảo." }}`
-        - **Ví dụ 3 (Mô tả vật phẩm):**
-          INPUT: `{{ "index": 997, "text": "A pill that increases Qi absorption speed by __PROTECTED_0__%." }}`
-          OUTPUT: `{{ "index": 997, "translation": "Một viên đan dược giúp tăng tốc độ hấp thu Linh Khí thêm __PROTECTED_0__%." }}`
-    
-        ---
-        ## DỮ LIỆU CẦN DỊCH:
-        [
-        {input_block}
-        ]
-    
-        ## JSON OUTPUT:
-        """
-        return prompt
-
-    def _rate_limit(self):
-        """Đảm bảo không vượt quá giới hạn request mỗi phút."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit_seconds:
-            wait_time = self.rate_limit_seconds - elapsed
-            logger.info(f"Rate limiting. Chờ {wait_time:.2f} giây...")
-            time.sleep(wait_time)
-        self.last_request_time = time.time()
+    def _build_prompt(self, batch_to_translate: List[WireItem], glossary: Dict[str, str]) -> str:
+        """Xây dựng prompt theo định dạng dữ liệu đang dùng (xem `translator/wire.py`)."""
+        return self.wire.build_prompt(batch_to_translate, glossary)
+
+    def _rate_limit(self, limiter, tokens: int):
+        """Giữ chỗ trong hạn mức RPM/TPM của key (xem `translator/rate_limiter.py`) và chờ nếu cần."""
+        reservation = limiter.reserve(tokens)
+        if reservation.wait > 0:
+            logger.info(f"Rate limiting. Chờ {reservation.wait:.2f} giây...")
+            time.sleep(reservation.wait)
+        return reservation
+
+    def _generate_streaming(self, model, prompt: str, batch: Dict, stream: StreamingParse):
+        """Gửi request streaming; mỗi bản dịch được đưa vào hàng đợi ngay khi đọc được."""
+        response = model.generate_content(prompt, stream=True, generation_config=generation_config(self.wire, stream.items),
+                                               request_options={"timeout": self.timeout})
+        for chunk in response:
+            results = stream.feed(chunk_text(chunk))
+            if results:
+                self.results_queue.put({'batch_id': batch['batch_id'], 'results': results, 'partial': True})
+                self.batcher.stream_progress(batch, len(stream.delivered))
+        return response
 
     def run(self):
-        """Vòng lặp chính của worker."""
+        """Vòng lặp chính của worker: lấy batch từ bộ chia batch động cho đến khi hết việc."""
         if not self._configure_model():
             return
 
         while True:
+            wait = self.scheduler.acquire(self.thread_id)
+            if wait is None:
+                logger.error(f"Key #{self.thread_id} đã bị vô hiệu hóa. Kết thúc.")
+                break
+            if wait > 0:
+                # Mạch của key đang mở: các key khác lấy việc từ bể chung trong lúc chờ.
+                if self.batcher.finished:
+                    break
+                time.sleep(min(wait, _SCHEDULER_POLL))
+                continue
             try:
-                batch = self.work_queue.get()
+                batch = self.batcher.next_batch(key=self.thread_id)
                 if batch is None:
-                    logger.info("Nhận được tín hiệu dừng. Kết thúc.")
+                    logger.info("Không còn mục nào cần dịch. Kết thúc.")
                     break
+                self._process(batch)
+            finally:
+                self.scheduler.release(self.thread_id)
+
+    def _process(self, batch: Dict) -> None:
+        """Dịch một batch; kết quả vào `results_queue`, lỗi được báo cho bộ chia batch và bộ điều phối."""
+        # Tuyến model của batch (xem `translator/routing.py`); hạn mức RPM/TPM có thể riêng theo model.
+        route = self.router.select(batch['route'])
+        limiter = route.limiter(self.rate_limiter, self.thread_id)
+        on_route = f", tuyến '{route.name}'" if self.router.enabled else ""
+        logger.info(f"Đang xử lý batch #{batch['batch_id']} ({len(batch['data'])} mục{on_route}).")
+        stream = None
+        try:
+            protected_data = self.wire.prepare(batch['data'])
+
+            # Chỉ đưa vào prompt các thuật ngữ thực sự có trong batch.
+            glossary = self.glossary.select(item.text for item in protected_data)
+            prompt = self._build_prompt(protected_data, glossary)
+            reservation = self._rate_limit(
+                limiter, estimate_request_tokens(prompt, protected_data, self.batcher.calibrator))
+            # Thời gian của batch tính từ lúc gửi request, không gồm thời gian chờ hạn mức phía client.
+            started = self.batcher.sent(batch)
+            # Kết nối của key được giữ đến khi đọc hết response (kể cả khi streaming).
+            with self.pool.lease(self.thread_id, route.model_name) as model:
+                if self.stream:
+                    stream = StreamingParse(self.wire, protected_data)
+                    response = self._generate_streaming(model, prompt, batch, stream)
+                else:
+                    response = model.generate_content(prompt, generation_config=generation_config(self.wire, protected_data),
+                                                      request_options={"timeout": self.timeout})
+            limiter.settle(reservation, response_tokens(response))
+            calibrate(self.batcher.calibrator, prompt, protected_data, response)
+            check_truncated(response)
+
+            if stream:
+                # Các bản dịch đã được đưa vào hàng đợi trong lúc đọc (trừ các bản dịch được giữ
+                # lại đến khi kiểm tra xong response, với định dạng theo vị trí).
+                stream.finish()
+                raw_output = stream.raw_output
+                final_results = stream.pending()
+            else:
+                raw_output = response.text.strip()
+                # Đọc response, kiểm tra số lượng mục trả về và khôi phục placeholder
+                final_results = self.wire.parse(raw_output, protected_data)
+
+            comparison = token_comparison(self.wire, protected_data, prompt, raw_output, glossary)
+            if comparison:
+                logger.info(f"Batch #{batch['batch_id']}: {comparison}")
+
+            if self.batcher.claim(batch):
+                # Đưa kết quả vào hàng đợi TRƯỚC khi báo xong, để luồng chính không kết thúc sớm.
+                self.results_queue.put({'batch_id': batch['batch_id'], 'results': final_results})
+                self.batcher.complete(batch, time.monotonic() - started)
+            else:
+                # Bản gửi lặp của batch đã xong trước (hoặc batch đã bị thu hồi): bỏ kết quả này.
+                logger.info(f"Batch #{batch['batch_id']} đã được dịch ở nơi khác, bỏ kết quả.")
+            self.scheduler.success(self.thread_id, len(batch['data']), time.monotonic() - started)
+            self.router.success(route, len(batch['data']), time.monotonic() - started, response)
 
-                logger.info(f"Đang xử lý batch #{batch['batch_id']} ({len(batch['data'])} mục).")
-                self._rate_limit()
-
-                translated_batch = None
-                for attempt in range(CONFIG["max_api_retries"]):
-                    try:
-                        protected_data = []
-                        for item in batch['data']:
-                            original_value = item.get('value', '')
-                            protected_text, replacements = protect_placeholders(original_value)
-                            protected_data.append({"index": item['index'], "value": protected_text, "replacements": replacements})
-
-                        prompt = self._build_prompt(protected_data)
-                        response = self.model.generate_content(prompt)
-                        raw_output = response.text.strip()
-                        
-                        json_match = re.search(r'\[.*\]', raw_output, re.DOTALL)
-                        if not json_match:
-                            raise ValueError("Không tìm thấy JSON array trong response từ AI.")
-                        
-                        api_results = json.loads(json_match.group(0))
-
-                        # 4. Kiểm tra số lượng mục trả về
-                        if len(api_results) != len(protected_data):
-                            raise ValueError(f"AI trả về sai số lượng! Gửi đi: {len(protected_data)}, Nhận về: {len(api_results)}")
-                        
-                        final_results = []
-                        results_map = {res['index']: res['translation'] for res in api_results}
-                        
-                        for item in protected_data:
-                            original_index = item['index']
-                            translated_protected_text = results_map.get(original_index)
-                            
-                            if translated_protected_text:
-                                restored_text = restore_placeholders(translated_protected_text, item['replacements'])
-                                final_results.append({'index': original_index, 'value': restored_text})
-                        
-                        translated_batch = {'batch_id': batch['batch_id'], 'results': final_results}
-                        break
-
-                    except Exception as e:
-                        logger.warning(f"Lỗi khi dịch batch #{batch['batch_id']} (lần {attempt + 1}): {e}")
-                        if attempt < CONFIG["max_api_retries"] - 1:
-                            time.sleep(CONFIG["api_retry_delay"])
-                        else:
-                            logger.error(f"BỎ QUA batch #{batch['batch_id']} sau {CONFIG['max_api_retries']} lần thử thất bại.")
-
-                if translated_batch:
-                    self.results_queue.put(translated_batch)
-                
-                self.work_queue.task_done()
-
-            except Exception as e:
-                logger.error(f"Lỗi không xác định trong vòng lặp chính: {e}")
-                self.work_queue.task_done()
\ No newline at end of file
+        except Exception as e:
+            logger.warning(f"Lỗi khi dịch batch #{batch['batch_id']} (lần {batch['attempt'] + 1}): {e}")
+            attempt, server_delay = batch['attempt'], None
+            if is_rate_limited(e):
+                # Hết hạn mức: backoff theo số lỗi 429 liên tiếp của key (không phải số lần thử
+                # của batch, vì 429 không tính lượt); tạm dừng cả key nếu server yêu cầu.
+                server_delay = retry_after(e)
+                attempt = limiter.throttle(server_delay)
+            # Các mục được trả lại bể (batch nhỏ hơn) để worker khác dịch tiếp ngay;
+            # các bản dịch đã nhận qua streaming được giữ lại.
+            kept = stream.kept(e) if stream else ()
+            if stream:
+                held = stream.pending(kept)
+                if held:
+                    self.results_queue.put({'batch_id': batch['batch_id'], 'results': held, 'partial': True})
+            kind = self.batcher.fail(batch, e, kept)
+            self.scheduler.failure(self.thread_id, kind)
+            self.router.failure(route, kind)
+            time.sleep(backoff_delay(attempt, server_delay=server_delay))
@@ -0,0 +1,233 @@
+# utils/classifier.py
+"""
+Bộ phân loại hàng loạt cho GIAI ĐOẠN 1.
+
+Mỗi chuỗi chỉ được chạy qua bộ lọc ĐÚNG MỘT LẦN (`translation_score`), sau đó điểm
+được so với toàn bộ danh sách ngưỡng để xếp vào nhóm. Chuỗi trùng nội dung chỉ chấm
+một lần, và có thể dùng lại điểm đã lưu từ lần chạy trước (`utils/decision_cache.py`).
+Với bảng chuỗi lớn, dữ liệu được chia thành các khối và phân tán lên nhiều tiến trình
+(mỗi lõi CPU một tiến trình).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.filter import translation_score
+from utils.filter_stats import FilterStats
+from utils.decision_cache import DecisionCache, content_key
+from utils.rule_order import ordered_rules
+
+# Kích thước khối mặc định gửi cho mỗi tiến trình con.
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _score_chunk(
+    texts: List[str],
+    trace_samples: Optional[int] = None,
+    rule_order: Optional[Tuple[str, ...]] = None,
+    verify: bool = False,
+) -> Tuple[List[Optional[int]], Optional[FilterStats], List[str]]:
+    """
+    Hàm chạy trong tiến trình con: chấm điểm một khối chuỗi.
+
+    - `trace_samples` khác None: trả kèm thống kê quy tắc của khối để gộp ở tiến trình chính.
+    - `rule_order`: thứ tự chạy các quy tắc loại bỏ (None = thứ tự cố định).
+    - `verify`: chấm lại bằng thứ tự cố định và trả về các chuỗi cho kết quả khác.
+    """
+    rules = ordered_rules(rule_order)
+    stats = FilterStats(trace_samples) if trace_samples is not None else None
+    scores = [translation_score(text, stats, rules) for text in texts]
+    mismatches: List[str] = []
+    if verify:
+        mismatches = [text for text, score in zip(texts, scores) if translation_score(text) != score]
+    return scores, stats, mismatches
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Số tiến trình sẽ dùng: `workers` nếu > 0, ngược lại là số lõi CPU của máy."""
+    if workers and workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def open_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Tạo một pool tiến trình để dùng lại cho nhiều lần gọi `score_texts`/`assign_buckets`
+    (ví dụ khi phân loại theo luồng từng khối). None nếu chỉ dùng một tiến trình.
+    """
+    workers = resolve_workers(workers)
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def _score_unique(
+    texts: List[str],
+    workers: Optional[int],
+    chunk_size: int,
+    progress: Optional[Callable[[int], None]],
+    executor: Optional[ProcessPoolExecutor] = None,
+    stats: Optional[FilterStats] = None,
+    rule_order: Optional[Tuple[str, ...]] = None,
+    mismatches: Optional[List[str]] = None,
+) -> List[Optional[int]]:
+    """Chấm điểm các chuỗi (đã khử trùng lặp), phân tán lên pool nếu có nhiều khối."""
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if executor is None and min(resolve_workers(workers), len(chunks)) > 1:
+        with ProcessPoolExecutor(max_workers=min(resolve_workers(workers), len(chunks))) as pool:
+            return _score_unique(texts, workers, chunk_size, progress, pool, stats, rule_order, mismatches)
+
+    verify = mismatches is not None
+    scores: List[Optional[int]] = []
+    if executor is None or len(chunks) <= 1:
+        # Dữ liệu nhỏ: chạy ngay trong tiến trình chính, tránh chi phí gửi dữ liệu sang pool.
+        rules = ordered_rules(rule_order)
+        for chunk in chunks:
+            chunk_scores = [translation_score(text, stats, rules) for text in chunk]
+            if verify:
+                mismatches.extend(text for text, score in zip(chunk, chunk_scores) if translation_score(text) != score)
+            scores.extend(chunk_scores)
+            if progress: progress(len(chunk))
+        return scores
+
+    trace_samples = stats.sample_size if stats is not None else None
+    results = executor.map(_score_chunk, chunks, repeat(trace_samples), repeat(rule_order), repeat(verify))
+    for chunk, (chunk_scores, chunk_stats, chunk_mismatches) in zip(chunks, results):
+        scores.extend(chunk_scores)
+        if chunk_stats is not None: stats.merge(chunk_stats)
+        if verify: mismatches.extend(chunk_mismatches)
+        if progress: progress(len(chunk))
+    return scores
+
+
+def score_texts(
+    texts: Sequence[str],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+    cache: Optional[DecisionCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    stats: Optional[FilterStats] = None,
+    rule_order: Optional[Tuple[str, ...]] = None,
+    mismatches: Optional[List[str]] = None,
+) -> List[Optional[int]]:
+    """
+    Chấm điểm một danh sách chuỗi, giữ nguyên thứ tự.
+
+    Chuỗi trùng nhau chỉ được chấm một lần; nếu có `cache`, chuỗi đã có trong cache
+    không được chấm lại và điểm của các chuỗi mới được ghi vào cache.
+
+    Args:
+        texts: Các chuỗi cần chấm điểm.
+        workers: Số tiến trình (None/0 = theo số lõi CPU).
+        chunk_size: Số chuỗi trong mỗi khối gửi cho tiến trình con.
+        progress: Hàm được gọi với số chuỗi vừa xử lý xong (ví dụ `tqdm.update`).
+        cache: Cache điểm trên đĩa (tùy chọn).
+        executor: Pool dùng chung từ `open_pool` (tùy chọn); nếu không có, pool được
+            tạo riêng cho lần gọi này khi cần.
+        stats: Thống kê quy tắc lọc (tùy chọn); thống kê của các tiến trình con được
+            gộp vào đây, phân bố điểm tính trên mọi chuỗi (kể cả lấy từ cache).
+        rule_order: Thứ tự các quy tắc loại bỏ (xem `utils/rule_order.py`); None = cố định.
+        mismatches: Nếu có (chế độ kiểm chứng), mỗi chuỗi được chấm thêm bằng thứ tự cố
+            định và các chuỗi cho kết quả khác được thêm vào list này.
+
+    Returns:
+        List[Optional[int]]: Điểm của từng chuỗi (None nếu bị loại bỏ cứng).
+    """
+    known: Dict[str, Optional[int]] = {}
+    unique: List[str] = []
+    seen = set()
+    for text in texts:
+        if isinstance(text, str) and text not in seen:
+            seen.add(text)
+            unique.append(text)
+
+    to_score = unique
+    if cache is not None and unique:
+        keys = [content_key(text) for text in unique]
+        cached = cache.lookup(keys)
+        to_score = []
+        for text, key in zip(unique, keys):
+            if key in cached:
+                known[text] = cached[key]
+            else:
+                to_score.append(text)
+
+    # Chuỗi trùng lặp và chuỗi lấy từ cache coi như đã xử lý xong ngay.
+    if progress and len(texts) > len(to_score):
+        progress(len(texts) - len(to_score))
+
+    new_scores = _score_unique(to_score, workers, chunk_size, progress, executor, stats, rule_order, mismatches)
+    known.update(zip(to_score, new_scores))
+    if cache is not None and to_score:
+        cache.store((content_key(text), score) for text, score in zip(to_score, new_scores))
+
+    scores = [known.get(text) if isinstance(text, str) else None for text in texts]
+    if stats is not None:
+        stats.record_scores(scores)
+    return scores
+
+
+def bucket_index(score: Optional[int], thresholds: Sequence[int]) -> int:
+    """
+    Vị trí nhóm của một điểm: nhóm đầu tiên có ngưỡng mà điểm đạt được,
+    hoặc `len(thresholds)` (nhóm cuối - bỏ qua) nếu không đạt ngưỡng nào.
+    """
+    if score is not None:
+        for position, threshold in enumerate(thresholds):
+            if score >= threshold:
+                return position
+    return len(thresholds)
+
+
+def assign_buckets(
+    items: Sequence[Dict],
+    thresholds: Sequence[int],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+    cache: Optional[DecisionCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    stats: Optional[FilterStats] = None,
+    rule_order: Optional[Tuple[str, ...]] = None,
+    mismatches: Optional[List[str]] = None,
+) -> List[int]:
+    """Vị trí nhóm (xem `bucket_index`) của từng mục, theo đúng thứ tự đầu vào."""
+    scores = score_texts(
+        [item.get("value", "") for item in items],
+        workers=workers, chunk_size=chunk_size, progress=progress, cache=cache,
+        executor=executor, stats=stats, rule_order=rule_order, mismatches=mismatches,
+    )
+    return [bucket_index(score, thresholds) for score in scores]
+
+
+def classify_batch(
+    items: Sequence[Dict],
+    thresholds: Sequence[int],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[int], None]] = None,
+    cache: Optional[DecisionCache] = None,
+) -> List[List[Dict]]:
+    """
+    Phân loại các mục `{"index", "value"}` theo danh sách ngưỡng.
+
+    Tương đương với chuỗi `if should_translate(t, thresholds[0]) ... elif ...` cũ,
+    nhưng mỗi chuỗi chỉ được chấm điểm một lần.
+
+    Args:
+        items: Các mục cần phân loại.
+        thresholds: Ngưỡng theo thứ tự ưu tiên, ví dụ `[SAFE_THRESHOLD, BASE_THRESHOLD]`.
+        cache: Cache điểm trên đĩa (tùy chọn), xem `score_texts`.
+
+    Returns:
+        List[List[Dict]]: `len(thresholds) + 1` nhóm; nhóm cuối là các mục bị bỏ qua.
+    """
+    assigned = assign_buckets(
+        items, thresholds,
+        workers=workers, chunk_size=chunk_size, progress=progress, cache=cache,
+    )
+    buckets: List[List[Dict]] = [[] for _ in range(len(thresholds) + 1)]
+    for item, bucket in zip(items, assigned):
+        buckets[bucket].append(item)
+    return buckets
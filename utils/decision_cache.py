@@ -0,0 +1,111 @@
+# utils/decision_cache.py
+"""
+Bộ nhớ đệm (SQLite) cho kết quả chấm điểm của bộ lọc, khóa theo NỘI DUNG chuỗi.
+
+- Khóa là hash của chuỗi gốc, nên các chuỗi trùng nhau (" Very High", "\\nDone!"...)
+  và các chuỗi không đổi giữa hai bản patch game chỉ phải chấm điểm một lần.
+- Giá trị lưu là ĐIỂM (hoặc NULL nếu bị loại bỏ cứng), không phải quyết định theo
+  ngưỡng: đổi ngưỡng trong `config.py` không làm mất cache, vì quyết định được
+  tính lại từ điểm.
+- Cache gắn với một "dấu vân tay" của mã nguồn bộ lọc (`utils/filter.py` và
+  `utils/placeholders.py`). Khi các quy tắc thay đổi, dấu vân tay đổi và toàn bộ
+  cache tự động bị xóa.
+"""
+
+import hashlib
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger("TranslatorLogger")
+
+# SQLite cũ giới hạn 999 tham số cho mỗi câu lệnh.
+_SQL_BATCH = 500
+
+
+def content_key(text: str) -> bytes:
+    """Khóa cache của một chuỗi: blake2b 128-bit của nội dung UTF-8."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def rules_fingerprint(*module_files: str) -> str:
+    """Dấu vân tay của các file mã nguồn chứa quy tắc lọc."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in module_files:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def filter_fingerprint() -> str:
+    """Dấu vân tay của bộ lọc đang được dùng (`utils/filter.py` + `utils/placeholders.py`)."""
+    import utils.filter
+    import utils.placeholders
+    return rules_fingerprint(utils.filter.__file__, utils.placeholders.__file__)
+
+
+class DecisionCache:
+    """
+    Cache điểm bộ lọc trên đĩa.
+
+    Args:
+        path (str): Đường dẫn file SQLite.
+        fingerprint (str): Dấu vân tay quy tắc; khác với lần trước thì cache bị xóa.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = False
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS decisions (key BLOB PRIMARY KEY, score INTEGER)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            if row is not None:
+                self.invalidated = True
+                logger.info("♻️  Quy tắc lọc đã thay đổi, xóa cache phân loại cũ.")
+            self._conn.execute("DELETE FROM decisions")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self._conn.commit()
+
+    def lookup(self, keys: Sequence[bytes]) -> Dict[bytes, Optional[int]]:
+        """
+        Tra cứu nhiều khóa một lúc.
+
+        Returns:
+            Dict[bytes, Optional[int]]: Các khóa có trong cache -> điểm (None = bị loại bỏ).
+        """
+        found: Dict[bytes, Optional[int]] = {}
+        for i in range(0, len(keys), _SQL_BATCH):
+            chunk = keys[i:i + _SQL_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            for key, score in self._conn.execute(
+                f"SELECT key, score FROM decisions WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = score
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, entries: Iterable[tuple]) -> None:
+        """Ghi các cặp `(khóa, điểm)` vào cache."""
+        self._conn.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?)", entries)
+        self._conn.commit()
+
+    def size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def report(self) -> List[str]:
+        """Các dòng thống kê hit/miss để ghi log."""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return [
+            f"  - 🎯 Cache hit: {self.hits} | miss: {self.misses} | tỷ lệ hit: {rate:.1f}%",
+            f"  - 🗃️  Số chuỗi trong cache: {self.size()} ('{self.path}')",
+        ]
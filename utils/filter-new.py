@@ -11,15 +11,12 @@ NÂNG CẤP ĐẶC BIỆT CHO GAME DATA:
 
 import re
 import logging
-from typing import Dict, Tuple
-import itertools
-import threading
+from typing import Dict, Optional, Sequence, Tuple
 
-logger = logging.getLogger("TranslatorLogger")
+from utils.filter_stats import FilterStats, Rule
+from utils.placeholders import PlaceholderEngine, TOKEN_PATTERN
 
-# --- BỘ ĐẾM TOÀN CỤC VÀ KHÓA AN TOÀN ---
-placeholder_counter = itertools.count()
-counter_lock = threading.Lock()
+logger = logging.getLogger("TranslatorLogger")
 
 # --- ĐỊNH NGHĨA PATTERN DÙNG CHUNG ---
 CJK_PATTERN = re.compile(
@@ -32,6 +29,8 @@ CJK_PATTERN = re.compile(
     "\uac00-\ud7af"  # Hangul (Hàn)
     "]"
 )
+# Chữ Latin có dấu (À..ỹ): dấu hiệu chuỗi đã là tiếng Việt.
+VIETNAMESE_PATTERN = re.compile(r"[\u00C0-\u1EF9]")
 
 # ==============================================================================
 # ==== CÁC HÀM TIỆN ÍCH VÀ KIỂM TRA ĐƠN LẺ ====
@@ -79,6 +78,13 @@ def is_patch_note_or_version(text: str) -> bool:
     pattern = re.compile(r"(?i)^\[(?:[\d\.]+|Internal Test Version \d+)\s+Patch Notes\]$")
     return bool(pattern.fullmatch(text.strip()))
 
+def is_already_vietnamese(text: str) -> bool:
+    """
+    Kiểm tra một chuỗi đã là tiếng Việt (có chữ Latin mang dấu) hay chưa.
+    """
+    return bool(VIETNAMESE_PATTERN.search(text))
+
+
 def is_code_like(text: str) -> bool:
     """Kiểm tra một chuỗi có chứa các dấu hiệu rõ ràng của một biểu thức code hay không."""
     code_patterns = [
@@ -96,6 +102,100 @@ def is_code_like(text: str) -> bool:
 # ==== HỆ THỐNG BẢO VỆ PLACEHOLDER NÂNG CẤP CHO GAME ====
 # ==============================================================================
 
+# === LEVEL 1: UNITY ENGINE CRITICAL PATTERNS ===
+CRITICAL_UNITY_PATTERNS = [
+    # Unity string formatting - CỰC KỲ QUAN TRỌNG
+    r'\{[\d]+\}',                           # {0}, {1}, {2}...
+    r'\{[\d]+:[^}]+\}',                     # {0:F2}, {1:D3}
+
+    # Unity/C# format specifiers  
+    r'%[sdflbxXeEgGc%]',                    # %s, %d, %f, %l, %b, %x, %X, %e, %E, %g, %G, %c, %%
+
+    # Game scripting variables
+    r'\{[a-zA-Z_][a-zA-Z0-9_]*(?:\|[a-zA-Z_][a-zA-Z0-9_]*)*\}',  # {name|B}, {variable|modifier}
+]
+
+# === LEVEL 2: C# CODE ELEMENTS ===
+CSHARP_PATTERNS = [
+    # Namespaces và assembly qualified names
+    r'\b[A-Z][a-zA-Z0-9]*(?:\.[A-Z][a-zA-Z0-9]*)+\b',  # System.Collections.Generic
+
+    # Method calls với parameters
+    r'\b\w+\([^)]*\)',                     # Method(), GetChild(0)
+
+    # Properties và fields
+    r'\b\w+\.\w+(?:\.\w+)*',               # transform.position.x
+
+    # Generics
+    r'<[A-Z][a-zA-Z0-9,\s]*>',            # <T>, <string, int>
+]
+
+# === LEVEL 3: UNITY MARKUP ===
+UNITY_MARKUP_PATTERNS = [
+    # Rich Text markup - PHẢI BẢO VỆ TOÀN BỘ
+    r'<color=[^>]*>.*?</color>',            # <color=#FF0000>text</color>
+    r'<size=[^>]*>.*?</size>',              # <size=14>text</size>
+    r'<material=[^>]*>.*?</material>',      # <material=shader>text</material>
+    r'<quad[^>]*>',                         # <quad material=1 size=20 x=0.1 y=0.1 width=0.5 height=0.5>
+    r'<sprite[^>]*>',                       # <sprite name="icon" index=0>
+
+    # Basic formatting
+    r'</?(?:b|i|u|sub|sup|mark|s)>',       # <b>, </b>, <i>, </i>, etc.
+    r'<(?:br|BR)\s*/?>', # <br>, <BR>, <br/>, <BR/>
+
+    # Custom Unity tags
+    r'<nobr>.*?</nobr>',                    # <nobr>no break</nobr>
+    r'<indent=[^>]*>.*?</indent>',          # <indent=10%>text</indent>
+    r'<line-height=[^>]*>.*?</line-height>', # <line-height=50%>text</line-height>
+]
+
+# === LEVEL 4: FILE SYSTEM & NETWORK ===
+FILESYSTEM_PATTERNS = [
+    # File paths - Windows & Unix
+    r'[A-Za-z]:\\(?:[^\\/:*?"<>|\r\n]+\\)*[^\\/:*?"<>|\r\n]*',  # C:\Path\File.ext
+    r'/(?:[^/\s]+/)*[^/\s]*',               # /path/to/file
+
+    # URLs
+    r'https?://[^\s/$.?#].[^\s]*',          # http://example.com
+    r'ftp://[^\s/$.?#].[^\s]*',             # ftp://example.com
+
+    # Unity asset paths
+    r'Assets/[^\s]*',                       # Assets/Scripts/Player.cs
+    r'Resources/[^\s]*',                    # Resources/Textures/icon.png
+]
+
+# === LEVEL 5: PROGRAMMING CONSTRUCTS ===
+PROGRAMMING_PATTERNS = [
+    # Hex colors
+    r'#[0-9A-Fa-f]{6,8}',                  # #FF0000, #FF0000FF
+
+    # GUIDs
+    r'\{[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}\}',
+
+    # Version numbers
+    r'\b\d+\.\d+(?:\.\d+)*(?:-[a-zA-Z0-9]+)*\b', # 1.0.0, 2.1.3-beta
+
+    # Special variables
+    r'&[^&\s]+&',                          # &variable&
+    r'\$[a-zA-Z_][a-zA-Z0-9_]*',           # $variable
+    r'@[a-zA-Z_][a-zA-Z0-9_]*',            # @parameter
+]
+
+# === LEVEL 6: REMAINING TAGS ===
+REMAINING_PATTERNS = [
+    r'<[^>]+>',                            # Bất kỳ tag nào còn lại
+]
+
+# ÁP DỤNG THEO THỨ TỰ ƯU TIÊN - biên dịch một lần khi import
+PLACEHOLDER_ENGINE = PlaceholderEngine([
+    (CRITICAL_UNITY_PATTERNS, re.DOTALL),
+    (CSHARP_PATTERNS, re.DOTALL),
+    (UNITY_MARKUP_PATTERNS, re.DOTALL),
+    (FILESYSTEM_PATTERNS, re.DOTALL),
+    (PROGRAMMING_PATTERNS, re.DOTALL),
+    (REMAINING_PATTERNS, re.DOTALL),
+])
+
 def protect_placeholders(text: str) -> Tuple[str, Dict[str, str]]:
     """
     CRITICAL: Bảo vệ placeholder cho global-metadata.dat với độ chính xác tuyệt đối.
@@ -110,121 +210,15 @@ def protect_placeholders(text: str) -> Tuple[str, Dict[str, str]]:
     5. File paths và URLs
     6. Assembly references
     
+    Toàn bộ pattern được quét trong MỘT lượt (xem `utils/placeholders.py`).
+
     Args:
         text (str): Chuỗi từ global-metadata.dat
 
     Returns:
         tuple[str, Dict[str, str]]: Chuỗi bảo vệ và ánh xạ khôi phục
     """
-    replacements: Dict[str, str] = {}
-    
-    def replacer(match: re.Match) -> str:
-        with counter_lock:
-            counter_val = next(placeholder_counter)
-        
-        placeholder = f"__PROTECTED_{counter_val}__"
-        replacements[placeholder] = match.group(0)
-        return placeholder
-
-    # === LEVEL 1: UNITY ENGINE CRITICAL PATTERNS ===
-    critical_unity_patterns = [
-        # Unity string formatting - CỰC KỲ QUAN TRỌNG
-        r'\{[\d]+\}',                           # {0}, {1}, {2}...
-        r'\{[\d]+:[^}]+\}',                     # {0:F2}, {1:D3}
-        
-        # Unity/C# format specifiers  
-        r'%[sdflbxXeEgGc%]',                    # %s, %d, %f, %l, %b, %x, %X, %e, %E, %g, %G, %c, %%
-        
-        # Game scripting variables
-        r'\{[a-zA-Z_][a-zA-Z0-9_]*(?:\|[a-zA-Z_][a-zA-Z0-9_]*)*\}',  # {name|B}, {variable|modifier}
-    ]
-    
-    # === LEVEL 2: C# CODE ELEMENTS ===
-    csharp_patterns = [
-        # Namespaces và assembly qualified names
-        r'\b[A-Z][a-zA-Z0-9]*(?:\.[A-Z][a-zA-Z0-9]*)+\b',  # System.Collections.Generic
-        
-        # Method calls với parameters
-        r'\b\w+\([^)]*\)',                     # Method(), GetChild(0)
-        
-        # Properties và fields
-        r'\b\w+\.\w+(?:\.\w+)*',               # transform.position.x
-        
-        # Generics
-        r'<[A-Z][a-zA-Z0-9,\s]*>',            # <T>, <string, int>
-    ]
-    
-    # === LEVEL 3: UNITY MARKUP ===
-    unity_markup_patterns = [
-        # Rich Text markup - PHẢI BẢO VỆ TOÀN BỘ
-        r'<color=[^>]*>.*?</color>',            # <color=#FF0000>text</color>
-        r'<size=[^>]*>.*?</size>',              # <size=14>text</size>
-        r'<material=[^>]*>.*?</material>',      # <material=shader>text</material>
-        r'<quad[^>]*>',                         # <quad material=1 size=20 x=0.1 y=0.1 width=0.5 height=0.5>
-        r'<sprite[^>]*>',                       # <sprite name="icon" index=0>
-        
-        # Basic formatting
-        r'</?(?:b|i|u|sub|sup|mark|s)>',       # <b>, </b>, <i>, </i>, etc.
-        r'<(?:br|BR)\s*/?>', # <br>, <BR>, <br/>, <BR/>
-        
-        # Custom Unity tags
-        r'<nobr>.*?</nobr>',                    # <nobr>no break</nobr>
-        r'<indent=[^>]*>.*?</indent>',          # <indent=10%>text</indent>
-        r'<line-height=[^>]*>.*?</line-height>', # <line-height=50%>text</line-height>
-    ]
-    
-    # === LEVEL 4: FILE SYSTEM & NETWORK ===
-    filesystem_patterns = [
-        # File paths - Windows & Unix
-        r'[A-Za-z]:\\(?:[^\\/:*?"<>|\r\n]+\\)*[^\\/:*?"<>|\r\n]*',  # C:\Path\File.ext
-        r'/(?:[^/\s]+/)*[^/\s]*',               # /path/to/file
-        
-        # URLs
-        r'https?://[^\s/$.?#].[^\s]*',          # http://example.com
-        r'ftp://[^\s/$.?#].[^\s]*',             # ftp://example.com
-        
-        # Unity asset paths
-        r'Assets/[^\s]*',                       # Assets/Scripts/Player.cs
-        r'Resources/[^\s]*',                    # Resources/Textures/icon.png
-    ]
-    
-    # === LEVEL 5: PROGRAMMING CONSTRUCTS ===
-    programming_patterns = [
-        # Hex colors
-        r'#[0-9A-Fa-f]{6,8}',                  # #FF0000, #FF0000FF
-        
-        # GUIDs
-        r'\{[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}\}',
-        
-        # Version numbers
-        r'\b\d+\.\d+(?:\.\d+)*(?:-[a-zA-Z0-9]+)*\b', # 1.0.0, 2.1.3-beta
-        
-        # Special variables
-        r'&[^&\s]+&',                          # &variable&
-        r'\$[a-zA-Z_][a-zA-Z0-9_]*',           # $variable
-        r'@[a-zA-Z_][a-zA-Z0-9_]*',            # @parameter
-    ]
-    
-    # === LEVEL 6: REMAINING TAGS ===
-    remaining_patterns = [
-        r'<[^>]+>',                            # Bất kỳ tag nào còn lại
-    ]
-    
-    # ÁP DỤNG THEO THỨ TỰ ƯU TIÊN
-    all_pattern_groups = [
-        critical_unity_patterns,
-        csharp_patterns, 
-        unity_markup_patterns,
-        filesystem_patterns,
-        programming_patterns,
-        remaining_patterns
-    ]
-    
-    for pattern_group in all_pattern_groups:
-        for pattern in pattern_group:
-            text = re.sub(pattern, replacer, text, flags=re.DOTALL)
-
-    return text, replacements
+    return PLACEHOLDER_ENGINE.protect(text)
 
 def restore_placeholders(text: str, replacements: Dict[str, str]) -> str:
     """
@@ -237,21 +231,8 @@ def restore_placeholders(text: str, replacements: Dict[str, str]) -> str:
     Returns:
         str: Chuỗi đã được khôi phục placeholder.
     """
-    if not replacements:
-        return text
-
-    # Khôi phục theo thứ tự từ số lớn đến nhỏ để tránh xung đột
-    # Ví dụ: __PROTECTED_10__ phải được thay trước __PROTECTED_1__
-    sorted_keys = sorted(replacements.keys(), 
-                        key=lambda x: int(re.search(r'(\d+)', x).group(1)), 
-                        reverse=True)
-    
-    for placeholder in sorted_keys:
-        original_value = replacements[placeholder]
-        # Thay thế chính xác placeholder
-        text = text.replace(placeholder, original_value)
-    
-    return text
+    # Khôi phục trong một lượt quét, tương đương thay từ số lớn đến nhỏ như trước.
+    return PLACEHOLDER_ENGINE.restore(text, replacements)
 
 # ==============================================================================
 # ==== HỆ THỐNG CHẤM ĐIỂM THÔNG MINH ====
@@ -288,37 +269,61 @@ def calculate_translation_score(text: str) -> int:
 # ==== HÀM QUYẾT ĐỊNH TỔNG HỢP ====
 # ==============================================================================
 
-def should_translate(text: str, threshold: int = 0) -> bool:
+REJECTION_RULES = (
+    ("patch_note", is_patch_note_or_version),
+    ("code_like", is_code_like),
+    ("asian", contains_asian_characters),
+    ("vietnamese", is_already_vietnamese),
+    ("symbols_only", is_only_symbols_or_control),
+    ("path_or_variable", is_path_or_variable_style),
+)
+"""Các quy tắc loại bỏ cứng `(tên, hàm)` theo thứ tự chạy; hàm trả về True là loại bỏ."""
+
+
+def _score_content(text: str) -> Optional[int]:
+    # Tách các placeholder ra khỏi nội dung có ý nghĩa.
+    protected_text, _ = protect_placeholders(text)
+    meaningful_text = TOKEN_PATTERN.sub('', protected_text).strip()
+
+    # Nếu sau khi bỏ placeholder mà không còn nội dung thì cũng loại bỏ.
+    if len(meaningful_text) < 2:
+        return None
+
+    # Tính điểm cho phần nội dung có ý nghĩa.
+    return calculate_translation_score(meaningful_text)
+
+
+def translation_score(text: str, stats: Optional[FilterStats] = None,
+                      rules: Sequence[Rule] = REJECTION_RULES) -> Optional[int]:
     """
-    Hàm tổng hợp cuối cùng để quyết định có dịch một chuỗi hay không.
+    Chạy các quy tắc loại bỏ cứng và chấm điểm một lần; None nếu chuỗi bị loại bỏ.
+    `stats` (tùy chọn) ghi lại thống kê theo từng quy tắc, xem `utils/filter_stats.py`.
+    `rules` là các quy tắc loại bỏ theo thứ tự chạy (xem `utils/rule_order.py`).
     """
     # BƯỚC 0: KIỂM TRA ĐẦU VÀO CƠ BẢN
-    if not text or not isinstance(text, str): return False
+    if not text or not isinstance(text, str): return None
     text = text.strip()
-    if not text: return False
+    if not text: return None
+    if stats is not None:
+        return stats.run(text, rules, _score_content)
 
     # BƯỚC 1: ÁP DỤNG CÁC QUY TẮC LOẠI BỎ CỨNG
-    if is_patch_note_or_version(text): return False
-    if is_code_like(text): return False
-    if contains_asian_characters(text): return False
-    if re.search(r"[\u00C0-\u1EF9]", text): return False # Đã là tiếng Việt
-    if is_only_symbols_or_control(text): return False
-    if is_path_or_variable_style(text): return False
+    for _, rule in rules:
+        if rule(text): return None
 
     # BƯỚC 2: PHÂN TÍCH SÂU VỚI HỆ THỐNG CHẤM ĐIỂM
-    protected_text, _ = protect_placeholders(text)
-    meaningful_text = re.sub(r'__PROTECTED_\d+__', '', protected_text).strip()
-    
-    if len(meaningful_text) < 2:
+    return _score_content(text)
+
+def should_translate(text: str, threshold: int = 0) -> bool:
+    """
+    Hàm tổng hợp cuối cùng để quyết định có dịch một chuỗi hay không.
+    """
+    score = translation_score(text)
+    if score is None:
         return False
-        
-    score = calculate_translation_score(meaningful_text)
-    
-    log_msg = f"Điểm: {score} | Ngưỡng: {threshold} | Chuỗi: '{meaningful_text[:50]}'"
-    
-    if score >= threshold:
-        logger.debug(f"[✅ DỊCH] {log_msg}")
-        return True
-    else:
-        logger.debug(f"[❌ BỎ QUA] {log_msg}")
-        return False
\ No newline at end of file
+
+    decision = score >= threshold
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[%s] Điểm: %s | Ngưỡng: %s | Chuỗi: '%s'",
+                     "✅ DỊCH" if decision else "❌ BỎ QUA", score, threshold, text.strip()[:50])
+    return decision
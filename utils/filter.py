@@ -14,19 +14,14 @@ Quy trình hoạt động của hàm chính `should_translate`:
 
 import re
 import logging
-from typing import Dict, Tuple
-import itertools
-import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils.filter_stats import FilterStats, Rule
+from utils.placeholders import PlaceholderEngine, TOKEN_PATTERN
 
 # Lấy logger đã được cấu hình ở file main để ghi lại các quyết định của bộ lọc.
 logger = logging.getLogger("TranslatorLogger")
 
-# --- BỘ ĐẾM TOÀN CỤC VÀ KHÓA AN TOÀN ---
-# Tạo một bộ đếm duy nhất bắt đầu từ 0, dùng cho toàn bộ chương trình
-placeholder_counter = itertools.count()
-# Tạo một khóa để đảm bảo tại một thời điểm chỉ có một luồng được lấy số tiếp theo
-counter_lock = threading.Lock()
-
 # --- ĐỊNH NGHĨA PATTERN DÙNG CHUNG ---
 # Định nghĩa pattern một lần để tái sử dụng, tăng hiệu quả và dễ quản lý.
 CJK_PATTERN = re.compile(
@@ -39,6 +34,8 @@ CJK_PATTERN = re.compile(
     "\uac00-\ud7af"  # Hangul (Hàn)
     "]"
 )
+# Chữ Latin có dấu (À..ỹ): dấu hiệu chuỗi đã là tiếng Việt.
+VIETNAMESE_PATTERN = re.compile(r"[\u00C0-\u1EF9]")
 
 
 # ==============================================================================
@@ -123,6 +120,13 @@ def is_patch_note_or_version(text: str) -> bool:
     return bool(pattern.fullmatch(text.strip()))
 
 
+def is_already_vietnamese(text: str) -> bool:
+    """
+    Kiểm tra một chuỗi đã là tiếng Việt (có chữ Latin mang dấu) hay chưa.
+    """
+    return bool(VIETNAMESE_PATTERN.search(text))
+
+
 def is_code_like(text: str) -> bool:
     """
     Kiểm tra một chuỗi có chứa các dấu hiệu rõ ràng của một biểu thức code hay không.
@@ -143,6 +147,41 @@ def is_code_like(text: str) -> bool:
 # ==== HỆ THỐNG BẢO VỆ PLACEHOLDER NÂNG CẤP CHO GAME ====
 # ==============================================================================
 
+# GAME PLACEHOLDERS - Ưu tiên cao nhất
+GAME_PATTERNS = [
+    # Unity/Game engine format strings với số
+    r'\{[\d]+\}',                           # {0}, {1}, {2}...
+
+    # Game variables với modifiers
+    r'\{[a-zA-Z_][a-zA-Z0-9_]*(?:\|[a-zA-Z_][a-zA-Z0-9_]*)*\}',  # {name|B}, {variable|modifier}
+
+    # Unity percent format strings
+    r'%[sdflb%]',                           # %s, %d, %f, %l, %b, %%
+
+    # Color codes và special formatting
+    r'<color=[^>]*>.*?</color>',            # <color=#FF0000>text</color>
+    r'<size=[^>]*>.*?</size>',              # <size=14>text</size>
+    r'<b>.*?</b>',                          # <b>bold</b>
+    r'<i>.*?</i>',                          # <i>italic</i>
+]
+
+# CÁC PATTERN KHÁC - Ưu tiên thấp hơn
+OTHER_PATTERNS = [
+    r'<[^>]+>',                            # HTML/XML tags còn lại
+    r'https?://[^\s/$.?#].[^\s]*',         # URLs
+    r'&[^&\s]+&',                          # &variable&
+    r'\b#\w+\b',                           # #variable
+    r'\b_\w+',                             # _variable
+    r'\w+\.\w+',                           # object.property
+]
+
+# Biên dịch một lần khi import: game patterns trước (DOTALL), các pattern khác sau.
+PLACEHOLDER_ENGINE = PlaceholderEngine([
+    (GAME_PATTERNS, re.DOTALL),
+    (OTHER_PATTERNS, 0),
+])
+
+
 def protect_placeholders(text: str) -> Tuple[str, Dict[str, str]]:
     """
     NÂNG CẤP ĐẶC BIỆT: Bảo vệ placeholder cho game data với độ chính xác cao.
@@ -153,6 +192,9 @@ def protect_placeholders(text: str) -> Tuple[str, Dict[str, str]]:
     3. HTML/XML tags
     4. URLs
     5. Technical variables
+
+    Toàn bộ pattern được quét trong MỘT lượt (xem `utils/placeholders.py`),
+    kết quả giống hệt việc áp dụng lần lượt từng pattern như trước.
     
     Args:
         text (str): Chuỗi đầu vào có thể chứa placeholder.
@@ -160,53 +202,7 @@ def protect_placeholders(text: str) -> Tuple[str, Dict[str, str]]:
     Returns:
         tuple[str, Dict[str, str]]: Chuỗi đã được bảo vệ và dictionary ánh xạ.
     """
-    replacements: Dict[str, str] = {}
-    
-    def replacer(match: re.Match) -> str:
-        with counter_lock:
-            counter_val = next(placeholder_counter)
-        
-        placeholder = f"__PROTECTED_{counter_val}__"
-        replacements[placeholder] = match.group(0)
-        return placeholder
-
-    # GAME PLACEHOLDERS - Ưu tiên cao nhất
-    game_patterns = [
-        # Unity/Game engine format strings với số
-        r'\{[\d]+\}',                           # {0}, {1}, {2}...
-        
-        # Game variables với modifiers
-        r'\{[a-zA-Z_][a-zA-Z0-9_]*(?:\|[a-zA-Z_][a-zA-Z0-9_]*)*\}',  # {name|B}, {variable|modifier}
-        
-        # Unity percent format strings
-        r'%[sdflb%]',                           # %s, %d, %f, %l, %b, %%
-        
-        # Color codes và special formatting
-        r'<color=[^>]*>.*?</color>',            # <color=#FF0000>text</color>
-        r'<size=[^>]*>.*?</size>',              # <size=14>text</size>
-        r'<b>.*?</b>',                          # <b>bold</b>
-        r'<i>.*?</i>',                          # <i>italic</i>
-    ]
-    
-    # Áp dụng game patterns trước
-    for pattern in game_patterns:
-        text = re.sub(pattern, replacer, text, flags=re.DOTALL)
-    
-    # CÁC PATTERN KHÁC - Ưu tiên thấp hơn
-    other_patterns = [
-        r'<[^>]+>',                            # HTML/XML tags còn lại
-        r'https?://[^\s/$.?#].[^\s]*',         # URLs  
-        r'&[^&\s]+&',                          # &variable&
-        r'\b#\w+\b',                           # #variable
-        r'\b_\w+',                             # _variable
-        r'\w+\.\w+',                           # object.property
-    ]
-    
-    # Áp dụng các pattern khác
-    for pattern in other_patterns:
-        text = re.sub(pattern, replacer, text)
-
-    return text, replacements
+    return PLACEHOLDER_ENGINE.protect(text)
 
 def restore_placeholders(text: str, replacements: Dict[str, str]) -> str:
     """
@@ -219,21 +215,8 @@ def restore_placeholders(text: str, replacements: Dict[str, str]) -> str:
     Returns:
         str: Chuỗi đã được khôi phục placeholder.
     """
-    if not replacements:
-        return text
-
-    # Khôi phục theo thứ tự từ số lớn đến nhỏ để tránh xung đột
-    # Ví dụ: __PROTECTED_10__ phải được thay trước __PROTECTED_1__
-    sorted_keys = sorted(replacements.keys(), 
-                        key=lambda x: int(re.search(r'(\d+)', x).group(1)), 
-                        reverse=True)
-    
-    for placeholder in sorted_keys:
-        original_value = replacements[placeholder]
-        # Thay thế chính xác placeholder
-        text = text.replace(placeholder, original_value)
-    
-    return text
+    # Khôi phục trong một lượt quét, tương đương thay từ số lớn đến nhỏ như trước.
+    return PLACEHOLDER_ENGINE.restore(text, replacements)
 
 
 # ==============================================================================
@@ -281,53 +264,86 @@ def calculate_translation_score(text: str) -> int:
 # ==== HÀM QUYẾT ĐỊNH TỔNG HỢP (THE MASTER DECISION FUNCTION) ====
 # ==============================================================================
 
-def should_translate(text: str, threshold: int = 0) -> bool:
+REJECTION_RULES = (
+    ("patch_note", is_patch_note_or_version),
+    ("code_like", is_code_like),
+    ("asian", contains_asian_characters),
+    ("vietnamese", is_already_vietnamese),
+    ("symbols_only", is_only_symbols_or_control),
+    ("path_or_variable", is_path_or_variable_style),
+)
+"""Các quy tắc loại bỏ cứng `(tên, hàm)` theo thứ tự chạy; hàm trả về True là loại bỏ."""
+
+
+def _score_content(text: str) -> Optional[int]:
+    # Tách các placeholder ra khỏi nội dung có ý nghĩa.
+    protected_text, _ = protect_placeholders(text)
+    meaningful_text = TOKEN_PATTERN.sub('', protected_text).strip()
+
+    # Nếu sau khi bỏ placeholder mà không còn nội dung thì cũng loại bỏ.
+    if len(meaningful_text) < 2:
+        return None
+
+    # Tính điểm cho phần nội dung có ý nghĩa.
+    return calculate_translation_score(meaningful_text)
+
+
+def translation_score(text: str, stats: Optional[FilterStats] = None,
+                      rules: Sequence[Rule] = REJECTION_RULES) -> Optional[int]:
     """
-    Hàm tổng hợp cuối cùng, kết hợp tất cả các bước một cách logic để đưa ra
-    quyết định cuối cùng là CÓ hoặc KHÔNG dịch một chuỗi.
+    Chạy các quy tắc loại bỏ cứng và hệ thống chấm điểm ĐÚNG MỘT LẦN cho một chuỗi.
+
+    Điểm không phụ thuộc ngưỡng, nên có thể dùng lại kết quả để so với nhiều ngưỡng
+    khác nhau (xem `utils/classifier.py`).
 
     Args:
-        text (str): Chuỗi đầu vào cần quyết định.
-        threshold (int): Ngưỡng điểm mà chuỗi cần vượt qua để được dịch.
+        text (str): Chuỗi đầu vào cần chấm điểm.
+        stats (Optional[FilterStats]): Nếu có, ghi lại số lần/thời gian của từng quy tắc
+            và vết quyết định (xem `utils/filter_stats.py`). Mặc định tắt, không tốn chi phí.
+        rules (Sequence[Rule]): Các quy tắc loại bỏ cứng theo thứ tự chạy. Mặc định là
+            `REJECTION_RULES`; thứ tự khác chỉ đổi tốc độ, không đổi kết quả (xem `utils/rule_order.py`).
 
     Returns:
-        bool: True nếu chuỗi nên được dịch, ngược lại là False.
+        Optional[int]: Điểm của chuỗi, hoặc None nếu chuỗi bị loại bỏ ngay từ đầu.
     """
     # BƯỚC 0: KIỂM TRA ĐẦU VÀO CƠ BẢN
-    if not text or not isinstance(text, str): return False
+    if not text or not isinstance(text, str): return None
     text = text.strip()
-    if not text: return False
+    if not text: return None
+    if stats is not None:
+        return stats.run(text, rules, _score_content)
 
     # BƯỚC 1: ÁP DỤNG CÁC QUY TẮC LOẠI BỎ CỨNG (STRICT REJECTION RULES)
     # Đây là các quy tắc "một đi không trở lại", nếu vi phạm sẽ bị loại ngay.
-    if is_patch_note_or_version(text): return False
-    if is_code_like(text): return False
-    if contains_asian_characters(text): return False
-    if re.search(r"[\u00C0-\u1EF9]", text): return False # Đã là tiếng Việt
-    if is_only_symbols_or_control(text): return False
-    if is_path_or_variable_style(text): return False
+    for _, rule in rules:
+        if rule(text): return None
 
     # BƯỚC 2: PHÂN TÍCH SÂU VỚI HỆ THỐNG CHẤM ĐIỂM
     # Chỉ những chuỗi vượt qua vòng 1 mới được vào vòng này.
-    
-    # Tách các placeholder ra khỏi nội dung có ý nghĩa.
-    protected_text, _ = protect_placeholders(text)
-    meaningful_text = re.sub(r'__PROTECTED_\d+__', '', protected_text).strip()
-    
-    # Nếu sau khi bỏ placeholder mà không còn nội dung thì cũng loại bỏ.
-    if len(meaningful_text) < 2:
+    return _score_content(text)
+
+
+def should_translate(text: str, threshold: int = 0) -> bool:
+    """
+    Hàm tổng hợp cuối cùng, kết hợp tất cả các bước một cách logic để đưa ra
+    quyết định cuối cùng là CÓ hoặc KHÔNG dịch một chuỗi.
+
+    Args:
+        text (str): Chuỗi đầu vào cần quyết định.
+        threshold (int): Ngưỡng điểm mà chuỗi cần vượt qua để được dịch.
+
+    Returns:
+        bool: True nếu chuỗi nên được dịch, ngược lại là False.
+    """
+    score = translation_score(text)
+    if score is None:
         return False
-        
-    # Tính điểm cho phần nội dung có ý nghĩa.
-    score = calculate_translation_score(meaningful_text)
-    
-    # Ghi log để theo dõi quyết định của bộ lọc.
-    log_msg = f"Điểm: {score} | Ngưỡng: {threshold} | Chuỗi: '{meaningful_text[:50]}'"
-    
+
     # So sánh điểm với ngưỡng để đưa ra quyết định cuối cùng.
-    if score >= threshold:
-        logger.debug(f"[✅ DỊCH] {log_msg}")
-        return True
-    else:
-        logger.debug(f"[❌ BỎ QUA] {log_msg}")
-        return False
\ No newline at end of file
+    decision = score >= threshold
+
+    # Ghi log để theo dõi quyết định của bộ lọc (chỉ dựng thông điệp khi bật DEBUG).
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[%s] Điểm: %s | Ngưỡng: %s | Chuỗi: '%s'",
+                     "✅ DỊCH" if decision else "❌ BỎ QUA", score, threshold, text.strip()[:50])
+    return decision
@@ -0,0 +1,153 @@
+# utils/filter_stats.py
+"""
+Thống kê (tùy chọn) cho các quy tắc của bộ lọc: mỗi quy tắc loại bỏ bao nhiêu chuỗi,
+tốn bao nhiêu thời gian, và một mẫu ngẫu nhiên các "vết" quyết định để xem lại.
+
+Khi không bật, bộ lọc không tạo ra bất kỳ chi phí nào: `translation_score(text)` chỉ
+kiểm tra `stats is None` một lần rồi chạy đường nhanh như bình thường.
+
+Ví dụ:
+    stats = FilterStats(sample_size=20)
+    score = translation_score(text, stats)
+    for line in stats.report(thresholds): logger.info(line)
+"""
+
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Tên các bước không phải quy tắc loại bỏ cứng.
+STAGE_SCORING = "scoring"
+OUTCOME_NO_CONTENT = "no_content"
+
+Rule = Tuple[str, Callable[[str], bool]]
+
+
+class FilterStats:
+    """
+    Bộ đếm theo quy tắc + mẫu vết quyết định.
+
+    Args:
+        sample_size (int): Số vết quyết định tối đa được giữ lại (lấy mẫu ngẫu nhiên đều).
+        seed (Optional[int]): Hạt giống cho việc lấy mẫu (để tái lập kết quả).
+    """
+
+    def __init__(self, sample_size: int = 20, seed: Optional[int] = None):
+        self.sample_size = sample_size
+        # Số lần quy tắc được chạy / số chuỗi bị quy tắc loại bỏ / tổng thời gian (ns).
+        self.calls: Counter = Counter()
+        self.rejections: Counter = Counter()
+        self.time_ns: Counter = Counter()
+        self.decisions = 0
+        # Phân bố điểm (kể cả các điểm lấy từ cache), None = bị loại bỏ cứng.
+        self.scores: Counter = Counter()
+        self.traces: List[Dict] = []
+        self._rng = random.Random(seed)
+
+    # ------------------------------------------------------------------
+    # GHI NHẬN
+    # ------------------------------------------------------------------
+    def run(self, text: str, rules: Sequence[Rule], score_content: Callable[[str], Optional[int]]) -> Optional[int]:
+        """
+        Chạy các quy tắc loại bỏ rồi chấm điểm như `translation_score`, có đo đạc.
+
+        Args:
+            text: Chuỗi đã `strip()` và khác rỗng.
+            rules: Các quy tắc `(tên, hàm)` theo thứ tự chạy; hàm trả về True là loại bỏ.
+            score_content: Bước chấm điểm cuối cùng (None nếu không còn nội dung).
+        """
+        steps: List[Tuple[str, bool, int]] = []
+        outcome, score = None, None
+        clock = time.perf_counter_ns
+        for name, rule in rules:
+            start = clock()
+            rejected = rule(text)
+            elapsed = clock() - start
+            self._count(name, elapsed, rejected)
+            steps.append((name, rejected, elapsed))
+            if rejected:
+                outcome = name
+                break
+        else:
+            start = clock()
+            score = score_content(text)
+            elapsed = clock() - start
+            self._count(STAGE_SCORING, elapsed, score is None)
+            steps.append((STAGE_SCORING, score is None, elapsed))
+            outcome = OUTCOME_NO_CONTENT if score is None else STAGE_SCORING
+
+        self.decisions += 1
+        self._sample({"text": text[:80], "outcome": outcome, "score": score, "steps": steps})
+        return score
+
+    def record_scores(self, scores: Sequence[Optional[int]]) -> None:
+        """Ghi lại điểm cuối cùng của các chuỗi (dùng cho phân bố điểm)."""
+        self.scores.update(scores)
+
+    def _count(self, name: str, elapsed: int, rejected: bool) -> None:
+        self.calls[name] += 1
+        self.time_ns[name] += elapsed
+        if rejected:
+            self.rejections[name] += 1
+
+    def _sample(self, trace: Dict) -> None:
+        # Reservoir sampling: mỗi quyết định có cùng xác suất được giữ lại.
+        if len(self.traces) < self.sample_size:
+            self.traces.append(trace)
+            return
+        slot = self._rng.randrange(self.decisions)
+        if slot < self.sample_size:
+            self.traces[slot] = trace
+
+    def merge(self, other: "FilterStats") -> None:
+        """Gộp thống kê từ một tiến trình con vào đây."""
+        if other.traces:
+            pool = [(trace, self.decisions / len(self.traces)) for trace in self.traces] \
+                + [(trace, other.decisions / len(other.traces)) for trace in other.traces]
+            if len(pool) > self.sample_size:
+                # Lấy mẫu có trọng số (mỗi vết đại diện cho số quyết định của bên nó),
+                # để mẫu gộp vẫn đều trên toàn bộ dữ liệu.
+                keyed = sorted(pool, key=lambda entry: self._rng.random() ** (1.0 / entry[1]), reverse=True)
+                pool = keyed[:self.sample_size]
+            self.traces = [trace for trace, _ in pool]
+        self.calls.update(other.calls)
+        self.rejections.update(other.rejections)
+        self.time_ns.update(other.time_ns)
+        self.scores.update(other.scores)
+        self.decisions += other.decisions
+
+    # ------------------------------------------------------------------
+    # BÁO CÁO
+    # ------------------------------------------------------------------
+    def report(self, thresholds: Sequence[int] = ()) -> List[str]:
+        """Các dòng báo cáo để ghi log."""
+        lines = [f"🔬 Thống kê quy tắc lọc ({self.decisions} chuỗi được chấm thực sự, không tính cache):"]
+        total_ns = sum(self.time_ns.values()) or 1
+        for name in self.calls:
+            calls, rejected, spent = self.calls[name], self.rejections[name], self.time_ns[name]
+            lines.append(
+                f"  - {name:<18} chạy {calls:>8} | loại {rejected:>8} ({rejected / calls * 100:5.1f}%)"
+                f" | {spent / 1e6:9.1f} ms ({spent / total_ns * 100:4.1f}%) | {spent / calls / 1e3:6.1f} µs/lần"
+            )
+
+        scored = {score: count for score, count in self.scores.items() if score is not None}
+        if scored or self.scores:
+            rejected = self.scores.get(None, 0)
+            lines.append(f"📈 Phân bố điểm: {sum(scored.values())} chuỗi có điểm, {rejected} bị loại bỏ cứng")
+            if scored:
+                ordered = sorted(scored)
+                lines.append("  - " + ", ".join(f"{score}: {scored[score]}" for score in ordered))
+            for threshold in thresholds:
+                near = sum(count for score, count in scored.items() if abs(score - threshold) <= 2)
+                lines.append(f"  - Ngưỡng {threshold}: {near} chuỗi có điểm trong khoảng ±2")
+
+        if self.traces:
+            lines.append(f"🧾 Mẫu {len(self.traces)} vết quyết định:")
+            for trace in self.traces:
+                steps = " → ".join(
+                    f"{name}{'✗' if rejected else '✓'}({elapsed / 1e3:.1f}µs)" for name, rejected, elapsed in trace["steps"]
+                )
+                result = f"điểm {trace['score']}" if trace["score"] is not None else f"loại bởi {trace['outcome']}"
+                lines.append(f"  - {trace['text']!r}: {result} | {steps}")
+        return lines
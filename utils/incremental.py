@@ -0,0 +1,168 @@
+# utils/incremental.py
+"""
+Phân loại tăng dần (incremental) dựa trên kết quả của lần chạy trước trong `classified_output/`.
+
+Khi có file Strings.json mới (bản patch game), chỉ những mục MỚI hoặc ĐÃ THAY ĐỔI
+(so theo cặp `(index, hash(value))`) mới phải chạy qua bộ lọc. Các mục không đổi được
+giữ nguyên ở nhóm mà chúng ĐANG nằm trong các file kết quả - tức là mọi thao tác
+chuyển/copy thủ công (ví dụ từ `_2_needs_review.json` sang `_1_safe_to_translate.json`)
+đều được giữ lại.
+
+Lần chạy trước được mô tả bởi file `_manifest.json` (ghi cùng với 3 file kết quả):
+hash giá trị gốc và nhóm mà BỘ LỌC đã xếp cho từng index, cùng dấu vân tay của bộ lọc
+và các ngưỡng. Nhờ đó có thể phân biệt một mục bị người dùng chuyển tay với một mục
+do bộ lọc xếp; khi bộ lọc hoặc ngưỡng thay đổi, chỉ các mục do bộ lọc xếp mới bị
+phân loại lại.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils.jsonstream import iter_json_array
+
+BUCKET_FILES = (
+    "_1_safe_to_translate.json",
+    "_2_needs_review.json",
+    "_3_skipped_technical.json",
+)
+MANIFEST_FILE = "_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def value_hash(value) -> str:
+    """Hash ngắn (64-bit, dạng hex) của giá trị một mục, dùng để phát hiện thay đổi."""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return hashlib.blake2b(value.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+class PreviousRun:
+    """Trạng thái của lần phân loại trước, đọc từ thư mục kết quả."""
+
+    def __init__(self):
+        # index -> nhóm mà mục đang nằm trong file (ưu tiên nhóm đứng trước nếu bị copy)
+        self.placement: Dict[int, int] = {}
+        # index -> (hash giá trị gốc, nhóm do bộ lọc xếp)
+        self.recorded: Dict[int, Tuple[str, int]] = {}
+        self.fingerprint: Optional[str] = None
+        self.has_manifest = False
+
+    @classmethod
+    def load(cls, output_dir: str) -> Optional["PreviousRun"]:
+        """Đọc lần chạy trước; None nếu thư mục chưa có đủ 3 file kết quả."""
+        paths = [os.path.join(output_dir, name) for name in BUCKET_FILES]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+
+        run = cls()
+        file_hashes: Dict[int, str] = {}
+        for bucket, path in enumerate(paths):
+            for item in iter_json_array(path):
+                index = item.get("index")
+                if index is None or index in run.placement:
+                    continue
+                run.placement[index] = bucket
+                file_hashes[index] = value_hash(item.get("value", ""))
+
+        manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                run.has_manifest = True
+                run.fingerprint = manifest.get("fingerprint")
+                run.recorded = {index: (h, bucket) for index, h, bucket in manifest["entries"]}
+
+        if not run.has_manifest:
+            # Kết quả cũ chưa có manifest: coi giá trị trong file là giá trị gốc
+            # và nhóm hiện tại là nhóm do bộ lọc xếp.
+            run.recorded = {index: (file_hashes[index], bucket) for index, bucket in run.placement.items()}
+        return run
+
+
+class IncrementalPlan:
+    """
+    So sánh dữ liệu mới với lần chạy trước, từng mục một (dùng được khi đọc theo luồng).
+
+    Args:
+        previous: Lần chạy trước.
+        fingerprint: Dấu vân tay bộ lọc + ngưỡng hiện tại (xem `run_fingerprint`).
+    """
+
+    def __init__(self, previous: PreviousRun, fingerprint: str):
+        self.previous = previous
+        self.rules_changed = previous.fingerprint is not None and previous.fingerprint != fingerprint
+        self.stats = {"unchanged": 0, "manual": 0, "added": 0, "changed": 0, "rules_changed": 0, "removed": 0}
+        self._seen = set()
+
+    def decide(self, item: Dict) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Quyết định cho một mục mới (đã có `index`).
+
+        Returns:
+            tuple: `(nhóm hiện tại, nhóm do bộ lọc xếp)` nếu được giữ lại,
+            hoặc `(None, None)` nếu mục cần được phân loại.
+        """
+        index = item["index"]
+        self._seen.add(index)
+        recorded = self.previous.recorded.get(index)
+        placement = self.previous.placement.get(index)
+        if recorded is None or placement is None:
+            self.stats["added"] += 1
+            return None, None
+        if recorded[0] != value_hash(item.get("value", "")):
+            self.stats["changed"] += 1
+            return None, None
+
+        if placement != recorded[1]:
+            # Người dùng đã tự chuyển mục này: luôn giữ nguyên.
+            self.stats["manual"] += 1
+        elif self.rules_changed:
+            self.stats["rules_changed"] += 1
+            return None, None
+        else:
+            self.stats["unchanged"] += 1
+        return placement, recorded[1]
+
+    def finish(self) -> Dict[str, int]:
+        """Đếm các mục đã bị xóa khỏi dữ liệu mới và trả về thống kê cuối cùng."""
+        self.stats["removed"] = sum(1 for index in self.previous.placement if index not in self._seen)
+        return self.stats
+
+
+def run_fingerprint(filter_fp: str, thresholds: Sequence[int]) -> str:
+    """Dấu vân tay của một lần phân loại: bộ lọc + các ngưỡng."""
+    return f"{filter_fp}:{','.join(str(t) for t in thresholds)}"
+
+
+class ManifestWriter:
+    """Ghi manifest của lần chạy hiện tại theo luồng, từng mục một."""
+
+    def __init__(self, output_dir: str, fingerprint: str):
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.fingerprint = fingerprint
+        self._tmp_path = f"{self.path}.tmp"
+        self._file = None
+        self._count = 0
+
+    def __enter__(self) -> "ManifestWriter":
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+        header = {"version": MANIFEST_VERSION, "fingerprint": self.fingerprint}
+        self._file.write(json.dumps(header, separators=(",", ":"))[:-1] + ',"entries":[')
+        return self
+
+    def write(self, item: Dict, auto_bucket: int) -> None:
+        entry = [item["index"], value_hash(item.get("value", "")), auto_bucket]
+        self._file.write(("," if self._count else "") + json.dumps(entry, separators=(",", ":")))
+        self._count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self._file.write("]}")
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
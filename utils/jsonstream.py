@@ -0,0 +1,238 @@
+# utils/jsonstream.py
+"""
+Đọc/ghi JSON array theo kiểu luồng (streaming) cho các bảng chuỗi rất lớn.
+
+- `iter_json_array`: đọc từng phần tử của một file `[ {...}, {...}, ... ]` mà không
+  nạp toàn bộ file vào bộ nhớ.
+- `JsonArrayParser`: đọc dần một JSON array từ các mảnh văn bản nhận được (response
+  streaming của API), trả về từng phần tử ngay khi nó hoàn chỉnh.
+- `JsonArrayWriter`: ghi từng phần tử ra file với định dạng GIỐNG HỆT
+  `json.dump(data, f, ensure_ascii=False, indent=2)`. File được ghi ra file tạm rồi
+  mới đổi tên, nên file cũ không bao giờ bị hỏng giữa chừng (ví dụ khi nhấn Ctrl+C).
+"""
+
+import json
+import os
+from typing import Any, Iterable, Iterator, List
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_READ_SIZE = 1 << 16
+# Số ký tự tối thiểu phải còn lại sau một phần tử để chắc chắn nó không bị cắt ngang.
+_LOOKAHEAD = 64
+
+
+def iter_json_array(path: str, read_size: int = _READ_SIZE) -> Iterator[Any]:
+    """
+    Đọc lần lượt từng phần tử của một JSON array trong file.
+
+    Bộ nhớ dùng chỉ tỉ lệ với phần tử lớn nhất, không phụ thuộc số phần tử.
+
+    Raises:
+        ValueError: Nếu file không phải là một JSON array hợp lệ.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(read_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_whitespace() -> None:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return
+
+        fill()
+        if buffer.startswith("\ufeff"):
+            pos = 1
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != "[":
+            raise ValueError(f"'{path}' không phải là một JSON array.")
+        pos += 1
+
+        expect_value = True
+        first = True
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError(f"'{path}' kết thúc đột ngột (thiếu ']').")
+            char = buffer[pos]
+            if char == "]" and (first or not expect_value):
+                return
+            if not expect_value:
+                if char != ",":
+                    raise ValueError(f"'{path}': thiếu dấu ',' giữa các phần tử.")
+                pos += 1
+                expect_value = True
+                continue
+
+            while True:
+                try:
+                    value, end = _DECODER.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Phần tử chưa đọc đủ: đọc thêm rồi thử lại.
+                    if eof or not fill():
+                        raise
+                    continue
+                if len(buffer) - end < _LOOKAHEAD and not eof:
+                    # Một số ở sát cuối bộ đệm có thể còn bị cắt ngang
+                    # (ví dụ "12" của "123", "1.5" của "1.5e3"): đọc thêm rồi giải mã lại.
+                    if fill():
+                        continue
+                break
+            pos = end
+            yield value
+            expect_value = False
+            first = False
+
+
+class JsonArrayParser:
+    """
+    Đọc dần một JSON array từ các mảnh văn bản.
+
+    Văn bản trước dấu `[` đầu tiên (ví dụ "```json") được bỏ qua. Một phần tử chỉ được trả
+    về khi đã thấy dấu `,` hoặc `]` đứng sau nó, nên một số hay một chuỗi bị cắt ngang
+    giữa hai mảnh không bao giờ bị đọc sai.
+
+    Attributes:
+        started: Đã gặp dấu `[` mở đầu mảng.
+        closed: Đã gặp dấu `]` kết thúc mảng (các mảnh sau đó bị bỏ qua).
+        count: Số phần tử đã trả về.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._expect_value = True
+        self.started = False
+        self.closed = False
+        self.count = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Thêm một mảnh văn bản, trả về các phần tử vừa hoàn chỉnh.
+
+        Raises:
+            ValueError: Thiếu dấu ',' giữa các phần tử.
+        """
+        if self.closed or not text:
+            return []
+        # Bỏ phần đã đọc để bộ đệm chỉ chứa phần tử đang dở.
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        if not self.started:
+            start = self._buffer.find("[")
+            if start < 0:
+                self._buffer = ""
+                return []
+            self.started = True
+            self._pos = start + 1
+        elif "," not in text and "]" not in text:
+            # Một phần tử chỉ hoàn chỉnh khi ký tự kết thúc của nó vừa tới.
+            return []
+
+        values: List[Any] = []
+        buffer = self._buffer
+        while True:
+            pos = self._skip_whitespace(buffer, self._pos)
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if char == "]" and (not self.count or not self._expect_value):
+                self.closed = True
+                self._pos = pos + 1
+                break
+            if not self._expect_value:
+                if char != ",":
+                    raise ValueError("JSON array: thiếu dấu ',' giữa các phần tử.")
+                self._pos = pos + 1
+                self._expect_value = True
+                continue
+            try:
+                value, end = _DECODER.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Phần tử chưa đủ dữ liệu: chờ mảnh tiếp theo.
+            after = self._skip_whitespace(buffer, end)
+            if after >= len(buffer) or buffer[after] not in ",]":
+                break  # Chưa thấy dấu kết thúc phần tử ("12" có thể còn tiếp thành "123" hay "12.5").
+            values.append(value)
+            self._pos = end
+            self._expect_value = False
+            self.count += 1
+        return values
+
+    @staticmethod
+    def _skip_whitespace(buffer: str, pos: int) -> int:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+
+def iter_chunks(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Gom một iterable thành các list có tối đa `size` phần tử."""
+    chunk: List[Any] = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JsonArrayWriter:
+    """
+    Ghi một JSON array từng phần tử một.
+
+    Dùng như context manager; khi thoát bình thường file tạm được đổi tên thành `path`,
+    khi có lỗi file tạm bị xóa và file cũ (nếu có) được giữ nguyên.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._file = None
+
+    def __enter__(self) -> "JsonArrayWriter":
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+        self._file.write("[")
+        return self
+
+    def write(self, value: Any) -> None:
+        body = json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self._file.write(",\n  " if self.count else "\n  ")
+        self._file.write(body)
+        self.count += 1
+
+    def write_all(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.write(value)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self._file.write("\n]" if self.count else "]")
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+
+def write_json_array(path: str, values: Iterable[Any]) -> int:
+    """Ghi toàn bộ `values` ra `path` (an toàn, theo luồng). Trả về số phần tử đã ghi."""
+    with JsonArrayWriter(path) as writer:
+        writer.write_all(values)
+    return writer.count
@@ -13,4 +13,25 @@ def setup_logger() -> logging.Logger:
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(threadName)s] - %(message)s')
         handler.setFormatter(formatter)
         logger.addHandler(handler)
-    return logger
\ No newline at end of file
+    return logger
+
+def peak_rss_mb():
+    """
+    Bộ nhớ RAM tối đa (peak RSS, MB) mà tiến trình đã dùng.
+    Trả về None nếu hệ điều hành không hỗ trợ đo (ví dụ Windows không có module `resource`).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def log_peak_rss(logger: logging.Logger) -> None:
+    """Ghi log bộ nhớ RAM tối đa đã dùng."""
+    peak = peak_rss_mb()
+    if peak is not None:
+        logger.info(f"🧠 Bộ nhớ tối đa đã dùng (peak RSS): {peak:.1f} MB")
@@ -0,0 +1,221 @@
+# utils/placeholders.py
+"""
+Bộ máy bảo vệ placeholder dùng chung cho `utils/filter.py` và `utils/filter-new.py`.
+
+Phiên bản cũ chạy lần lượt từng `re.sub` (mỗi pattern một lượt quét) trên cả chuỗi.
+`PlaceholderEngine` biên dịch trước toàn bộ pattern thành MỘT biểu thức alternation
+theo đúng thứ tự ưu tiên và quét chuỗi đúng một lần để tạo ra chuỗi đã bảo vệ cùng
+bảng ánh xạ.
+
+ĐẢM BẢO KẾT QUẢ GIỐNG HỆT PHIÊN BẢN CŨ:
+Các lượt `re.sub` tuần tự có thể "bọc lại" một mã `__PROTECTED_N__` vừa sinh ra
+(ví dụ `\\b_\\w+` khớp chính mã đó và nuốt luôn chữ đứng sau). Quét một lần chỉ khác
+kết quả tuần tự khi một mã nằm sát ký tự có thể bị pattern sau nuốt, hoặc khi một
+pattern ưu tiên cao hơn khớp bên trong vùng vừa bị pattern ưu tiên thấp chiếm.
+Hai trường hợp này được phát hiện ngay trong lượt quét; khi đó (hiếm) engine chạy
+lại đường tuần tự đã biên dịch sẵn, nên đầu ra luôn trùng với thuật toán cũ
+(chỉ khác số thứ tự của mã). Hàm `verify` dùng để kiểm chứng điều đó trên dữ liệu thật.
+"""
+
+import re
+import itertools
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# --- BỘ ĐẾM TOÀN CỤC VÀ KHÓA AN TOÀN ---
+# Tạo một bộ đếm duy nhất bắt đầu từ 0, dùng cho toàn bộ chương trình
+placeholder_counter = itertools.count()
+# Tạo một khóa để đảm bảo tại một thời điểm chỉ có một luồng được lấy số tiếp theo
+counter_lock = threading.Lock()
+
+# Mã bảo vệ có dạng __PROTECTED_<số>__
+TOKEN_PATTERN = re.compile(r'__PROTECTED_(\d+)__')
+
+# Ký tự đứng sát một mã mà KHÔNG pattern nào có thể nuốt thêm.
+# Gặp ký tự khác (chữ, số, `_`, `.`, `#`, `&`, `<`, `>`, `/`...) thì chuyển sang đường tuần tự.
+_SAFE_NEIGHBOURS = frozenset(" \t\r\n\f\v,!?;'\"")
+
+
+def next_token() -> str:
+    """Mã bảo vệ mới (duy nhất trong cả chương trình)."""
+    with counter_lock:
+        counter_val = next(placeholder_counter)
+    return f"__PROTECTED_{counter_val}__"
+
+
+class PlaceholderEngine:
+    """
+    Bộ bảo vệ/khôi phục placeholder được biên dịch sẵn.
+
+    Args:
+        pattern_groups: Danh sách các nhóm `(danh_sách_pattern, flags)` theo thứ tự
+            ưu tiên giảm dần - đúng thứ tự các lượt `re.sub` của phiên bản cũ.
+    """
+
+    def __init__(self, pattern_groups: Sequence[Tuple[Sequence[str], int]]):
+        self._sequential: List[re.Pattern] = []
+        for patterns, flags in pattern_groups:
+            for pattern in patterns:
+                self._sequential.append(re.compile(pattern, flags))
+
+        # Mỗi pattern thành một nhóm bắt có đánh số; ghi lại nhóm nào ứng với pattern nào.
+        parts, group_rank = [], {}
+        group_no = 0
+        for rank, compiled in enumerate(self._sequential):
+            group_no += 1
+            group_rank[group_no] = rank
+            parts.append(f"({_scoped(compiled)})")
+            group_no += compiled.groups
+        self._combined = re.compile("|".join(parts))
+        self._group_rank = group_rank
+
+        # higher[r]: alternation của mọi pattern ưu tiên cao hơn pattern thứ r.
+        self._higher: List[Optional[re.Pattern]] = [None]
+        for rank in range(1, len(self._sequential)):
+            self._higher.append(re.compile(
+                "|".join(f"(?:{_scoped(p)})" for p in self._sequential[:rank])
+            ))
+
+    # ------------------------------------------------------------------
+    # BẢO VỆ
+    # ------------------------------------------------------------------
+    def protect(self, text: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Thay mọi placeholder bằng mã `__PROTECTED_N__` trong một lượt quét.
+
+        Returns:
+            tuple[str, Dict[str, str]]: Chuỗi đã được bảo vệ và dictionary ánh xạ.
+        """
+        spans = self._scan(text)
+        if spans is None:
+            return self.protect_sequential(text)
+        if not spans:
+            return text, {}
+
+        replacements: Dict[str, str] = {}
+        pieces = []
+        last = 0
+        for start, end in spans:
+            placeholder = next_token()
+            replacements[placeholder] = text[start:end]
+            pieces.append(text[last:start])
+            pieces.append(placeholder)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces), replacements
+
+    def _scan(self, text: str) -> Optional[List[Tuple[int, int]]]:
+        """
+        Quét một lần, trả về danh sách vùng cần bảo vệ.
+        Trả về None nếu phát hiện trường hợp mà lượt quét đơn có thể khác kết quả tuần tự.
+        """
+        spans: List[Tuple[int, int]] = []
+        length = len(text)
+        for match in self._combined.finditer(text):
+            start, end = match.span()
+            if start == end:
+                return None
+            if start > 0 and text[start - 1] not in _SAFE_NEIGHBOURS:
+                return None
+            if end < length and text[end] not in _SAFE_NEIGHBOURS:
+                return None
+            higher = self._higher[self._group_rank[match.lastindex]]
+            if higher is not None:
+                inner = higher.search(text, start + 1)
+                if inner is not None and inner.start() < end:
+                    return None
+            spans.append((start, end))
+        return spans
+
+    def protect_sequential(self, text: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Đường tuần tự: từng pattern (đã biên dịch) một lượt `sub`, đúng thuật toán cũ.
+        Chỉ dùng khi lượt quét đơn phát hiện xung đột, và làm chuẩn để kiểm chứng.
+        """
+        replacements: Dict[str, str] = {}
+
+        def replacer(match: re.Match) -> str:
+            placeholder = next_token()
+            replacements[placeholder] = match.group(0)
+            return placeholder
+
+        for compiled in self._sequential:
+            text = compiled.sub(replacer, text)
+        return text, replacements
+
+    # ------------------------------------------------------------------
+    # KHÔI PHỤC
+    # ------------------------------------------------------------------
+    @staticmethod
+    def restore(text: str, replacements: Dict[str, str]) -> str:
+        """
+        Khôi phục mọi mã trong một lượt quét.
+
+        Tương đương việc thay lần lượt từ số lớn đến số nhỏ của phiên bản cũ: giá trị
+        của mã N chỉ được khôi phục tiếp các mã có số nhỏ hơn N (mã lồng nhau do đường
+        tuần tự sinh ra luôn có số nhỏ hơn mã bọc ngoài).
+        """
+        if not replacements:
+            return text
+        return _expand(text, replacements, None)
+
+    # ------------------------------------------------------------------
+    # KIỂM CHỨNG
+    # ------------------------------------------------------------------
+    def verify(self, texts: Iterable[str]) -> List[str]:
+        """
+        So sánh lượt quét đơn với đường tuần tự trên từng chuỗi.
+
+        Hai kết quả được coi là giống hệt nhau khi chúng khác nhau duy nhất ở số thứ tự
+        của mã: cùng phần chữ ngoài mã, cùng vị trí mã, cùng nội dung gốc của từng mã,
+        và khôi phục ra đúng chuỗi ban đầu.
+
+        Returns:
+            List[str]: Các chuỗi cho kết quả khác nhau (rỗng nếu hoàn toàn trùng khớp).
+        """
+        mismatches = []
+        for text in texts:
+            fast = _canonical(*self.protect(text))
+            slow = _canonical(*self.protect_sequential(text))
+            if fast != slow or self.restore(*self.protect(text)) != text:
+                mismatches.append(text)
+        return mismatches
+
+
+def _scoped(compiled: re.Pattern) -> str:
+    """Gói pattern cùng cờ riêng của nó để ghép vào một alternation chung."""
+    flags = ""
+    if compiled.flags & re.DOTALL:
+        flags += "s"
+    if compiled.flags & re.IGNORECASE:
+        flags += "i"
+    if compiled.flags & re.MULTILINE:
+        flags += "m"
+    return f"(?{flags}:{compiled.pattern})" if flags else f"(?:{compiled.pattern})"
+
+
+def _expand(text: str, replacements: Dict[str, str], limit: Optional[int]) -> str:
+    def substitute(match: re.Match) -> str:
+        number = int(match.group(1))
+        original_value = replacements.get(match.group(0))
+        if original_value is None or (limit is not None and number >= limit):
+            return match.group(0)
+        return _expand(original_value, replacements, number)
+
+    return TOKEN_PATTERN.sub(substitute, text)
+
+
+def _canonical(text: str, replacements: Dict[str, str]) -> List[Tuple[bool, str]]:
+    """Tách chuỗi đã bảo vệ thành các đoạn (là_mã, nội_dung_gốc) để so sánh."""
+    segments: List[Tuple[bool, str]] = []
+    last = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.group(0) not in replacements:
+            continue
+        if match.start() > last:
+            segments.append((False, text[last:match.start()]))
+        segments.append((True, PlaceholderEngine.restore(match.group(0), replacements)))
+        last = match.end()
+    if last < len(text):
+        segments.append((False, text[last:]))
+    return segments
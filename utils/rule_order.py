@@ -0,0 +1,102 @@
+# utils/rule_order.py
+"""
+Sắp xếp lại thứ tự các quy tắc loại bỏ cứng của bộ lọc theo dữ liệu thực tế.
+
+Mọi quy tắc trong `REJECTION_RULES` đều là phép loại bỏ thuần túy (không phụ thuộc
+nhau, không có tác dụng phụ): chuỗi bị loại nếu BẤT KỲ quy tắc nào khớp. Vì vậy thứ
+tự chạy không làm thay đổi kết quả, chỉ thay đổi tốc độ. Trên một mẫu dữ liệu đầu vào,
+mỗi quy tắc được đo chi phí trung bình `c` và tỷ lệ loại bỏ `p`; xếp theo `c / p` tăng
+dần (quy tắc rẻ và loại được nhiều chuỗi chạy trước) là thứ tự tối ưu khi các quy tắc
+độc lập với nhau. Quy tắc không loại chuỗi nào trong mẫu được xếp cuối, theo chi phí.
+
+Chế độ kiểm chứng (`verify`) chấm điểm mỗi chuỗi bằng CẢ thứ tự cố định và thứ tự
+thích ứng, rồi báo cáo mọi chuỗi cho kết quả khác nhau (kỳ vọng: không có chuỗi nào).
+"""
+
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.filter import REJECTION_RULES
+from utils.filter_stats import Rule
+
+# Các chế độ của `rule_order` trong CONFIG.
+ORDER_FIXED = "fixed"
+ORDER_ADAPTIVE = "adaptive"
+ORDER_VERIFY = "verify"
+ORDER_MODES = (ORDER_FIXED, ORDER_ADAPTIVE, ORDER_VERIFY)
+
+
+class RuleMeasurement:
+    """Chi phí và độ chọn lọc của một quy tắc trên mẫu dữ liệu."""
+
+    __slots__ = ("name", "cost_ns", "rejection_rate")
+
+    def __init__(self, name: str, cost_ns: float, rejection_rate: float):
+        self.name = name
+        self.cost_ns = cost_ns
+        self.rejection_rate = rejection_rate
+
+    @property
+    def rank(self) -> Tuple[int, float]:
+        """Khóa sắp xếp: quy tắc có loại bỏ trước (theo c/p), quy tắc không loại gì sau (theo c)."""
+        if self.rejection_rate > 0:
+            return 0, self.cost_ns / self.rejection_rate
+        return 1, self.cost_ns
+
+
+def sample_texts(texts: Sequence, size: int, seed: Optional[int] = 0) -> List[str]:
+    """Mẫu ngẫu nhiên (tối đa `size` chuỗi) đã `strip()`, bỏ chuỗi rỗng/không phải chuỗi."""
+    cleaned = [text.strip() for text in texts if isinstance(text, str) and text.strip()]
+    if len(cleaned) <= size:
+        return cleaned
+    return random.Random(seed).sample(cleaned, size)
+
+
+def measure_rules(texts: Sequence[str], rules: Sequence[Rule] = REJECTION_RULES) -> List[RuleMeasurement]:
+    """
+    Đo từng quy tắc ĐỘC LẬP trên toàn bộ mẫu (không dừng ở quy tắc đầu tiên khớp).
+
+    Args:
+        texts: Mẫu chuỗi đã `strip()` (xem `sample_texts`).
+        rules: Các quy tắc `(tên, hàm)`.
+    """
+    measurements = []
+    clock = time.perf_counter_ns
+    for name, rule in rules:
+        start = clock()
+        rejected = sum(1 for text in texts if rule(text))
+        elapsed = clock() - start
+        count = max(len(texts), 1)
+        measurements.append(RuleMeasurement(name, elapsed / count, rejected / count))
+    return measurements
+
+
+def adaptive_order(measurements: Sequence[RuleMeasurement]) -> Tuple[str, ...]:
+    """Thứ tự tên quy tắc tối ưu theo số đo (ổn định với các quy tắc có cùng hạng)."""
+    return tuple(m.name for m in sorted(measurements, key=lambda m: m.rank))
+
+
+def ordered_rules(order: Optional[Sequence[str]], rules: Sequence[Rule] = REJECTION_RULES) -> Tuple[Rule, ...]:
+    """
+    Các quy tắc theo thứ tự `order` (None = thứ tự cố định).
+
+    Raises:
+        ValueError: Nếu `order` không phải là một hoán vị của tên các quy tắc.
+    """
+    if order is None:
+        return tuple(rules)
+    by_name: Dict[str, Rule] = {name: (name, rule) for name, rule in rules}
+    if sorted(order) != sorted(by_name):
+        raise ValueError(f"Thứ tự quy tắc không hợp lệ: {list(order)} (cần đúng các quy tắc {list(by_name)})")
+    return tuple(by_name[name] for name in order)
+
+
+def report(measurements: Sequence[RuleMeasurement], order: Sequence[str]) -> List[str]:
+    """Các dòng log mô tả số đo và thứ tự được chọn."""
+    by_name = {m.name: m for m in measurements}
+    lines = ["🔀 Thứ tự quy tắc lọc thích ứng (đo trên mẫu dữ liệu):"]
+    for position, name in enumerate(order, 1):
+        m = by_name[name]
+        lines.append(f"  {position}. {name:<18} {m.cost_ns / 1e3:6.2f} µs/chuỗi | loại {m.rejection_rate * 100:5.1f}%")
+    return lines
@@ -0,0 +1,262 @@
+# utils/string_table.py
+"""
+Cấu trúc dữ liệu gọn cho bảng chuỗi game (hàng triệu mục `{"index", "value"}`).
+
+Thay vì mỗi mục là một dict Python (~400+ byte/mục kể cả chuỗi), `StringTable` lưu:
+- các index trong một mảng số nguyên liên tục (`array('q')`),
+- toàn bộ giá trị dưới dạng UTF-8 trong MỘT `bytearray`, mỗi mục chỉ giữ offset + độ dài,
+- một mảng vị trí theo index để tra cứu O(1) mà không cần dict phụ trợ.
+
+`StringEntry` là một "view" nhẹ (`__slots__`) trỏ vào một dòng của bảng.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Dùng mảng vị trí trực tiếp khi khoảng index không quá thưa so với số mục.
+_DENSE_FACTOR = 4
+_DENSE_SLACK = 1024
+
+
+def _index_key(index: Any) -> Optional[int]:
+    """Index dạng số nguyên dùng trong bảng: int giữ nguyên, chuỗi số như "12" được đổi sang int."""
+    if isinstance(index, int):
+        return index
+    if isinstance(index, str):
+        try:
+            return int(index.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def ref_fields(ref: Any, table: Optional["StringTable"]) -> Tuple[int, Any]:
+    """(index, value) của một mục: dict `{"index", "value"}`, hoặc vị trí của mục trong `table`."""
+    if isinstance(ref, dict):
+        return ref["index"], ref.get("value", "")
+    return table.index_at(ref), table.value_at(ref)
+
+
+class StringEntry:
+    """View của một dòng trong `StringTable`."""
+
+    __slots__ = ("_table", "_pos")
+
+    def __init__(self, table: "StringTable", pos: int):
+        self._table = table
+        self._pos = pos
+
+    @property
+    def position(self) -> int:
+        return self._pos
+
+    @property
+    def index(self) -> int:
+        return self._table.index_at(self._pos)
+
+    @property
+    def value(self) -> Any:
+        return self._table.value_at(self._pos)
+
+    @value.setter
+    def value(self, new_value: Any) -> None:
+        self._table.set_value_at(self._pos, new_value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._table.item_at(self._pos)
+
+    def __repr__(self) -> str:
+        return f"StringEntry(index={self.index!r}, value={self.value!r})"
+
+
+class StringTable:
+    """
+    Bảng chuỗi gọn, giữ nguyên thứ tự các mục như trong file gốc.
+
+    Ví dụ:
+        table = StringTable.from_items(iter_json_array("Strings.json"))
+        table.set_value(1234, "Bản dịch")
+        write_json_array("output.json", table.iter_items())
+    """
+
+    __slots__ = ("_indexes", "_offsets", "_lengths", "_data", "_positions", "_base",
+                 "_sorted", "_key_order", "_others")
+
+    def __init__(self):
+        self._indexes = array("q")
+        self._offsets = array("Q")
+        self._lengths = array("L")
+        self._data = bytearray()
+        # Bảng tra cứu index -> vị trí, dựng khi cần:
+        # - `_positions`: mảng trực tiếp (index - _base) -> vị trí, khi index đủ dày;
+        # - `_sorted`: (index đã sắp xếp, vị trí tương ứng) để tìm nhị phân, khi index quá thưa.
+        self._positions: Optional[array] = None
+        self._base = 0
+        self._sorted: Optional[Tuple[array, array]] = None
+        # Thứ tự khóa của mục đầu tiên, để ghi ra file giống hệt bản gốc.
+        self._key_order: Tuple[str, ...] = ("index", "value")
+        # Trường hợp hiếm: giá trị không phải chuỗi, hoặc mục có thêm khóa khác.
+        self._others: Dict[int, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------
+    # XÂY DỰNG
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]]) -> "StringTable":
+        """Tạo bảng từ các mục `{"index", "value"}` (ví dụ từ `iter_json_array`)."""
+        table = cls()
+        for pos, item in enumerate(items):
+            if pos == 0:
+                table._key_order = tuple(item.keys())
+            index = item.get("index", pos)
+            table.append(index, item.get("value", ""))
+            if len(item) > 2 or "value" not in item or "index" not in item:
+                extra = {k: v for k, v in item.items() if k not in ("index", "value")}
+                extra["__keys__"] = tuple(item.keys())
+                table._others.setdefault(pos, {}).update(extra)
+        return table
+
+    def append(self, index: int, value: Any) -> int:
+        """
+        Thêm một mục vào cuối bảng, trả về vị trí của nó.
+
+        Index dạng chuỗi số (ví dụ "12") được lưu dưới dạng int để tra cứu, nhưng vẫn ghi ra
+        file đúng như bản gốc.
+
+        Raises:
+            ValueError: Index không phải số nguyên.
+        """
+        key = _index_key(index)
+        if key is None:
+            raise ValueError(f"StringTable: index {index!r} không phải số nguyên (mục thứ {len(self._indexes)}).")
+        pos = len(self._indexes)
+        self._indexes.append(key)
+        if key is not index:
+            self._others.setdefault(pos, {})["__index__"] = index
+        self._offsets.append(0)
+        self._lengths.append(0)
+        self.set_value_at(pos, value)
+        self._positions = self._sorted = None
+        return pos
+
+    # ------------------------------------------------------------------
+    # TRUY CẬP
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __iter__(self) -> Iterator[StringEntry]:
+        for pos in range(len(self._indexes)):
+            yield StringEntry(self, pos)
+
+    def index_at(self, pos: int) -> int:
+        return self._indexes[pos]
+
+    def value_at(self, pos: int) -> Any:
+        other = self._others.get(pos)
+        if other is not None and "__value__" in other:
+            return other["__value__"]
+        start = self._offsets[pos]
+        return self._data[start:start + self._lengths[pos]].decode("utf-8", "surrogatepass")
+
+    def set_value_at(self, pos: int, value: Any) -> None:
+        """
+        Đổi giá trị của dòng `pos`. Giá trị mới được ghi nối vào cuối vùng dữ liệu
+        (vùng cũ bỏ trống), phù hợp với việc mỗi mục chỉ được dịch một lần.
+        """
+        if not isinstance(value, str):
+            self._others.setdefault(pos, {})["__value__"] = value
+            return
+        other = self._others.get(pos)
+        if other is not None:
+            other.pop("__value__", None)
+        encoded = value.encode("utf-8", "surrogatepass")
+        self._offsets[pos] = len(self._data)
+        self._lengths[pos] = len(encoded)
+        self._data += encoded
+
+    def position_of(self, index: int) -> Optional[int]:
+        """Vị trí (thứ tự trong bảng) của một index, None nếu không có. Tra cứu O(1)."""
+        index = _index_key(index)
+        if index is None:
+            return None
+        if self._positions is None and self._sorted is None:
+            self._build_positions()
+        positions = self._positions
+        if positions is not None:
+            slot = index - self._base
+            if 0 <= slot < len(positions):
+                pos = positions[slot]
+                return pos if pos >= 0 else None
+            return None
+        # Index quá thưa để dùng mảng trực tiếp: tìm nhị phân, O(log n).
+        keys, values = self._sorted
+        i = bisect_left(keys, index)
+        return values[i] if i < len(keys) and keys[i] == index else None
+
+    def get(self, index: int) -> Optional[StringEntry]:
+        pos = self.position_of(index)
+        return StringEntry(self, pos) if pos is not None else None
+
+    def set_value(self, index: int, value: Any) -> bool:
+        """Đổi giá trị theo index gốc. Trả về False nếu index không có trong bảng."""
+        pos = self.position_of(index)
+        if pos is None:
+            return False
+        self.set_value_at(pos, value)
+        return True
+
+    def entry_at(self, pos: int) -> Dict[str, Any]:
+        """Dict `{"index", "value"}` (chỉ hai khóa, index dạng int) của một dòng, để gửi đi dịch."""
+        return {"index": self._indexes[pos], "value": self.value_at(pos)}
+
+    def item_at(self, pos: int) -> Dict[str, Any]:
+        """Dựng lại dict `{"index", "value"}` của một dòng (giữ thứ tự khóa gốc)."""
+        other = self._others.get(pos)
+        if other is None:
+            fields = {"index": self._indexes[pos], "value": self.value_at(pos)}
+            if self._key_order == ("index", "value"):
+                return fields
+            return {key: fields[key] for key in self._key_order if key in fields}
+        fields = {k: v for k, v in other.items() if k not in ("__keys__", "__value__", "__index__")}
+        fields["index"] = other.get("__index__", self._indexes[pos])
+        fields["value"] = self.value_at(pos)
+        return {key: fields[key] for key in other.get("__keys__", self._key_order) if key in fields}
+
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        """Các dict của toàn bộ bảng theo đúng thứ tự, dùng để ghi ra file."""
+        for pos in range(len(self._indexes)):
+            yield self.item_at(pos)
+
+    def nbytes(self) -> int:
+        """Ước lượng bộ nhớ của phần dữ liệu chính (byte)."""
+        total = len(self._data)
+        for arr in (self._indexes, self._offsets, self._lengths, self._positions, *(self._sorted or ())):
+            if arr is not None:
+                total += len(arr) * arr.itemsize
+        return total
+
+    def _build_positions(self) -> None:
+        # Nếu một index xuất hiện nhiều lần, vị trí sau cùng được dùng (giống dict trước đây).
+        count = len(self._indexes)
+        if not count:
+            self._positions = array("l")
+            return
+        low, high = min(self._indexes), max(self._indexes)
+        span = high - low + 1
+        if span > _DENSE_FACTOR * count + _DENSE_SLACK:
+            order = sorted(range(count), key=lambda pos: (self._indexes[pos], -pos))
+            keys, values = array("q"), array("l")
+            for pos in order:
+                if keys and keys[-1] == self._indexes[pos]:
+                    continue
+                keys.append(self._indexes[pos])
+                values.append(pos)
+            self._sorted = (keys, values)
+            return
+        positions = array("l", [-1]) * span
+        for pos, index in enumerate(self._indexes):
+            positions[index - low] = pos
+        self._base = low
+        self._positions = positions
@@ -0,0 +1,98 @@
+# utils/tokens.py
+"""
+Ước lượng nhanh số token của một đoạn văn bản, không cần gọi API `count_tokens`.
+
+Tokenizer của Gemini (SentencePiece) cắt tiếng Anh thành khoảng 4 ký tự/token, trong khi
+chữ CJK gần như 1 ký tự/token và các chữ Latin có dấu (tiếng Việt) hay bị tách nhỏ hơn.
+Con số chỉ là ước lượng, đủ để SO SÁNH hai cách trình bày cùng một dữ liệu.
+
+`TokenCalibrator` hiệu chỉnh ước lượng này theo số token thực tế mà API trả về
+(`usage_metadata`), để chia batch theo ngân sách token sát với thực tế.
+"""
+
+import re
+import threading
+
+# Đoạn ASCII liền nhau (chữ/số/dấu câu) hoặc một ký tự không phải ASCII.
+_SEGMENT = re.compile(r'[\x21-\x7e]+|\s+|[^\x00-\x7f]')
+
+_ASCII_CHARS_PER_TOKEN = 4.0
+_WHITESPACE_CHARS_PER_TOKEN = 8.0
+_CJK_TOKENS_PER_CHAR = 1.0
+_OTHER_TOKENS_PER_CHAR = 0.5
+
+
+def _is_cjk(char: str) -> bool:
+    code = ord(char)
+    return (0x3040 <= code <= 0x30ff or 0x3400 <= code <= 0x9fff
+            or 0xac00 <= code <= 0xd7af or 0xf900 <= code <= 0xfaff)
+
+
+def estimate_tokens(text: str) -> int:
+    """Số token ước lượng của `text` (làm tròn lên, tối thiểu 1 với chuỗi khác rỗng)."""
+    if not text:
+        return 0
+    total = 0.0
+    for segment in _SEGMENT.findall(text):
+        first = segment[0]
+        if first.isspace():
+            total += len(segment) / _WHITESPACE_CHARS_PER_TOKEN
+        elif first < "\x80":
+            # Mỗi đoạn ASCII tốn ít nhất một token.
+            total += max(1.0, len(segment) / _ASCII_CHARS_PER_TOKEN)
+        elif _is_cjk(first):
+            total += _CJK_TOKENS_PER_CHAR
+        else:
+            total += _OTHER_TOKENS_PER_CHAR
+    return max(1, int(total + 0.999))
+
+
+class TokenCalibrator:
+    """
+    Hệ số nhân cho `estimate_tokens`, học từ số token thực tế của các response.
+
+    - `input_ratio`: token thực tế của prompt / ước lượng của prompt;
+    - `output_ratio`: token thực tế của bản dịch / ước lượng của chuỗi GỐC (bản dịch
+      tiếng Việt thường dài hơn bản gốc tiếng Anh).
+
+    Các quan sát cũ giảm dần trọng số (`decay`) để hệ số theo kịp dữ liệu hiện tại.
+
+    Args:
+        output_ratio (float): Giá trị ban đầu của `output_ratio` khi chưa có quan sát nào.
+        decay (float): Hệ số giảm trọng số của các quan sát cũ sau mỗi quan sát mới.
+    """
+
+    # Trọng số (tính bằng token) của giá trị ban đầu, tương đương vài batch nhỏ.
+    _PRIOR_TOKENS = 2000.0
+
+    def __init__(self, output_ratio: float = 2.0, decay: float = 0.9):
+        self.decay = decay
+        self.samples = 0
+        # Tổng (có giảm trọng số): ước lượng prompt, thực tế prompt, ước lượng chuỗi gốc, thực tế bản dịch.
+        self._sums = [self._PRIOR_TOKENS, self._PRIOR_TOKENS, self._PRIOR_TOKENS, self._PRIOR_TOKENS * output_ratio]
+        self._lock = threading.Lock()
+
+    @property
+    def input_ratio(self) -> float:
+        return self._sums[1] / self._sums[0]
+
+    @property
+    def output_ratio(self) -> float:
+        return self._sums[3] / self._sums[2]
+
+    def observe(self, prompt_estimate: int, prompt_actual: int, source_estimate: int, output_actual: int) -> None:
+        """Ghi nhận một response: ước lượng và số token thực tế của prompt và bản dịch."""
+        if prompt_estimate <= 0 or source_estimate <= 0:
+            return
+        with self._lock:
+            observed = (prompt_estimate, prompt_actual, source_estimate, output_actual)
+            self._sums = [total * self.decay + value for total, value in zip(self._sums, observed)]
+            self.samples += 1
+
+    def item_cost(self, text: str) -> int:
+        """Token ước lượng (đã hiệu chỉnh) mà một chuỗi tốn trong batch: phần gửi đi + bản dịch."""
+        return int(estimate_tokens(text) * (self.input_ratio + self.output_ratio) + 0.999)
+
+    def request_tokens(self, prompt_estimate: int, source_estimate: int) -> int:
+        """Token ước lượng (đã hiệu chỉnh) của cả request: prompt + bản dịch sẽ nhận về."""
+        return int(prompt_estimate * self.input_ratio + source_estimate * self.output_ratio + 0.999)